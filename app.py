@@ -2,8 +2,10 @@
 
 import streamlit as st
 import os
+import time
 from pathlib import Path
-from src import settings, EmbeddingGenerator, VectorStore, Retriever, Generator, DocumentProcessor, TextChunker
+from src import settings, tracer, EmbeddingGenerator, EmbeddingCache, RateLimiter, EmbeddingBatcher, QueryEmbeddingCache, create_vector_store, Retriever, RETRIEVAL_MODES, Generator, SemanticAnswerCache, CachedGenerator, ContextPacker
+from src.ingest_worker import open_job_queue, start_workers
 
 st.set_page_config(page_title="RAG - Document Q&A", page_icon="📚", layout="wide")
 st.title("📚 RAG - Document Q&A System | CIST 533 Final Project")
@@ -15,43 +17,93 @@ if not os.getenv('GEMINI_API_KEY'):
     st.info("Set it in Streamlit Cloud: Settings → Secrets → Add: `GEMINI_API_KEY = \"your-key-here\"`")
     st.stop()
 
-def ensure_sample_indexed(vector_store, embedder):
-    """Ensure sample PDF is indexed on startup (for Streamlit Cloud)."""
-    try:
-        info = vector_store.get_collection_info()
-        if info['points_count'] == 0:
-            # Look for any PDF in uploads directory
-            pdf_files = list(settings.uploads_dir.glob("*.pdf"))
-            if pdf_files:
-                sample_pdf = pdf_files[0]  # Use first PDF found
-                st.info(f"🔄 Indexing demo document: {sample_pdf.name}...")
-                processor = DocumentProcessor()
-                documents = [processor.process_pdf(sample_pdf)]
-                chunker = TextChunker(settings.chunk_size, settings.chunk_overlap)
-                chunks = chunker.chunk_documents(documents)
-                chunks_with_embeddings = embedder.embed_chunks(chunks)
-                vector_store.add_chunks(chunks_with_embeddings)
-                st.success(f"✅ Indexed {len(chunks)} chunks from {sample_pdf.name}")
-    except Exception as e:
-        st.warning(f"Could not auto-index sample: {str(e)}")
+settings.ensure_dirs()
+
+@st.cache_resource
+def load_answer_cache():
+    return SemanticAnswerCache(settings.answer_cache_threshold, settings.answer_cache_max_entries)
+
+@st.cache_resource
+def load_job_queue():
+    return open_job_queue()
+
+@st.cache_resource
+def load_ingest_workers():
+    # Indexing runs in these processes, outside any browser session (INGEST_WORKERS=0 if run separately)
+    return start_workers(settings.ingest_workers)
+
+@st.cache_resource
+def load_embedding_cache():
+    return EmbeddingCache(settings.embedding_cache_path, settings.embedding_cache_max_entries)
+
+@st.cache_resource
+def load_rate_limiter():
+    # Shared by every embedder in the process so limits hold across sessions
+    return RateLimiter(settings.embedding_requests_per_minute, settings.embedding_tokens_per_minute)
+
+@st.cache_resource
+def load_query_cache():
+    return QueryEmbeddingCache(settings.query_cache_max_entries, settings.query_cache_ttl_seconds,
+                               persist_path=settings.query_cache_path)
+
+def make_embedder():
+    return EmbeddingGenerator(settings.gemini_embedding_model, cache=load_embedding_cache(),
+                              max_concurrency=settings.embedding_max_concurrency,
+                              rate_limiter=load_rate_limiter())
+
+@st.cache_resource
+def load_query_batcher():
+    # One batcher per process so concurrent sessions share embedding calls
+    return EmbeddingBatcher(make_embedder(), window_ms=settings.query_batch_window_ms,
+                            max_batch_size=settings.query_batch_max_size)
 
 @st.cache_resource
 def load_components():
     try:
-        embedder = EmbeddingGenerator(settings.gemini_embedding_model)
-        vector_store = VectorStore(settings.collection_name, str(settings.chroma_dir))
+        # Read first, so a job finishing while the store opens still triggers a reload
+        index_version = load_job_queue().last_finished_at()
+        vector_store = create_vector_store()
         
-        # Auto-index sample PDF if database is empty
-        ensure_sample_indexed(vector_store, embedder)
+        # Fresh container: index the uploads folder in the background; queries use whatever is indexed so far
+        if vector_store.get_collection_info()['points_count'] == 0 and any(settings.uploads_dir.glob("*.pdf")):
+            load_job_queue().enqueue_sync()
         
-        retriever = Retriever(embedder, vector_store)
-        generator = Generator(settings.gemini_llm_model)
-        info = vector_store.get_collection_info()
-        return retriever, generator, info, None
+        retriever = Retriever(load_query_batcher(), vector_store, query_cache=load_query_cache(), mode=settings.retrieval_mode,
+                              rrf_k=settings.rrf_k, vector_timeout=settings.hybrid_vector_timeout,
+                              packer=ContextPacker(settings.context_max_tokens) if settings.context_packing else None)
+        generator = CachedGenerator(Generator(settings.gemini_llm_model), retriever, load_answer_cache())
+        return retriever, generator, vector_store, index_version, None
     except Exception as e:
-        return None, None, None, str(e)
+        return None, None, None, 0.0, str(e)
+
+load_ingest_workers()
+job_queue = load_job_queue()
+retriever, generator, vector_store, index_version, error = load_components()
+job_counts = job_queue.counts()
+indexing = bool(job_counts['queued'] or job_counts['running'])
 
-retriever, generator, collection_info, error = load_components()
+def indexing_status():
+    if job_queue.last_finished_at() > index_version:
+        # A worker changed the index: reopen the store and drop answers that may be stale
+        load_answer_cache().clear()
+        # Other sessions may still be mid-query on the old store, so it is not closed here;
+        # it goes (and closes) with the last session that drops it
+        load_components.clear()
+        st.rerun()
+    for job in job_queue.jobs(states=['running']):
+        label = job['progress_item'] or job['target'] or "uploads folder"
+        st.info(f"🔄 Indexing {job['progress_done']}/{job['progress_total'] or '?'} ({label})")
+    counts = job_queue.counts()
+    if counts['queued']:
+        st.caption(f"{counts['queued']} indexing job(s) queued")
+    for job in job_queue.jobs(limit=3, states=['failed']):
+        if time.time() - job['updated_at'] < 3600:
+            st.warning(f"Failed to index {job['target'] or 'uploads folder'}: {job['error']}")
+    st.metric("Total Chunks", vector_store.get_collection_info()['points_count'])
+
+if hasattr(st, "fragment"):
+    # Poll progress without rerunning the page (Streamlit >= 1.37)
+    indexing_status = st.fragment(run_every=2 if indexing else None)(indexing_status)
 
 with st.sidebar:
     
@@ -64,14 +116,18 @@ with st.sidebar:
             for uploaded_file in uploaded_files:
                 try:
                     file_path = settings.uploads_dir / uploaded_file.name
-                    with open(file_path, "wb") as f:
+                    # Write-then-rename so a worker never converts a half-written file
+                    part_path = file_path.with_name(file_path.name + ".part")
+                    with open(part_path, "wb") as f:
                         f.write(uploaded_file.getbuffer())
+                    os.replace(part_path, file_path)
+                    job_queue.enqueue_file(uploaded_file.name)
                     success_count += 1
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
             
             if success_count > 0:
-                st.success(f"✓ Saved {success_count} file(s)")
+                st.success(f"✓ Saved {success_count} file(s), queued for indexing")
                 st.rerun()
     
     st.subheader("Indexed Documents")
@@ -84,57 +140,52 @@ with st.sidebar:
     
     # Reindex button
     if uploaded_pdfs:
+        full_rebuild = st.checkbox("Full rebuild", help="Clear the index and re-embed every document")
         if st.button("🔄 Reindex Documents", use_container_width=True):
-            with st.spinner("Reindexing documents..."):
-                try:
-                    # Delete existing collection
-                    if not error and collection_info:
-                        try:
-                            vs = VectorStore(settings.collection_name, str(settings.chroma_dir))
-                            vs.delete_collection()
-                            st.info("✓ Cleared existing index")
-                        except:
-                            pass
-                    
-                    # Process PDFs
-                    processor = DocumentProcessor()
-                    documents = processor.process_directory(settings.uploads_dir)
-                    
-                    if not documents:
-                        st.error("No documents found to process")
-                    else:
-                        # Save markdown
-                        for doc in documents:
-                            processor.save_markdown(doc, settings.processed_dir)
-                        
-                        # Chunk documents
-                        chunker = TextChunker(settings.chunk_size, settings.chunk_overlap)
-                        chunks = chunker.chunk_documents(documents)
-                        st.info(f"✓ Created {len(chunks)} chunks")
-                        
-                        # Generate embeddings
-                        embedder = EmbeddingGenerator(settings.gemini_embedding_model)
-                        chunks_with_embeddings = embedder.embed_chunks(chunks)
-                        st.info(f"✓ Generated embeddings")
-                        
-                        # Store in vector database
-                        vector_store = VectorStore(settings.collection_name, str(settings.chroma_dir))
-                        vector_store.add_chunks(chunks_with_embeddings)
-                        
-                        st.success(f"✓ Indexed {len(chunks_with_embeddings)} chunks from {len(documents)} documents!")
-                        st.balloons()
-                        st.cache_resource.clear()
-                        st.rerun()
-                        
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
+            try:
+                job_queue.enqueue_sync(full=full_rebuild)
+                st.success("✓ Reindex queued")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+    
+    if not error:
+        indexing_status()
     
-    if collection_info:
-        st.metric("Total Chunks", collection_info['points_count'])
+    if not error:
+        query_stats = load_query_cache().stats()
+        st.caption(f"Query embedding cache: {query_stats['hits']}/{query_stats['hits'] + query_stats['misses']} hits "
+                   f"({query_stats['hit_rate']:.0%})")
+        batcher = load_query_batcher()
+        if batcher.batch_size.snapshot()['count']:
+            st.caption(f"Query embedding batches: {batcher.batch_size.snapshot()['mean']:.1f} queries/call, "
+                       f"p95 queue wait ≤ {batcher.queue_wait_ms.quantile(0.95)} ms")
+        
+        stages = tracer.stage_percentiles()
+        if stages:
+            with st.expander("⏱️ Stage Latency"):
+                st.dataframe(
+                    [{'stage': name, 'calls': stats['count'], 'p50 ms': round(stats['p50'] or 0, 1),
+                      'p95 ms': round(stats['p95'] or 0, 1), 'p99 ms': round(stats['p99'] or 0, 1)}
+                     for name, stats in sorted(stages.items())],
+                    hide_index=True, use_container_width=True,
+                )
+                recent = tracer.recent_traces(limit=1)
+                if recent:
+                    st.caption("Last request")
+                    st.json(recent[0], expanded=False)
+                st.download_button("Prometheus metrics", tracer.metrics.to_prometheus(),
+                                   file_name="metrics.prom", mime="text/plain", use_container_width=True)
+                st.download_button("Metrics snapshot (JSON lines)", tracer.metrics.to_json_line(),
+                                   file_name="metrics.jsonl", mime="application/jsonl", use_container_width=True)
     
     st.divider()
     st.subheader("Query Settings")
     top_k = st.slider("Context Chunks", 1, 10, 5, help="Number of relevant chunks to retrieve")
+    modes = list(RETRIEVAL_MODES)
+    retrieval_mode = st.selectbox("Retrieval Mode", modes,
+                                  index=modes.index(settings.retrieval_mode) if settings.retrieval_mode in modes else 0,
+                                  help="lexical: keyword (BM25) search without an embedding call; hybrid: BM25 + vector search fused by rank")
     max_tokens = st.slider("Max Answer Length", 512, 2048, 1024, step=50)
     
     if error:
@@ -155,24 +206,31 @@ else:
             st.rerun()
     
     if search_button and query:
+        if indexing:
+            st.caption("Indexing is still running; answers cover the documents indexed so far.")
         try:
-            with st.spinner("🔍 Searching documents..."):
-                results = retriever.retrieve(query, top_k=top_k)
-            
-            if not results:
-                st.warning("No relevant documents found.")
-            else:
-                context = retriever.format_context(results)
-                
-                st.subheader("Answer:")
-                with st.spinner("✨"):
-                    answer = st.write_stream(generator.generate_answer_stream(query=query, context=context, max_tokens=max_tokens))
+            # One span tree per question: retrieval, embedding, search and generation
+            with tracer.span("query", mode=retrieval_mode, top_k=top_k):
+                with st.spinner("🔍 Searching documents..."):
+                    results = retriever.retrieve(query, top_k=top_k, mode=retrieval_mode)
                 
+                if not results:
+                    st.warning("No relevant documents found.")
+                else:
+                    context = retriever.format_context(results)
+                    
+                    st.subheader("Answer:")
+                    with st.spinner("✨"):
+                        answer = st.write_stream(generator.generate_answer_stream(query=query, context=context, max_tokens=max_tokens))
+            
+            if results:
                 st.divider()
                 st.subheader("References:")
                 
                 for i, result in enumerate(results, 1):
-                    with st.expander(f"📄 Context {i} - {result['source_file']} (Score: {result['score']:.3f})"):
+                    # Rank-fusion scores are a few hundredths at most, not a similarity
+                    score = f"RRF score: {result['score']:.4f}" if result.get('fused') else f"Score: {result['score']:.3f}"
+                    with st.expander(f"📄 Context {i} - {result['source_file']} ({score})"):
                         st.text(result['text'])
                 
         except Exception as e:
@@ -0,0 +1,88 @@
+"""Deterministic synthetic corpus: markdown documents, chunks, vectors and queries."""
+
+import random
+from typing import Dict, Iterator, List
+import numpy as np
+
+# Small technical vocabulary so BM25 sees realistic term overlap between chunks
+VOCABULARY = (
+    "index vector query embedding retrieval document chunk model latency cache "
+    "batch token search score rank context answer source memory disk thread "
+    "process network request response budget overlap paragraph sentence corpus "
+    "cosine similarity quantization throughput pipeline storage update delete "
+    "replica shard cluster node schema field metric histogram percentile error"
+).split()
+
+
+def make_sentence(rng: random.Random) -> str:
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(6, 24))]
+    return " ".join(words).capitalize() + rng.choice(".....?!")
+
+
+def make_markdown(num_chars: int, seed: int = 0) -> str:
+    """A markdown export of about ``num_chars`` characters: headings, short and long paragraphs, lists."""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    section = 0
+    while size < num_chars:
+        if rng.random() < 0.05:
+            section += 1
+            block = f"## Section {section}: {make_sentence(rng)[:-1]}"
+        elif rng.random() < 0.1:
+            block = "\n".join(f"- {make_sentence(rng)}" for _ in range(rng.randint(2, 6)))
+        else:
+            # Mostly short paragraphs with the occasional very long one
+            sentences = rng.choice((1, 2, 3, 4, 6, 40))
+            block = " ".join(make_sentence(rng) for _ in range(sentences))
+        parts.append(block)
+        size += len(block) + 2
+    return "\n\n".join(parts)
+
+
+def make_documents(count: int, chars_per_document: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Documents shaped like DocumentProcessor output."""
+    return [
+        {
+            'filename': f"synthetic_{seed}_{i}.pdf",
+            'content': make_markdown(chars_per_document, seed=seed * 100_003 + i),
+            'source_path': f"/synthetic/synthetic_{seed}_{i}.pdf",
+        }
+        for i in range(count)
+    ]
+
+
+def make_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors drawn around a few hundred cluster centers, like real embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(12345).standard_normal((256, dim), dtype=np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.5 * rng.standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def iter_chunk_batches(total: int, dim: int, batch_size: int = 5000, seed: int = 0,
+                       chunks_per_source: int = 200) -> Iterator[List[Dict]]:
+    """``total`` embedded chunks in batches, generated lazily so 1M chunks fit in memory."""
+    rng = random.Random(seed)
+    for start in range(0, total, batch_size):
+        count = min(batch_size, total - start)
+        vectors = make_vectors(count, dim, seed=seed + start)
+        batch = []
+        for offset in range(count):
+            i = start + offset
+            batch.append({
+                'text': " ".join(make_sentence(rng) for _ in range(3)),
+                'chunk_id': i % chunks_per_source,
+                'total_chunks': chunks_per_source,
+                'source_file': f"synthetic_{i // chunks_per_source}.pdf",
+                'source_path': '',
+                'embedding': vectors[offset],
+            })
+        yield batch
+
+
+def make_queries(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(3, 8))) + "?" for _ in range(count)]
@@ -0,0 +1,146 @@
+"""Offline stand-ins for the Gemini client with simulated latency and rate limits.
+
+The real EmbeddingGenerator / Generator are constructed as usual and only their
+``client`` is swapped, so batching, caching, retries and rate limiting are
+exercised exactly as in production.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector derived from the text."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeAPIError(Exception):
+    """Shaped like google.genai's APIError: ``code`` plus a response carrying Retry-After."""
+
+    def __init__(self, code: int, retry_after: Optional[float] = None):
+        super().__init__(f"{code} simulated error")
+        self.code = code
+        headers = {'retry-after': f"{retry_after:.3f}"} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class SimulatedService:
+    """Latency of ``base_ms + per_item_ms * items`` per call and an optional requests-per-minute quota.
+
+    Calls over the quota fail with a 429 that names the wait in Retry-After,
+    like the real API.
+    """
+
+    def __init__(self, base_ms: float = 0.0, per_item_ms: float = 0.0, requests_per_minute: int = 0):
+        self.base_ms = base_ms
+        self.per_item_ms = per_item_ms
+        self.requests_per_minute = requests_per_minute
+        self.calls = 0
+        self.rejected = 0
+        self._window: List[float] = []
+        self._lock = threading.Lock()
+
+    def call(self, items: int = 1):
+        with self._lock:
+            self.calls += 1
+            if self.requests_per_minute:
+                now = time.monotonic()
+                self._window = [t for t in self._window if now - t < 60]
+                if len(self._window) >= self.requests_per_minute:
+                    self.rejected += 1
+                    raise FakeAPIError(429, retry_after=60 - (now - self._window[0]))
+                self._window.append(now)
+        delay = (self.base_ms + self.per_item_ms * items) / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, int]:
+        return {'calls': self.calls, 'rejected': self.rejected}
+
+
+class _FakeModels:
+    def __init__(self, client: "FakeGenaiClient"):
+        self.client = client
+
+    def embed_content(self, model: str, contents, config=None):
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        self.client.embedding_service.call(len(texts))
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=fake_embedding(text, self.client.dim))
+                                           for text in texts])
+
+    def _answer(self, contents: str) -> List[str]:
+        digest = hashlib.blake2b(contents.encode(), digest_size=4).hexdigest()
+        return [f"Synthetic answer {digest}"] + [" token"] * (self.client.answer_tokens - 1)
+
+    def generate_content(self, model: str, contents: str, config=None):
+        pieces = self._answer(contents)
+        self.client.generation_service.call(len(pieces))
+        return SimpleNamespace(text="".join(pieces))
+
+    def generate_content_stream(self, model: str, contents: str, config=None) -> Iterator:
+        pieces = self._answer(contents)
+        # Time to first token, then a steady token rate
+        self.client.generation_service.call(0)
+        per_token = self.client.generation_service.per_item_ms / 1000
+        for piece in pieces:
+            if per_token:
+                time.sleep(per_token)
+            yield SimpleNamespace(text=piece)
+
+
+class FakeGenaiClient:
+    """Replaces ``genai.Client``: ``client.models.embed_content`` / ``generate_content[_stream]``."""
+
+    def __init__(self, dim: int = 768, embedding_service: Optional[SimulatedService] = None,
+                 generation_service: Optional[SimulatedService] = None, answer_tokens: int = 50):
+        self.dim = dim
+        self.embedding_service = embedding_service or SimulatedService()
+        self.generation_service = generation_service or SimulatedService()
+        self.answer_tokens = answer_tokens
+        self.models = _FakeModels(self)
+
+
+def _offline_key():
+    # The real classes refuse to start without a key; it is never sent anywhere
+    os.environ.setdefault('GEMINI_API_KEY', 'offline-benchmark')
+
+
+def fake_embedder(client: FakeGenaiClient, **kwargs):
+    """A real ``EmbeddingGenerator`` whose API calls go to ``client``."""
+    from src.embeddings import EmbeddingGenerator
+
+    _offline_key()
+    embedder = EmbeddingGenerator(**kwargs)
+    embedder.client = client
+    return embedder
+
+
+def fake_generator(client: FakeGenaiClient, model_name: str = "offline-benchmark"):
+    """A real ``Generator`` whose API calls go to ``client``."""
+    from src.generator import Generator
+
+    _offline_key()
+    generator = Generator(model_name)
+    generator.client = client
+    return generator
+
+
+class SyntheticProcessor:
+    """DocumentProcessor stand-in for the pipeline: yields prepared documents instead of converting PDFs."""
+
+    def __init__(self, documents: List[Dict[str, str]]):
+        self.documents = {document['source_path']: document for document in documents}
+
+    def iter_pdfs(self, pdf_paths, workers: int = 1):
+        for pdf_path in pdf_paths:
+            yield self.documents[str(pdf_path)]
+
+    def save_markdown(self, document, output_dir):
+        raise NotImplementedError("benchmarks run without processed_dir")
@@ -0,0 +1,95 @@
+"""Import-time report for the package's entry points, from ``python -X importtime``.
+
+    python -m benchmarks.importtime                  # every entry point, slowest packages of each
+    python -m benchmarks.importtime --target server --top 25
+
+Each target is imported in a fresh interpreter, so the numbers are cold-start
+costs (bytecode already compiled).
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Set
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Entry point -> statement run in a fresh interpreter
+TARGETS: Dict[str, str] = {
+    'package': "import src",
+    'config': "from src import settings",
+    'query': "from src import Retriever, EmbeddingGenerator, Generator, create_vector_store",
+    'server': "import src.server",
+    'ingest': "from src import Indexer, DocumentProcessor",
+}
+
+# "import time: self [us] | cumulative | imported package"
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(statement: str) -> List[Dict]:
+    """Rows of ``{module, depth, self_ms, cumulative_ms}`` in the order ``-X importtime`` prints them."""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                               cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"'{statement}' failed: {completed.stderr.strip().splitlines()[-1]}")
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            rows.append({
+                'module': match.group(4),
+                'depth': (len(match.group(3)) - 1) // 2,
+                'self_ms': int(match.group(1)) / 1000,
+                'cumulative_ms': int(match.group(2)) / 1000,
+            })
+    return rows
+
+
+def summarize(rows: List[Dict], startup: Set[str]) -> Dict:
+    """Total milliseconds of the statement's own imports and the cost of each third-party package.
+
+    Modules in ``startup`` (loaded by the bare interpreter) are left out.
+    """
+    own = [row for row in rows if row['module'] not in startup]
+    packages: Dict[str, float] = {}
+    for row in own:
+        package = row['module'].split(".")[0]
+        if package != "src" and package not in sys.stdlib_module_names:
+            # A package's first import carries its whole subtree
+            packages[package] = max(packages.get(package, 0.0), row['cumulative_ms'])
+    return {
+        'total_ms': sum(row['cumulative_ms'] for row in own if row['depth'] == 0),
+        'packages': dict(sorted(packages.items(), key=lambda item: -item[1])),
+    }
+
+
+def startup_modules() -> Set[str]:
+    return {row['module'] for row in measure("pass")}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cold import time per entry point")
+    parser.add_argument("--target", action="append", choices=TARGETS,
+                        help="Entry point to measure (repeatable; default all)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest third-party packages to list per target")
+    options = parser.parse_args(argv)
+
+    startup = startup_modules()
+    for name in options.target or TARGETS:
+        try:
+            summary = summarize(measure(TARGETS[name]), startup)
+        except RuntimeError as e:
+            print(f"{name}: {str(e)}\n")
+            continue
+        print(f"{name} ({TARGETS[name]}): {summary['total_ms']:.0f} ms")
+        for package, milliseconds in list(summary['packages'].items())[:options.top]:
+            print(f"  {milliseconds:>9.1f} ms  {package}")
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Run the benchmark suite, write JSON results and compare them with a stored baseline.
+
+    python -m benchmarks.run                                # quick run, compared with benchmarks/baseline.json
+    python -m benchmarks.run --sizes 10000,100000,1000000   # full vector store scaling run
+    python -m benchmarks.run --only chunker,store --save-baseline
+
+Exits with status 1 when a timing is more than ``--threshold`` slower than the baseline.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from .suite import BENCHMARKS, STORE_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCHMARK_DIR / "results" / "latest.json"
+
+
+def is_timing(metric: str) -> bool:
+    return metric.endswith("_s") or metric.endswith("_ms")
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[Dict]:
+    """Timings present in both runs, with ``regressed`` set when slower by more than ``threshold``."""
+    rows = []
+    for metric in sorted(results):
+        if not is_timing(metric) or metric not in baseline or not baseline[metric]:
+            continue
+        ratio = results[metric] / baseline[metric]
+        rows.append({
+            'metric': metric,
+            'baseline': baseline[metric],
+            'current': results[metric],
+            'ratio': ratio,
+            'regressed': ratio > 1 + threshold,
+        })
+    return rows
+
+
+def environment() -> Dict:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline RAG pipeline benchmarks")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help=f"Comma-separated benchmarks to run ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Also write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before failing (0.2 = 20%%)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions for whole-batch timings (median)")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    # Vector store scaling
+    parser.add_argument("--sizes", default="10000", help="Comma-separated chunk counts for the store benchmark")
+    parser.add_argument("--backends", default="numpy,chroma",
+                        help=f"Comma-separated store backends ({', '.join(STORE_BACKENDS)})")
+    # Chunking and embedding
+    parser.add_argument("--chunk-chars", type=int, default=2_000_000)
+    parser.add_argument("--embed-texts", type=int, default=2000)
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0, help="Simulated latency per embedding call")
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.2)
+    parser.add_argument("--embed-rpm", type=int, default=0, help="Simulated requests-per-minute quota (0 = none)")
+    # Retrieval and end-to-end
+    parser.add_argument("--retriever-size", type=int, default=10000)
+    parser.add_argument("--retriever-backend", default="numpy", choices=STORE_BACKENDS)
+    parser.add_argument("--query-latency-ms", type=float, default=20.0, help="Simulated query embedding latency")
+    parser.add_argument("--e2e-documents", type=int, default=20)
+    parser.add_argument("--e2e-chars", type=int, default=100_000)
+    parser.add_argument("--e2e-queries", type=int, default=20)
+    parser.add_argument("--llm-first-token-ms", type=float, default=200.0)
+    parser.add_argument("--llm-per-token-ms", type=float, default=2.0)
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own INFO logs")
+
+    options = parser.parse_args(argv)
+    options.only = [name for name in options.only.split(",") if name]
+    options.sizes = [int(size) for size in options.sizes.split(",") if size]
+    options.backends = [backend for backend in options.backends.split(",") if backend]
+    for name in options.only:
+        if name not in BENCHMARKS:
+            parser.error(f"Unknown benchmark '{name}' (expected one of {', '.join(BENCHMARKS)})")
+    for backend in options.backends:
+        if backend not in STORE_BACKENDS:
+            parser.error(f"Unknown backend '{backend}' (expected one of {', '.join(STORE_BACKENDS)})")
+    return options
+
+
+def main(argv=None) -> int:
+    options = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    if not options.verbose:
+        # Per-call INFO logs from the pipeline would dominate the timings
+        logging.getLogger("src").setLevel(logging.WARNING)
+
+    results: Dict[str, float] = {}
+    for name in options.only:
+        logger.info(f"Running {name}...")
+        start = time.perf_counter()
+        results.update(BENCHMARKS[name](options))
+        logger.info(f"{name} done in {time.perf_counter() - start:.1f}s")
+
+    report = {
+        'environment': environment(),
+        'options': {key: value for key, value in vars(options).items() if key not in ("output", "baseline")},
+        'results': results,
+    }
+    options.output.parent.mkdir(parents=True, exist_ok=True)
+    options.output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {options.output}")
+
+    status = 0
+    if options.baseline.exists():
+        baseline = json.loads(options.baseline.read_text())['results']
+        rows = compare(results, baseline, options.threshold)
+        print(f"\nCompared with {options.baseline} (threshold {options.threshold:.0%}):")
+        print(f"{'metric':<52} {'baseline':>12} {'current':>12} {'change':>8}")
+        for row in rows:
+            flag = "  REGRESSION" if row['regressed'] else ""
+            print(f"{row['metric']:<52} {row['baseline']:>12.4f} {row['current']:>12.4f} "
+                  f"{row['ratio'] - 1:>+8.1%}{flag}")
+        regressions = [row for row in rows if row['regressed']]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {options.threshold:.0%}")
+            status = 1
+    else:
+        print(f"\nNo baseline at {options.baseline}; run with --save-baseline to create one")
+        for metric, value in sorted(results.items()):
+            print(f"{metric:<52} {value:>12.4f}")
+
+    if options.save_baseline:
+        options.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {options.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
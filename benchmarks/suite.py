@@ -0,0 +1,205 @@
+"""Benchmark definitions. Each takes the parsed CLI options and returns ``{metric: value}``.
+
+Metric names ending in ``_s`` or ``_ms`` are timings (lower is better) and are
+compared against the baseline; anything else is informational.
+"""
+
+import logging
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from src.chunker import TextChunker
+from src.config import settings
+from src.context_packer import ContextPacker
+from src.lexical_index import LexicalIndex
+from src.pipeline import IngestPipeline
+from src.rate_limiter import RateLimiter
+from src.retriever import Retriever, RETRIEVAL_MODES
+from .corpus import iter_chunk_batches, make_documents, make_markdown, make_queries, make_sentence, make_vectors
+from .fakes import FakeGenaiClient, SimulatedService, SyntheticProcessor, fake_embedder, fake_generator
+from .importtime import TARGETS as IMPORT_TARGETS, measure as measure_imports, startup_modules, summarize
+
+logger = logging.getLogger(__name__)
+
+STORE_BACKENDS = ("numpy", "numpy-int8", "numpy-binary", "chroma")
+
+
+def _median_seconds(func: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def _latencies_ms(func: Callable, inputs: List) -> Dict[str, float]:
+    timings = []
+    for value in inputs:
+        start = time.perf_counter()
+        func(value)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'p50_ms': timings[len(timings) // 2],
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def _open_store(backend: str, directory: str, lexical: bool):
+    lexical_index = LexicalIndex(Path(directory) / "bench.lexical.sqlite") if lexical else None
+    if backend == "chroma":
+        from src.vector_store import VectorStore
+        return VectorStore("bench", directory, lexical_index=lexical_index)
+    from src.vector_store_numpy import VectorStore
+    quantization = backend.split("-", 1)[1] if "-" in backend else None
+    return VectorStore("bench", directory, quantization=quantization, lexical_index=lexical_index)
+
+
+def _fill_store(store, size: int, dim: int) -> float:
+    """Add ``size`` synthetic chunks; returns seconds spent in ``add_chunks`` only."""
+    elapsed = 0.0
+    for batch in iter_chunk_batches(size, dim):
+        start = time.perf_counter()
+        store.add_chunks(batch)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def _embedding_client(options, base_ms: float) -> FakeGenaiClient:
+    service = SimulatedService(base_ms=base_ms, per_item_ms=options.embed_per_text_ms,
+                               requests_per_minute=options.embed_rpm)
+    return FakeGenaiClient(dim=options.dim, embedding_service=service)
+
+
+def _embedder(options, base_ms: float):
+    rate_limiter = RateLimiter(options.embed_rpm) if options.embed_rpm else None
+    return fake_embedder(_embedding_client(options, base_ms), model_name="offline-benchmark",
+                         max_concurrency=settings.embedding_max_concurrency, rate_limiter=rate_limiter)
+
+
+def bench_chunker(options) -> Dict[str, float]:
+    text = make_markdown(options.chunk_chars)
+    chunker = TextChunker(settings.chunk_size, settings.chunk_overlap, settings.chunk_unit)
+    chunks = chunker.split_text(text)
+    return {
+        'chunker.split_text_s': _median_seconds(lambda: chunker.split_text(text), options.repeat),
+        'chunker.chunks': len(chunks),
+    }
+
+
+def bench_embedding(options) -> Dict[str, float]:
+    rng = random.Random(1)
+    texts = [" ".join(make_sentence(rng) for _ in range(8)) for _ in range(options.embed_texts)]
+    embedder = _embedder(options, options.embed_latency_ms)
+    seconds = _median_seconds(lambda: embedder.embed_batch(texts), options.repeat)
+    return {
+        'embed.embed_batch_s': seconds,
+        'embed.api_calls': embedder.client.embedding_service.calls,
+        'embed.rejected_calls': embedder.client.embedding_service.rejected,
+    }
+
+
+def bench_store(options) -> Dict[str, float]:
+    results = {}
+    # Plain lists, as the embedders return them
+    query_vectors = make_vectors(options.queries, options.dim, seed=999).tolist()
+    for backend in options.backends:
+        for size in options.sizes:
+            prefix = f"store.{backend}.{size}"
+            with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+                store = _open_store(backend, directory, lexical=False)
+                results[f"{prefix}.add_s"] = _fill_store(store, size, options.dim)
+                latencies = _latencies_ms(lambda vector: store.search(vector, limit=5), query_vectors)
+                results[f"{prefix}.search_p50_ms"] = latencies['p50_ms']
+                results[f"{prefix}.search_p95_ms"] = latencies['p95_ms']
+                start = time.perf_counter()
+                store.search_batch(query_vectors, limit=5)
+                results[f"{prefix}.search_batch_per_query_ms"] = \
+                    (time.perf_counter() - start) * 1000 / len(query_vectors)
+                logger.info(f"{prefix}: add {results[f'{prefix}.add_s']:.2f}s, "
+                            f"search p50 {latencies['p50_ms']:.2f}ms")
+                del store
+    return results
+
+
+def bench_retriever(options) -> Dict[str, float]:
+    results = {}
+    queries = make_queries(options.queries, seed=7)
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        store = _open_store(options.retriever_backend, directory, lexical=True)
+        _fill_store(store, options.retriever_size, options.dim)
+        embedder = _embedder(options, options.query_latency_ms)
+        for mode in RETRIEVAL_MODES:
+            retriever = Retriever(embedder, store, mode=mode, rrf_k=settings.rrf_k,
+                                  vector_timeout=settings.hybrid_vector_timeout)
+            latencies = _latencies_ms(lambda query: retriever.retrieve(query, top_k=5), queries)
+            results[f"retriever.{mode}.p50_ms"] = latencies['p50_ms']
+            results[f"retriever.{mode}.p95_ms"] = latencies['p95_ms']
+        del store
+    return results
+
+
+def bench_end_to_end(options) -> Dict[str, float]:
+    results = {}
+    documents = make_documents(options.e2e_documents, options.e2e_chars, seed=3)
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        store = _open_store(options.retriever_backend, directory, lexical=True)
+        embedder = _embedder(options, options.embed_latency_ms)
+        chunker = TextChunker(settings.chunk_size, settings.chunk_overlap, settings.chunk_unit)
+        pipeline = IngestPipeline(SyntheticProcessor(documents), chunker, embedder, store,
+                                  queue_size=settings.ingest_queue_size)
+        start = time.perf_counter()
+        stats = pipeline.run([Path(document['source_path']) for document in documents])
+        results['e2e.ingest_s'] = time.perf_counter() - start
+        results['e2e.ingested_chunks'] = stats['chunks']
+
+        query_embedder = _embedder(options, options.query_latency_ms)
+        packer = ContextPacker(settings.context_max_tokens) if settings.context_packing else None
+        retriever = Retriever(query_embedder, store, mode=settings.retrieval_mode, rrf_k=settings.rrf_k,
+                              vector_timeout=settings.hybrid_vector_timeout, packer=packer)
+        generation = SimulatedService(base_ms=options.llm_first_token_ms, per_item_ms=options.llm_per_token_ms)
+        generator = fake_generator(FakeGenaiClient(options.dim, generation_service=generation))
+
+        first_tokens, totals = [], []
+        for query in make_queries(options.e2e_queries, seed=11):
+            start = time.perf_counter()
+            context = retriever.format_context(retriever.retrieve(query, top_k=5))
+            first = None
+            for _ in generator.generate_answer_stream(query, context):
+                if first is None:
+                    first = time.perf_counter()
+            first_tokens.append((first - start) * 1000)
+            totals.append((time.perf_counter() - start) * 1000)
+        results['e2e.query_first_token_p50_ms'] = statistics.median(first_tokens)
+        results['e2e.query_p50_ms'] = statistics.median(totals)
+        del store
+    return results
+
+
+def bench_imports(options) -> Dict[str, float]:
+    results = {}
+    startup = startup_modules()
+    for name, statement in IMPORT_TARGETS.items():
+        try:
+            timings = [summarize(measure_imports(statement), startup)['total_ms'] for _ in range(options.repeat)]
+        except RuntimeError as e:
+            # An entry point whose optional dependency is not installed here
+            logger.warning(str(e))
+            continue
+        results[f"import.{name}_ms"] = statistics.median(timings)
+    return results
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    'imports': bench_imports,
+    'chunker': bench_chunker,
+    'embedding': bench_embedding,
+    'store': bench_store,
+    'retriever': bench_retriever,
+    'e2e': bench_end_to_end,
+}
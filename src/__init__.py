@@ -1,29 +1,66 @@
-"""RAG System - Vector Search-Based Retrieval-Augmented Generation"""
+"""RAG System - Vector Search-Based Retrieval-Augmented Generation
 
-from .config import settings
-from .document_processor import DocumentProcessor
-from .chunker import TextChunker
-from .embeddings import EmbeddingGenerator
-from .vector_store import VectorStore
-from .retriever import Retriever
-from .generator import Generator
+Public names are resolved on first access (PEP 562), so ``import src`` loads
+nothing heavy: docling, chromadb, google-genai and ollama are imported only
+by the components that use them.
+"""
 
-# Ollama alternatives (for local/backup use)
-from .embeddings_ollama import EmbeddingGenerator as OllamaEmbeddingGenerator
-from .generator_ollama import Generator as OllamaGenerator
+import importlib
 
 __version__ = "2.0.0"
 
-__all__ = [
-    'settings',
-    'DocumentProcessor',
-    'TextChunker',
-    'EmbeddingGenerator',
-    'VectorStore',
-    'Retriever',
-    'Generator',
-    'OllamaEmbeddingGenerator',
-    'OllamaGenerator',
-]
+# Public name -> (module, attribute)
+_LAZY_ATTRIBUTES = {
+    'settings': ('.config', 'settings'),
+    'DocumentProcessor': ('.document_processor', 'DocumentProcessor'),
+    'TextChunker': ('.chunker', 'TextChunker'),
+    'EmbeddingGenerator': ('.embeddings', 'EmbeddingGenerator'),
+    'EmbeddingCache': ('.embedding_cache', 'EmbeddingCache'),
+    'RateLimiter': ('.rate_limiter', 'RateLimiter'),
+    'EmbeddingBatcher': ('.embedding_batcher', 'EmbeddingBatcher'),
+    'metrics': ('.metrics', 'metrics'),
+    'tracer': ('.tracing', 'tracer'),
+    'VectorStore': ('.vector_store', 'VectorStore'),
+    'create_vector_store': ('.stores', 'create_vector_store'),
+    'LexicalIndex': ('.lexical_index', 'LexicalIndex'),
+    'ContextPacker': ('.context_packer', 'ContextPacker'),
+    'Retriever': ('.retriever', 'Retriever'),
+    'AsyncRetriever': ('.retriever', 'AsyncRetriever'),
+    'RETRIEVAL_MODES': ('.retriever', 'RETRIEVAL_MODES'),
+    'QueryEmbeddingCache': ('.query_cache', 'QueryEmbeddingCache'),
+    'Generator': ('.generator', 'Generator'),
+    'AsyncGenerator': ('.generator', 'AsyncGenerator'),
+    'SemanticAnswerCache': ('.answer_cache', 'SemanticAnswerCache'),
+    'CachedGenerator': ('.answer_cache', 'CachedGenerator'),
+    'AsyncCachedGenerator': ('.answer_cache', 'AsyncCachedGenerator'),
+    'Indexer': ('.indexer', 'Indexer'),
+    'JobQueue': ('.job_queue', 'JobQueue'),
+    'IngestWorker': ('.ingest_worker', 'IngestWorker'),
+    'IngestPipeline': ('.pipeline', 'IngestPipeline'),
+    
+    # Ollama alternatives (for local/backup use)
+    'OllamaSession': ('.ollama_session', 'OllamaSession'),
+    'OllamaEmbeddingGenerator': ('.embeddings_ollama', 'EmbeddingGenerator'),
+    'OllamaGenerator': ('.generator_ollama', 'Generator'),
+    'OllamaAsyncGenerator': ('.generator_ollama', 'AsyncGenerator'),
+    
+    # In-process exact-search alternative to ChromaDB
+    'NumpyVectorStore': ('.vector_store_numpy', 'VectorStore'),
+}
 
+__all__ = list(_LAZY_ATTRIBUTES)
 
+
+def __getattr__(name: str):
+    try:
+        module_name, attribute = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module_name, __name__), attribute)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
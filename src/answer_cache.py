@@ -0,0 +1,210 @@
+"""Semantic answer cache in front of the LLM generator."""
+
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def _normalize_text(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SemanticAnswerCache:
+    """Reuses answers for queries that are semantically close and hit the same chunks.
+
+    An entry matches when the new query's cosine similarity to the cached query
+    is at least ``threshold`` *and* retrieval returned the same chunk IDs, so a
+    cached answer is only served for an identical context. Without an embedding
+    (lexical retrieval never computes one) only the same query text matches.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: float = 24 * 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # (chunk IDs, max_tokens) -> entries for that context, most recent last
+        self._entries: "OrderedDict[Tuple, List[Dict]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        logger.info(f"SemanticAnswerCache initialized (threshold={threshold}, max_entries={max_entries})")
+
+    def lookup(self, query_embedding: Optional[List[float]], chunk_ids: Iterable[str], max_tokens: int,
+               query: Optional[str] = None) -> Optional[str]:
+        key = (frozenset(chunk_ids), max_tokens)
+        vector = _normalize(query_embedding) if query_embedding is not None else None
+        text = _normalize_text(query) if query is not None else None
+        now = time.time()
+
+        with self._lock:
+            candidates = self._entries.get(key, [])
+            best, best_score = None, self.threshold
+            for entry in candidates:
+                if now - entry['created'] > self.ttl_seconds:
+                    continue
+                if text is not None and text == entry['query']:
+                    score = 1.0
+                elif vector is not None and entry['embedding'] is not None:
+                    score = sum(a * b for a, b in zip(vector, entry['embedding']))
+                else:
+                    continue
+                if score >= best_score:
+                    best, best_score = entry, score
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            logger.info(f"Answer cache hit (similarity={best_score:.3f})")
+            return best['answer']
+
+    def store(self, query_embedding: Optional[List[float]], chunk_ids: Iterable[str], source_files: Iterable[str],
+              max_tokens: int, answer: str, query: Optional[str] = None):
+        key = (frozenset(chunk_ids), max_tokens)
+        entry = {
+            'embedding': _normalize(query_embedding) if query_embedding is not None else None,
+            'query': _normalize_text(query) if query is not None else None,
+            'sources': set(source_files),
+            'answer': answer,
+            'created': time.time(),
+        }
+        with self._lock:
+            self._entries.setdefault(key, []).append(entry)
+            self._entries.move_to_end(key)
+            self._size += 1
+            while self._size > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate_sources(self, source_files: Iterable[str]):
+        """Drop every answer built from chunks of the given source files."""
+        source_files = set(source_files)
+        with self._lock:
+            stale = [key for key, entries in self._entries.items()
+                     if any(entry['sources'] & source_files for entry in entries)]
+            for key in stale:
+                self._size -= len(self._entries.pop(key))
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached answer contexts for {len(source_files)} sources")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': self._size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class _CachingGenerator:
+    """Cache lookup, storage and replay shared by CachedGenerator and AsyncCachedGenerator."""
+
+    def __init__(self, generator, retriever, cache: SemanticAnswerCache):
+        self.generator = generator
+        self.retriever = retriever
+        self.cache = cache
+        logger.info(f"{type(self).__name__} initialized")
+
+    def __getattr__(self, name):
+        return getattr(self.generator, name)
+
+    def _lookup(self, query: str, context: str, max_tokens: int):
+        """(cache key, cached answer or None); the key is None for a context not built by the retriever."""
+        chunks = self.retriever.context_chunks(context)
+        if not chunks:
+            return None, None
+        # Vector and hybrid retrieval leave the query's embedding in the query cache. Lexical
+        # retrieval never embeds, and this must not add the round trip: it matches on exact text
+        query_embedding = self.retriever.cached_query_embedding(query)
+        cached = self.cache.lookup(query_embedding, [c['id'] for c in chunks], max_tokens, query)
+        return (query_embedding, chunks), cached
+
+    def _store(self, query: str, key, max_tokens: int, answer: str):
+        if key is None or not answer or answer.startswith("Error:"):
+            return
+        query_embedding, chunks = key
+        self.cache.store(query_embedding, [c['id'] for c in chunks], [c['source_file'] for c in chunks],
+                         max_tokens, answer, query=query)
+
+    def _store_stream(self, query: str, key, max_tokens: int, parts: List[str]):
+        # The wrapped generators report failures as a final "Error: ..." piece
+        if not any(part.startswith("Error:") for part in parts):
+            self._store(query, key, max_tokens, "".join(parts))
+
+    @staticmethod
+    def _replay(cached: str) -> List[str]:
+        # Word-sized pieces, so the UI streams a cached answer like a live one
+        return re.findall(r'\S+\s*|\s+', cached)
+
+
+class CachedGenerator(_CachingGenerator):
+    """Generator wrapper that serves semantically repeated questions from the cache.
+
+    Exposes the same ``generate_answer`` / ``generate_answer_stream`` interface as
+    the wrapped generator. The context must come from ``retriever.format_context``
+    so the chunks behind it are known; any other context bypasses the cache.
+    """
+
+    def generate_answer(self, query: str, context: str, max_tokens: int = 500) -> str:
+        key, cached = self._lookup(query, context, max_tokens)
+        if cached is not None:
+            return cached
+        answer = self.generator.generate_answer(query, context, max_tokens)
+        self._store(query, key, max_tokens, answer)
+        return answer
+
+    def generate_answer_stream(self, query: str, context: str, max_tokens: int = 500):
+        key, cached = self._lookup(query, context, max_tokens)
+        if cached is not None:
+            yield from self._replay(cached)
+            return
+        parts = []
+        for text in self.generator.generate_answer_stream(query, context, max_tokens):
+            parts.append(text)
+            yield text
+        self._store_stream(query, key, max_tokens, parts)
+
+
+class AsyncCachedGenerator(_CachingGenerator):
+    """Async counterpart of CachedGenerator, for an AsyncGenerator and AsyncRetriever."""
+
+    async def generate_answer(self, query: str, context: str, max_tokens: int = 500) -> str:
+        key, cached = self._lookup(query, context, max_tokens)
+        if cached is not None:
+            return cached
+        answer = await self.generator.generate_answer(query, context, max_tokens)
+        self._store(query, key, max_tokens, answer)
+        return answer
+
+    async def generate_answer_stream(self, query: str, context: str, max_tokens: int = 500):
+        key, cached = self._lookup(query, context, max_tokens)
+        if cached is not None:
+            for piece in self._replay(cached):
+                yield piece
+            return
+        parts = []
+        async for text in self.generator.generate_answer_stream(query, context, max_tokens):
+            parts.append(text)
+            yield text
+        self._store_stream(query, key, max_tokens, parts)
@@ -0,0 +1,151 @@
+"""Adaptive batching of vector store writes, optionally on a background writer thread."""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+from .metrics import MetricsRegistry, metrics as default_metrics
+
+logger = logging.getLogger(__name__)
+
+# Rows per written batch
+WRITE_BATCH_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+# Per-row payload besides the vector and text: ids, metadata, index entries
+_ROW_OVERHEAD_BYTES = 256
+
+_STOP = object()
+
+
+def estimate_chunk_bytes(chunk: Dict) -> int:
+    """Approximate write payload of one chunk: float32 vector, UTF-8 text and metadata."""
+    return 4 * len(chunk['embedding']) + len(chunk['text'].encode('utf-8')) + _ROW_OVERHEAD_BYTES
+
+
+def adaptive_batch_size(chunks: List[Dict], target_bytes: int, max_batch_size: Optional[int] = None) -> int:
+    """Rows per batch so that a batch carries about ``target_bytes``, capped by the store's own limit."""
+    if not chunks:
+        return 1
+    sample = chunks[:64]
+    average = sum(estimate_chunk_bytes(chunk) for chunk in sample) / len(sample)
+    size = max(1, int(target_bytes // average))
+    return min(size, max_batch_size) if max_batch_size else size
+
+
+class WriteStats:
+    """Per-batch write timings, shared by the vector store backends."""
+
+    def __init__(self, backend: str, metrics: Optional[MetricsRegistry] = None):
+        registry = metrics or default_metrics
+        self.backend = backend
+        self.write_ms = registry.histogram(f"vector_store_{backend}_write_ms",
+                                           description="Time to write one batch to the vector store")
+        self.batch_rows = registry.histogram(f"vector_store_{backend}_write_rows", WRITE_BATCH_BUCKETS,
+                                             description="Rows per vector store write batch")
+
+    def record(self, rows: int, seconds: float):
+        self.write_ms.observe(seconds * 1000)
+        self.batch_rows.observe(rows)
+        logger.info(f"Wrote {rows} chunks in {seconds * 1000:.1f}ms ({rows / seconds if seconds else 0:.0f} chunks/s)")
+
+
+class BulkWriter:
+    """Coalesces ``add_chunks`` calls into batches of ``store.write_batch_size()`` rows.
+
+    With ``threaded`` the batches (and ``delete_source`` calls, kept in order)
+    are written on a background thread, so the caller can keep embedding while
+    the previous batch is stored; at most ``max_pending`` batches wait. Write
+    errors are raised by the next ``add_chunks``, ``delete_source`` or ``flush``.
+    """
+
+    def __init__(self, store, threaded: bool = True, max_pending: int = 2):
+        self.store = store
+        self.threaded = threaded
+        self._buffer: List[Dict] = []
+        self._batch_size: Optional[int] = None
+        self._error: Optional[BaseException] = None
+        self._ops: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        if threaded:
+            self._thread = threading.Thread(target=self._write_loop, name="vector-store-writer", daemon=True)
+            self._thread.start()
+
+    def add_chunks(self, chunks: List[Dict]):
+        self._raise_pending_error()
+        if not chunks:
+            return
+        if self._batch_size is None:
+            self._batch_size = self.store.write_batch_size(chunks)
+        self._buffer.extend(chunks)
+        while len(self._buffer) >= self._batch_size:
+            batch, self._buffer = self._buffer[:self._batch_size], self._buffer[self._batch_size:]
+            self._submit(self.store.add_chunks, batch)
+
+    def delete_source(self, source_file: str):
+        # Buffered chunks may belong to an earlier source; they must land before this delete
+        self._submit_buffer()
+        self._submit(self.store.delete_source, source_file)
+
+    def flush(self):
+        """Write everything buffered and wait until it is stored."""
+        self._submit_buffer()
+        if self.threaded:
+            self._ops.join()
+        self._raise_pending_error()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._thread is not None:
+                self._ops.put(_STOP)
+                self._thread.join()
+                self._thread = None
+
+    def abort(self):
+        """Stop without writing what is still buffered (batches already queued are written)."""
+        self._buffer = []
+        if self._thread is not None:
+            self._ops.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _submit_buffer(self):
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            self._submit(self.store.add_chunks, batch)
+
+    def _submit(self, func, arg):
+        self._raise_pending_error()
+        if self.threaded:
+            self._ops.put((func, arg))
+        else:
+            func(arg)
+
+    def _write_loop(self):
+        while (op := self._ops.get()) is not _STOP:
+            func, arg = op
+            try:
+                if self._error is None:
+                    func(arg)
+            except BaseException as e:
+                logger.error(f"Vector store write failed: {str(e)}")
+                self._error = e
+            finally:
+                self._ops.task_done()
+        self._ops.task_done()
+
+    def _raise_pending_error(self):
+        # Sticky: after a failed write nothing else is written
+        if self._error is not None:
+            raise self._error
@@ -1,130 +1,164 @@
 """Text chunking with semantic boundaries."""
 
+import bisect
 import logging
-from typing import List, Dict
+import multiprocessing
 import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Separators a chunk may end at, strongest first; group 1 runs from the end of
+# one piece of text to the start of the next. Matching on the punctuation
+# rather than a lookbehind keeps the scan fast on large documents.
+_PARAGRAPH_RE = re.compile(r'(\n[ \t]*\n\s*)')
+_SENTENCE_RE = re.compile(r'[.!?](\s+(?=[A-Z])|\n\s*)')
+_SPACE_RE = re.compile(r'\s+')
+_NON_SPACE_RE = re.compile(r'\S')
+
+# Must match RateLimiter.estimate_tokens
+CHARS_PER_TOKEN = 4
+
+CHUNK_UNITS = ("chars", "tokens")
+
+
+def _boundaries(pattern: re.Pattern, text: str) -> Tuple[List[int], List[int]]:
+    """Offsets where a piece of text ends and where the next one starts, for every separator."""
+    ends, starts = [], []
+    for match in pattern.finditer(text):
+        end = match.start(1)
+        while end > 0 and text[end - 1] in ' \t':
+            end -= 1
+        ends.append(end)
+        starts.append(match.end(1))
+    return ends, starts
+
 
 class TextChunker:
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """Splits text into spans of at most ``chunk_size`` (in ``unit``: characters or tokens).
+
+    Each chunk ends at the last paragraph break in its window if that falls in
+    the second half, otherwise at the last sentence end, then the last word
+    break. The next chunk starts up to ``chunk_overlap`` before it, on a
+    sentence start if one lies in the overlap, else on a word start, so
+    consecutive chunks share literal text. Separators are found once per
+    document; chunks are ``(start, end)`` offsets into the original text.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, unit: str = "chars"):
+        if unit not in CHUNK_UNITS:
+            raise ValueError(f"Unknown chunk unit '{unit}' (expected one of {CHUNK_UNITS})")
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        logger.info(f"TextChunker initialized (size={chunk_size}, overlap={chunk_overlap})")
-    
+        self.unit = unit
+        scale = CHARS_PER_TOKEN if unit == "tokens" else 1
+        self._max_chars = chunk_size * scale
+        self._overlap_chars = chunk_overlap * scale
+        logger.info(f"TextChunker initialized (size={chunk_size}, overlap={chunk_overlap} {unit})")
+
+    @traced("chunker.split")
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """``(start, end)`` offsets of each chunk in ``text``, in order."""
+        first = _NON_SPACE_RE.search(text)
+        if first is None:
+            return []
+        start = first.start()
+        limit = len(text)
+        while text[limit - 1].isspace():
+            limit -= 1
+
+        paragraph_ends, _ = _boundaries(_PARAGRAPH_RE, text)
+        sentence_ends, sentence_starts = _boundaries(_SENTENCE_RE, text)
+
+        spans = []
+        while start < limit:
+            window_end = start + self._max_chars
+            if window_end >= limit:
+                spans.append((start, limit))
+                break
+
+            end = self._break_before(text, start, window_end, paragraph_ends, sentence_ends)
+            spans.append((start, end))
+            start = self._next_start(text, start, end, sentence_starts)
+        return spans
+
+    def _break_before(self, text: str, start: int, window_end: int,
+                      paragraph_ends: List[int], sentence_ends: List[int]) -> int:
+        """Where the chunk starting at ``start`` ends: the best break at or before ``window_end``."""
+        # A paragraph break only wins if it leaves the chunk at least half full
+        for ends, earliest in ((paragraph_ends, start + self._max_chars // 2), (sentence_ends, start)):
+            i = bisect.bisect_right(ends, window_end) - 1
+            if i >= 0 and ends[i] > earliest:
+                return ends[i]
+
+        space = max(text.rfind(' ', start + 1, window_end + 1), text.rfind('\n', start + 1, window_end + 1))
+        if space == -1:
+            # One word longer than the chunk: hard cut
+            return window_end
+        while text[space - 1].isspace():
+            space -= 1
+        return space
+
+    def _next_start(self, text: str, start: int, end: int, sentence_starts: List[int]) -> int:
+        """Start of the chunk after ``[start, end)``: as far back as the overlap allows, never at or before ``start``."""
+        target = max(end - self._overlap_chars, start + 1)
+        if target < end:
+            i = bisect.bisect_left(sentence_starts, target)
+            if i < len(sentence_starts) and sentence_starts[i] < end:
+                return sentence_starts[i]
+            # Otherwise the first word that starts at or after target
+            if text[target - 1].isspace() and not text[target].isspace():
+                return target
+            space = _SPACE_RE.search(text, target, end)
+            if space is not None and space.end() < end:
+                return space.end()
+        # No overlap possible: continue after the separator
+        return _NON_SPACE_RE.search(text, end).start()
+
     def split_text(self, text: str) -> List[str]:
         if not text or not text.strip():
             return []
-        
-        text = text.strip()
+
         logger.info(f"Splitting {len(text)} characters...")
-        
-        paragraphs = self._split_paragraphs(text)
-        chunks = []
-        previous_sentence = ""
-        
-        for paragraph in paragraphs:
-            if len(paragraph) <= self.chunk_size:
-                chunk_text = previous_sentence + " " + paragraph if previous_sentence else paragraph
-                chunk_text = chunk_text.strip()
-                
-                if chunk_text:
-                    chunks.append(chunk_text)
-                    previous_sentence = self._get_last_sentence(paragraph)
-            else:
-                sentences = self._split_sentences(paragraph)
-                current_chunk = previous_sentence if previous_sentence else ""
-                
-                for sentence in sentences:
-                    test_chunk = current_chunk + " " + sentence if current_chunk else sentence
-                    
-                    if len(test_chunk) <= self.chunk_size:
-                        current_chunk = test_chunk
-                    else:
-                        if current_chunk.strip():
-                            chunks.append(current_chunk.strip())
-                        
-                        if len(sentence) > self.chunk_size:
-                            sentence_chunks = self._split_long_sentence(sentence)
-                            for i, sent_chunk in enumerate(sentence_chunks):
-                                if i == 0 and previous_sentence:
-                                    chunks.append((previous_sentence + " " + sent_chunk).strip())
-                                else:
-                                    chunks.append(sent_chunk.strip())
-                            current_chunk = ""
-                            previous_sentence = sentence_chunks[-1] if sentence_chunks else ""
-                        else:
-                            current_chunk = sentence
-                            previous_sentence = sentence
-                
-                if current_chunk.strip():
-                    chunks.append(current_chunk.strip())
-                    previous_sentence = self._get_last_sentence(current_chunk)
-        
+        chunks = [text[start:end] for start, end in self.split_spans(text)]
         logger.info(f"Created {len(chunks)} chunks")
         return chunks
-    
-    def _split_paragraphs(self, text: str) -> List[str]:
-        paragraphs = re.split(r'\n\s*\n+', text)
-        return [p.strip() for p in paragraphs if p.strip()]
-    
-    def _split_sentences(self, text: str) -> List[str]:
-        sentences = re.split(r'(?<=[.!?])\s+(?=[A-Z])|(?<=[.!?])\n', text)
-        return [s.strip() for s in sentences if s.strip()]
-    
-    def _get_last_sentence(self, text: str) -> str:
-        sentences = self._split_sentences(text)
-        if sentences:
-            last = sentences[-1]
-            return last if len(last) <= 200 else last[-200:]
-        return ""
-    
-    def _split_long_sentence(self, sentence: str) -> List[str]:
-        words = sentence.split()
-        chunks = []
-        current = []
-        current_len = 0
-        
-        for word in words:
-            word_len = len(word) + 1
-            if current_len + word_len <= self.chunk_size:
-                current.append(word)
-                current_len += word_len
-            else:
-                if current:
-                    chunks.append(' '.join(current))
-                current = [word]
-                current_len = word_len
-        
-        if current:
-            chunks.append(' '.join(current))
-        
-        return chunks
-    
+
     def chunk_document(self, document: Dict[str, str]) -> List[Dict]:
         text = document['content']
-        chunks = self.split_text(text)
-        
+        spans = self.split_spans(text) if text else []
+
         chunk_dicts = []
-        for i, chunk_text in enumerate(chunks):
+        for i, (start, end) in enumerate(spans):
             chunk_dicts.append({
-                'text': chunk_text,
+                'text': text[start:end],
                 'chunk_id': i,
-                'total_chunks': len(chunks),
+                'total_chunks': len(spans),
+                'char_start': start,
+                'char_end': end,
                 'source_file': document['filename'],
                 'source_path': document.get('source_path', ''),
             })
-        
+
         logger.info(f"Created {len(chunk_dicts)} chunks from {document['filename']}")
         return chunk_dicts
-    
-    def chunk_documents(self, documents: List[Dict[str, str]]) -> List[Dict]:
-        all_chunks = []
-        for doc in documents:
-            all_chunks.extend(self.chunk_document(doc))
-        
-        logger.info(f"Created {len(all_chunks)} chunks from {len(documents)} documents")
-        return all_chunks
 
+    def chunk_documents(self, documents: List[Dict[str, str]], workers: int = 1) -> List[Dict]:
+        """Chunk many documents; with workers > 1 they are spread over a process pool (order is kept)."""
+        if workers <= 1 or len(documents) <= 1:
+            per_document = [self.chunk_document(doc) for doc in documents]
+        else:
+            workers = min(workers, len(documents))
+            # spawn, like PDF conversion: the caller may already be running threads
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                per_document = list(pool.map(self.chunk_document, documents,
+                                             chunksize=max(1, len(documents) // (workers * 4))))
 
+        all_chunks = [chunk for chunks in per_document for chunk in chunks]
+        logger.info(f"Created {len(all_chunks)} chunks from {len(documents)} documents")
+        return all_chunks
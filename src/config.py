@@ -1,6 +1,7 @@
 """Configuration for the RAG system."""
 
 from pathlib import Path
+from typing import Optional
 import os
 from dotenv import load_dotenv
 
@@ -11,6 +12,8 @@ class Settings:
     uploads_dir: Path = project_root / "uploads"
     processed_dir: Path = project_root / "processed"
     chroma_dir: Path = project_root / "chroma_db"
+    cache_dir: Path = project_root / "cache"
+    manifest_path: Path = chroma_dir / "manifest.json"
     
     # Gemini API (primary)
     gemini_embedding_model: str = "text-embedding-004"
@@ -20,19 +23,96 @@ class Settings:
     ollama_host: str = "http://localhost:11434"
     ollama_embedding_model: str = "nomic-embed-text:v1.5"
     ollama_llm_model: str = "llama3.2:latest"
+    # How long Ollama keeps a model loaded after a request ("30m", "-1" = forever)
+    ollama_keep_alive: str = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+    # num_ctx models are warmed up with (fits the default packed context plus answer);
+    # doubled, up to the max, only for prompts that need more, since each change reloads the model
+    ollama_min_ctx: int = 8192
+    ollama_max_ctx: int = 32768
     
-    # Vector store
+    # Vector store ("chroma" or "numpy" for in-process exact search)
+    vector_backend: str = os.getenv('VECTOR_BACKEND', 'chroma')
+    # NumPy backend only: "int8" or "binary" codes with full-precision rescoring
+    vector_quantization: Optional[str] = os.getenv('VECTOR_QUANTIZATION') or None
     collection_name: str = "documents"
     vector_size: int = 768
+    # Target payload per vector store write; Chroma batches are also capped by the client's max batch size
+    vector_write_batch_bytes: int = 8 * 2**20
     
-    # Chunking
+    # Retrieval ("vector", "lexical" for BM25 only, or "hybrid" with reciprocal rank fusion)
+    retrieval_mode: str = os.getenv('RETRIEVAL_MODE', 'vector')
+    rrf_k: int = 60
+    # Hybrid mode answers from BM25 alone if the embedding + vector search takes longer than this
+    hybrid_vector_timeout: float = 5.0
+    
+    # Embedding cache
+    embedding_cache_path: Path = cache_dir / "embeddings.sqlite"
+    embedding_cache_max_entries: int = 200_000
+    
+    # PDF conversion (worker processes for bulk ingest, cache of converted markdown)
+    conversion_cache_dir: Path = processed_dir / ".cache"
+    conversion_workers: int = int(os.getenv('CONVERSION_WORKERS', '1'))
+    
+    # Ingestion pipeline (items buffered between convert/chunk/embed/store stages)
+    ingest_queue_size: int = 4
+    
+    # Ingestion job queue (python -m src.ingest_worker; the app and server start ingest_workers themselves)
+    jobs_db_path: Path = cache_dir / "ingest_jobs.sqlite"
+    ingest_workers: int = int(os.getenv('INGEST_WORKERS', '1'))
+    # Attempts per job, first retry delay in seconds (doubling), and how long a silent worker keeps its job
+    ingest_max_attempts: int = 3
+    ingest_retry_delay: float = 30.0
+    ingest_job_lease: float = 600.0
+    # Held by every index writer; touched after each write so readers reopen their stores
+    store_lock_path: Path = chroma_dir / ".write.lock"
+    index_generation_path: Path = chroma_dir / ".generation"
+    
+    # Query embedding cache (in-process LRU + TTL, persisted across restarts)
+    query_cache_max_entries: int = 10_000
+    query_cache_ttl_seconds: int = 24 * 3600
+    query_cache_path: Path = cache_dir / "query_embeddings.json"
+    
+    # Semantic answer cache (cosine similarity of query embeddings, same retrieved chunks)
+    answer_cache_threshold: float = 0.95
+    answer_cache_max_entries: int = 1000
+    
+    # Query embedding micro-batching (concurrent queries coalesced into one embed_batch call)
+    query_batch_window_ms: float = 5.0
+    query_batch_max_size: int = 100
+    
+    # Embedding throughput (in-flight requests and provider rate limits; 0 = unlimited)
+    embedding_max_concurrency: int = 4
+    embedding_requests_per_minute: int = 1500
+    embedding_tokens_per_minute: int = 0
+    
+    # HTTP server (python -m src.server)
+    server_host: str = os.getenv('SERVER_HOST', '127.0.0.1')
+    server_port: int = int(os.getenv('SERVER_PORT', '8000'))
+    server_workers: int = int(os.getenv('SERVER_WORKERS', '1'))
+    # Concurrent /query and /retrieve requests per worker, and how long extra ones may wait
+    server_max_concurrency: int = 64
+    server_queue_timeout: float = 10.0
+    
+    # Context packing (adjacent chunks merged, repeated sentences dropped, token budget)
+    context_packing: bool = True
+    context_max_tokens: int = 3000
+    
+    # Tracing (per-stage spans and latency histograms; TRACING=0 turns it off)
+    tracing_enabled: bool = os.getenv('TRACING', '1') != '0'
+    # Append every finished request's span tree to this file as JSON lines
+    trace_export_path: Optional[Path] = Path(os.environ['TRACE_EXPORT_PATH']) if os.getenv('TRACE_EXPORT_PATH') else None
+    
+    # Chunking (size and overlap in "chars" or "tokens")
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    chunk_unit: str = os.getenv('CHUNK_UNIT', 'chars')
     
-    def __init__(self):
+    def ensure_dirs(self):
+        """Create the data directories. Called by the app and server at startup rather than on import."""
         self.uploads_dir.mkdir(parents=True, exist_ok=True)
         self.processed_dir.mkdir(parents=True, exist_ok=True)
         self.chroma_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
 
 
 settings = Settings()
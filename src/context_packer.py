@@ -0,0 +1,124 @@
+"""Packing retrieved chunks into a compact, token-budgeted LLM context."""
+
+import logging
+import re
+from typing import Callable, Dict, List, Optional
+from .rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Sentence followed by the whitespace that separates it from the next one
+_SENTENCE_RE = re.compile(r'.+?(?:[.!?](?=\s)|$)\s*', re.S)
+
+# Sentences shorter than this ("Yes.", "1.") are too generic to treat as repeats
+MIN_DEDUP_CHARS = 20
+
+
+def _normalize(sentence: str) -> str:
+    return " ".join(sentence.lower().split())
+
+
+def merge_overlapping(first: str, second: str, max_overlap: int = 2000) -> str:
+    """Join two consecutive chunks, keeping text that ``second`` repeats from the end of ``first`` once."""
+    probe = second[:32]
+    pos = first.find(probe, max(0, len(first) - max_overlap))
+    # The earliest match is the longest overlap; it must run to the end of ``first``
+    while pos != -1:
+        if second.startswith(first[pos:]):
+            return first + second[len(first) - pos:]
+        pos = first.find(probe, pos + 1)
+
+    # Overlaps shorter than the probe, accepted only if they end on a word boundary in ``second``
+    for length in range(min(len(probe), len(first)) - 1, 7, -1):
+        if first.endswith(second[:length]) and second[length:length + 1].isspace():
+            return first + second[length:]
+    return first + "\n" + second
+
+
+class ContextPacker:
+    """Turns ranked chunks into passages that fit a token budget.
+
+    Chunks from the same source with consecutive ``chunk_id`` are merged into
+    one passage (their overlapping text kept once), sentences already present in
+    a higher-ranked passage are dropped, and passages are added in rank order
+    until ``max_tokens`` is reached; the last one is cut at a sentence boundary.
+    """
+
+    def __init__(self, max_tokens: int = 3000,
+                 token_estimator: Optional[Callable[[str], int]] = None):
+        self.max_tokens = max_tokens
+        self.estimate_tokens = token_estimator or RateLimiter.estimate_tokens
+        logger.info(f"ContextPacker initialized (max_tokens={max_tokens})")
+
+    def merge_adjacent(self, results: List[Dict]) -> List[Dict]:
+        """Group consecutive chunks per source; passages keep the rank of their best chunk."""
+        ranked = list(enumerate(results))
+        by_source: Dict[str, List] = {}
+        for rank, result in ranked:
+            by_source.setdefault(result['source_file'], []).append((rank, result))
+
+        passages = []
+        for source_file, items in by_source.items():
+            items.sort(key=lambda item: item[1]['chunk_id'])
+            current = None
+            for rank, result in items:
+                if current is not None and result['chunk_id'] <= current['last_chunk_id'] + 1:
+                    if result['chunk_id'] > current['last_chunk_id']:
+                        current['text'] = merge_overlapping(current['text'], result['text'])
+                        current['last_chunk_id'] = result['chunk_id']
+                    current['rank'] = min(current['rank'], rank)
+                    current['chunks'].append(result)
+                    continue
+                current = {
+                    'source_file': source_file,
+                    'text': result['text'],
+                    'rank': rank,
+                    'last_chunk_id': result['chunk_id'],
+                    'chunks': [result],
+                }
+                passages.append(current)
+
+        passages.sort(key=lambda passage: passage['rank'])
+        return passages
+
+    def pack(self, results: List[Dict]) -> List[Dict]:
+        """Passages (``source_file``, ``text``, ``chunks``) in rank order, within the token budget."""
+        passages = self.merge_adjacent(results)
+        seen = set()
+        packed = []
+        budget = self.max_tokens
+
+        for passage in passages:
+            header = f"[Context {len(packed) + 1} - from {passage['source_file']}]\n"
+            available = budget - self.estimate_tokens(header)
+            if available <= 0:
+                break
+
+            kept = []
+            used = 0
+            truncated = False
+            for match in _SENTENCE_RE.finditer(passage['text']):
+                sentence = match.group(0)
+                key = _normalize(sentence)
+                if len(key) >= MIN_DEDUP_CHARS:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                cost = self.estimate_tokens(sentence)
+                if used + cost > available:
+                    truncated = True
+                    break
+                kept.append(sentence)
+                used += cost
+
+            text = "".join(kept).strip()
+            if text:
+                packed.append({'source_file': passage['source_file'], 'text': text, 'chunks': passage['chunks']})
+                budget -= self.estimate_tokens(header) + used
+            if truncated:
+                break
+
+        dropped = len(results) - sum(len(p['chunks']) for p in packed)
+        logger.info(f"Packed {len(results)} chunks into {len(packed)} passages "
+                    f"(~{self.max_tokens - budget} tokens, {dropped} chunks over budget)")
+        return packed
@@ -1,24 +1,101 @@
 """PDF to markdown conversion using docling."""
 
+import hashlib
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib import metadata
 from pathlib import Path
-from typing import List, Dict
-from docling.document_converter import DocumentConverter
+from typing import TYPE_CHECKING, List, Dict, Iterable, Iterator, Optional
+from .config import settings
+from .manifest import file_sha256
+from .tracing import traced
+
+if TYPE_CHECKING:
+    from docling.document_converter import DocumentConverter
 
 logger = logging.getLogger(__name__)
 
+# Per-process converter for process_directory(workers > 1), built once per worker
+_worker_processor = None
+
+
+def _init_worker(cache_dir: Optional[Path]):
+    global _worker_processor
+    _worker_processor = DocumentProcessor(cache_dir=cache_dir, use_cache=cache_dir is not None)
+
+
+def _process_in_worker(pdf_path: Path) -> Dict[str, str]:
+    return _worker_processor.process_pdf(pdf_path)
+
 
 class DocumentProcessor:
-    def __init__(self):
-        self.converter = DocumentConverter()
+    # Part of the conversion cache key; change it whenever converter options change
+    converter_options = "DocumentConverter()"
+    
+    def __init__(self, cache_dir: Optional[Path] = None, use_cache: bool = True):
+        self._converter = None
+        self.cache_dir = (cache_dir or settings.conversion_cache_dir) if use_cache else None
         logger.info("DocumentProcessor initialized")
     
+    @property
+    def converter(self) -> "DocumentConverter":
+        # Imported and built on first cache miss, so query-only processes and
+        # fully cached runs never load docling's ML stack
+        if self._converter is None:
+            from docling.document_converter import DocumentConverter
+            self._converter = DocumentConverter()
+        return self._converter
+    
+    def cache_key(self, pdf_path: Path) -> str:
+        try:
+            docling_version = metadata.version("docling")
+        except metadata.PackageNotFoundError:
+            docling_version = "unknown"
+        payload = f"{file_sha256(pdf_path)}|docling={docling_version}|{self.converter_options}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _cache_path(self, pdf_path: Path) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{self.cache_key(pdf_path)}.md"
+    
+    def load_cached(self, pdf_path: Path, cache_path: Optional[Path] = None) -> Optional[Dict[str, str]]:
+        cache_path = cache_path or self._cache_path(pdf_path)
+        if cache_path is None or not cache_path.exists():
+            return None
+        
+        logger.info(f"Using cached conversion for {pdf_path.name}")
+        return {
+            "filename": pdf_path.stem,
+            "source_path": str(pdf_path),
+            "content": cache_path.read_text(encoding='utf-8'),
+        }
+    
+    def _store_cached(self, cache_path: Optional[Path], markdown_content: str):
+        if cache_path is None:
+            return
+        
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so concurrent workers never see a partial entry
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(markdown_content, encoding='utf-8')
+        os.replace(tmp_path, cache_path)
+    
+    @traced("document.process_pdf")
     def process_pdf(self, pdf_path: Path) -> Dict[str, str]:
         try:
+            cache_path = self._cache_path(pdf_path)
+            cached = self.load_cached(pdf_path, cache_path)
+            if cached is not None:
+                return cached
+            
             logger.info(f"Processing PDF: {pdf_path}")
             result = self.converter.convert(str(pdf_path))
             markdown_content = result.document.export_to_markdown()
             logger.info(f"Successfully converted {pdf_path.name}")
+            self._store_cached(cache_path, markdown_content)
             
             return {
                 "filename": pdf_path.stem,
@@ -29,7 +106,7 @@ class DocumentProcessor:
             logger.error(f"Error processing {pdf_path}: {str(e)}")
             raise
     
-    def process_directory(self, directory: Path) -> List[Dict[str, str]]:
+    def process_directory(self, directory: Path, workers: int = 1) -> List[Dict[str, str]]:
         pdf_files = list(directory.glob("*.pdf"))
         
         if not pdf_files:
@@ -37,16 +114,58 @@ class DocumentProcessor:
             return []
         
         logger.info(f"Found {len(pdf_files)} PDF files")
+        documents = list(self.iter_pdfs(pdf_files, workers=workers))
+        logger.info(f"Processed {len(documents)}/{len(pdf_files)} documents")
+        return documents
+    
+    def iter_pdfs(self, pdf_files: Iterable[Path], workers: int = 1) -> Iterator[Dict[str, str]]:
+        """Convert PDFs, yielding each document as soon as it is ready.
+        
+        With workers > 1 files are spread over a process pool and yielded in
+        completion order. Files that fail are logged and skipped.
+        """
+        pdf_files = list(pdf_files)
+        if workers <= 1 or len(pdf_files) <= 1:
+            for pdf_path in pdf_files:
+                try:
+                    yield self.process_pdf(pdf_path)
+                except Exception as e:
+                    logger.error(f"Failed to process {pdf_path.name}: {str(e)}")
+            return
         
-        documents = []
+        # Cache hits are served here; only real conversions go to the pool
+        to_convert = []
         for pdf_path in pdf_files:
             try:
-                documents.append(self.process_pdf(pdf_path))
+                cached = self.load_cached(pdf_path)
             except Exception as e:
                 logger.error(f"Failed to process {pdf_path.name}: {str(e)}")
+                continue
+            if cached is not None:
+                yield cached
+            else:
+                to_convert.append(pdf_path)
+        if not to_convert:
+            return
         
-        logger.info(f"Processed {len(documents)}/{len(pdf_files)} documents")
-        return documents
+        workers = min(workers, len(to_convert))
+        logger.info(f"Converting {len(to_convert)} PDFs with {workers} worker processes")
+        
+        # spawn: docling's ML stack is not fork-safe once its threads are running
+        context = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(self.cache_dir,))
+        try:
+            futures = {pool.submit(_process_in_worker, pdf_path): pdf_path for pdf_path in to_convert}
+            for future in as_completed(futures):
+                pdf_path = futures[future]
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.error(f"Failed to process {pdf_path.name}: {str(e)}")
+        finally:
+            # Also reached when the consumer stops early: drop queued files
+            pool.shutdown(wait=True, cancel_futures=True)
     
     def save_markdown(self, document: Dict[str, str], output_dir: Path) -> Path:
         output_dir.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,117 @@
+"""Micro-batching of concurrent single-text embedding requests."""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from .metrics import MetricsRegistry, SIZE_BUCKETS, metrics as default_metrics
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class EmbeddingBatcher:
+    """Coalesces ``embed_text`` calls from many threads into ``embed_batch`` calls.
+
+    A batch opens with the first waiting request and is sent once ``window_ms``
+    has passed or ``max_batch_size`` texts are waiting, whichever comes first.
+    Each caller blocks only on its own future (``embed_text_async`` awaits it
+    instead). Up to ``max_in_flight`` batches
+    are sent concurrently while the next one is being collected.
+
+    Drop-in for the wrapped embedder: any other attribute (``model_name``,
+    ``embed_batch``, ...) is delegated to it.
+    """
+
+    def __init__(self, embedder, window_ms: float = 5.0, max_batch_size: int = 100, max_in_flight: int = 4,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.embedder = embedder
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        registry = metrics or default_metrics
+        self.queue_wait_ms = registry.histogram(
+            "embedding_batcher_queue_wait_ms", description="Time a query waited before its batch was sent"
+        )
+        self.batch_size = registry.histogram(
+            "embedding_batcher_batch_size", SIZE_BUCKETS, description="Texts per coalesced embedding call"
+        )
+        self._requests: "queue.Queue" = queue.Queue()
+        self._senders = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embedding-batch")
+        self._thread = threading.Thread(target=self._collect, name="embedding-batcher", daemon=True)
+        self._thread.start()
+        logger.info(f"EmbeddingBatcher initialized (window={window_ms}ms, max_batch_size={max_batch_size})")
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._requests.put((text, future, time.monotonic()))
+        return future
+
+    @traced("embedding.batched_embed_text")
+    def embed_text(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    async def embed_text_async(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(self):
+        while True:
+            first = self._requests.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = first[2] + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._senders.submit(self._send, batch)
+                    return
+                batch.append(item)
+            self._senders.submit(self._send, batch)
+
+    def _send(self, batch: List[Tuple[str, Future, float]]):
+        sent = time.monotonic()
+        for _, _, queued in batch:
+            self.queue_wait_ms.observe((sent - queued) * 1000)
+
+        # Identical concurrent queries share one slot in the request
+        waiting: Dict[str, List[Future]] = {}
+        for text, future, _ in batch:
+            waiting.setdefault(text, []).append(future)
+        texts = list(waiting)
+        self.batch_size.observe(len(texts))
+
+        try:
+            embeddings = self.embedder.embed_batch(texts)
+        except Exception as e:
+            logger.error(f"Coalesced embedding call for {len(texts)} texts failed: {str(e)}")
+            for futures in waiting.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        for text, embedding in zip(texts, embeddings):
+            for future in waiting[text]:
+                if embedding is None:
+                    future.set_exception(RuntimeError(f"Embedding failed for query: {text[:100]}"))
+                else:
+                    future.set_result(embedding)
+
+    def close(self):
+        """Send whatever is queued, then stop the collector thread."""
+        self._requests.put(_STOP)
+        self._thread.join()
+        self._senders.shutdown(wait=True)
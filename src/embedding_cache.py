@@ -0,0 +1,137 @@
+"""Persistent, content-addressed cache for text embeddings."""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache keyed by (model name, normalized text).
+
+    Entries are evicted least-recently-used first once ``max_entries`` is exceeded.
+    Vectors are stored as packed float32, which is also what the vector store keeps.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 200_000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        logger.info(f"EmbeddingCache initialized ({self.path}, max_entries={max_entries})")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def make_key(self, model_name: str, text: str) -> str:
+        payload = f"{model_name}\x00{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model_name, [text])[0]
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up several texts at once; misses come back as None."""
+        keys = [self.make_key(model_name, text) for text in texts]
+        found: Dict[str, bytes] = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+        results = []
+        for key in keys:
+            blob = found.get(key)
+            if blob is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append(array('f', blob).tolist())
+        return results
+
+    def put(self, model_name: str, text: str, vector: List[float]):
+        self.put_many(model_name, [text], [vector])
+
+    def put_many(self, model_name: str, texts: List[str], vectors: List[List[float]]):
+        rows = []
+        now = time.time()
+        for text, vector in zip(texts, vectors):
+            # Never cache missing or zero-vector fallbacks
+            if vector is None or not any(vector):
+                continue
+            rows.append((self.make_key(model_name, text), array('f', vector).tobytes(), now))
+
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+            logger.info(f"Evicted {excess} cached embeddings")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
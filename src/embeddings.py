@@ -1,16 +1,64 @@
 """Vector embedding generation using Google Gemini API."""
 
+import asyncio
 import logging
 import os
-from typing import List
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import httpx
 from google import genai
+from .embedding_cache import EmbeddingCache
+from .rate_limiter import RateLimiter
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# HTTP statuses worth retrying as-is; other API errors are treated as a bad input
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+# Failures without an HTTP status that are worth retrying: the request got no answer at all
+TRANSPORT_ERRORS = (ConnectionError, TimeoutError, httpx.TransportError)
+
+
+def _error_code(error: Exception) -> Optional[int]:
+    code = getattr(error, 'code', None)
+    return code if isinstance(code, int) else None
+
+
+def _is_retryable(error: Exception) -> bool:
+    code = _error_code(error)
+    if code is None:
+        # Anything but a timeout or dropped connection (a bug, a malformed response) fails fast
+        return isinstance(error, TRANSPORT_ERRORS)
+    return code in RETRYABLE_CODES
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Server-requested delay from a Retry-After header or a RetryInfo detail."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers is not None:
+        value = headers.get('retry-after')
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    
+    match = re.search(r"retryDelay'?\"?:\s*'?\"?(\d+(?:\.\d+)?)s", str(getattr(error, 'details', '')))
+    return float(match.group(1)) if match else None
+
 
 class EmbeddingGenerator:
-    def __init__(self, model_name: str = "text-embedding-004"):
+    def __init__(self, model_name: str = "text-embedding-004", cache: Optional[EmbeddingCache] = None,
+                 max_concurrency: int = 1, rate_limiter: Optional[RateLimiter] = None, max_retries: int = 5):
         self.model_name = model_name
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
         
         # Check for API key
         api_key = os.getenv('GEMINI_API_KEY')
@@ -20,8 +68,7 @@ class EmbeddingGenerator:
         self.client = genai.Client(api_key=api_key)
         logger.info(f"EmbeddingGenerator initialized (Gemini {model_name})")
     
-    def embed_text(self, text: str) -> List[float]:
-        """Generate embedding for a single text."""
+    def _prepare_text(self, text: str) -> str:
         max_chars = 10000  # Gemini's limit
         if len(text) > max_chars:
             logger.warning(f"Truncating text from {len(text)} to {max_chars} chars")
@@ -31,25 +78,96 @@ class EmbeddingGenerator:
         if not text:
             logger.warning("Empty text, using placeholder")
             text = "empty"
+        return text
+    
+    @traced("embedding.embed_text")
+    def embed_text(self, text: str) -> List[float]:
+        """Generate embedding for a single text."""
+        text = self._prepare_text(text)
+        
+        if self.cache is not None:
+            cached = self.cache.get(self.model_name, text)
+            if cached is not None:
+                return cached
         
         try:
-            result = self.client.models.embed_content(
-                model=self.model_name,
-                contents=text
-            )
-            return result.embeddings[0].values
+            embedding = self._request_embeddings([text])[0]
+            if self.cache is not None:
+                self.cache.put(self.model_name, text, embedding)
+            return embedding
             
         except Exception as e:
             logger.error(f"Embedding failed: {str(e)}")
             logger.error(f"Text length: {len(text)} chars, preview: {text[:100]}...")
             raise
     
-    def embed_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
+    async def embed_text_async(self, text: str) -> List[float]:
+        """embed_text on the google-genai ``aio`` client; waits without holding a thread."""
+        text = self._prepare_text(text)
+        
+        if self.cache is not None:
+            cached = self.cache.get(self.model_name, text)
+            if cached is not None:
+                return cached
+        
+        try:
+            embedding = (await self._request_embeddings_async([text]))[0]
+            if self.cache is not None:
+                self.cache.put(self.model_name, text, embedding)
+            return embedding
+            
+        except Exception as e:
+            logger.error(f"Embedding failed: {str(e)}")
+            raise
+    
+    async def _request_embeddings_async(self, texts: List[str]) -> List[List[float]]:
+        """Async _request_embeddings, with the same retry policy."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.rate_limiter is not None:
+                    # The limiter blocks, so wait for it on a worker thread
+                    await asyncio.to_thread(self.rate_limiter.acquire,
+                                            sum(RateLimiter.estimate_tokens(text) for text in texts))
+                result = await self.client.aio.models.embed_content(
+                    model=self.model_name,
+                    contents=texts if len(texts) > 1 else texts[0]
+                )
+                return [emb.values for emb in result.embeddings]
+            except Exception as e:
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    raise
+                wait_time = _retry_after(e) or (2 ** attempt) * (1 + random.random() / 2)
+                logger.warning(f"Embedding request failed ({str(e)[:100]}), retrying in {wait_time:.1f}s...")
+                await asyncio.sleep(wait_time)
+    
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """One embed_content call, retried with exponential backoff on 429/5xx."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(sum(RateLimiter.estimate_tokens(text) for text in texts))
+                result = self.client.models.embed_content(
+                    model=self.model_name,
+                    contents=texts if len(texts) > 1 else texts[0]
+                )
+                return [emb.values for emb in result.embeddings]
+            except Exception as e:
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    raise
+                # Honor the server's delay on 429s, otherwise back off 1s, 2s, 4s... with jitter
+                wait_time = _retry_after(e) or (2 ** attempt) * (1 + random.random() / 2)
+                logger.warning(f"Embedding request failed ({str(e)[:100]}), retrying in {wait_time:.1f}s...")
+                time.sleep(wait_time)
+    
+    @traced("embedding.embed_batch")
+    def embed_batch(self, texts: List[str], batch_size: int = 100) -> List[Optional[List[float]]]:
         """Generate embeddings for multiple texts using batch API calls.
         
         Args:
             texts: List of texts to embed
             batch_size: Maximum number of texts to send in a single API call (default 100)
+        
+        Returns one embedding per text, or None for texts that could not be embedded.
         """
         logger.info(f"Generating embeddings for {len(texts)} texts in batches of {batch_size}...")
         
@@ -64,55 +182,81 @@ class EmbeddingGenerator:
                 text = text[:max_chars]
             processed_texts.append(text)
         
-        all_embeddings = []
-        failed_batches = []
+        if self.cache is None:
+            return self._embed_uncached(processed_texts, batch_size)
+        
+        # Only cache misses are sent to the API
+        all_embeddings = self.cache.get_many(self.model_name, processed_texts)
+        miss_indices = [i for i, emb in enumerate(all_embeddings) if emb is None]
+        logger.info(f"Embedding cache: {len(texts) - len(miss_indices)} hits, {len(miss_indices)} misses")
+        
+        if miss_indices:
+            # Duplicate texts within the batch are embedded once
+            miss_texts = list(dict.fromkeys(processed_texts[i] for i in miss_indices))
+            miss_embeddings = self._embed_uncached(miss_texts, batch_size)
+            self.cache.put_many(self.model_name, miss_texts, miss_embeddings)
+            by_text = dict(zip(miss_texts, miss_embeddings))
+            for i in miss_indices:
+                all_embeddings[i] = by_text[processed_texts[i]]
         
-        # Process in batches
-        for i in range(0, len(processed_texts), batch_size):
-            batch = processed_texts[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (len(processed_texts) + batch_size - 1) // batch_size
-            
-            try:
-                # Make a single API call for the entire batch
-                result = self.client.models.embed_content(
-                    model=self.model_name,
-                    contents=batch
-                )
-                
-                # Extract embeddings from batch result
-                batch_embeddings = [emb.values for emb in result.embeddings]
-                all_embeddings.extend(batch_embeddings)
-                
-                logger.info(f"Batch {batch_num}/{total_batches} completed: {len(batch_embeddings)} embeddings")
-                
-            except Exception as e:
-                logger.error(f"Batch {batch_num}/{total_batches} failed: {str(e)}")
-                failed_batches.append((i, i + len(batch)))
-                
-                # Fallback: try individual embeddings for failed batch
-                logger.warning(f"Attempting individual embeddings for failed batch {batch_num}...")
-                for j, text in enumerate(batch):
-                    try:
-                        all_embeddings.append(self.embed_text(text))
-                    except Exception as fallback_error:
-                        logger.error(f"Failed individual embedding at index {i+j}: {str(fallback_error)}")
-                        # Use zero vector as last resort
-                        all_embeddings.append([0.0] * 768)  # text-embedding-004 is 768 dims
-        
-        if failed_batches:
-            logger.warning(f"Failed batches (recovered via fallback): {failed_batches}")
-        
-        logger.info(f"Generated {len(all_embeddings)} embeddings total")
         return all_embeddings
     
+    def _embed_uncached(self, processed_texts: List[str], batch_size: int) -> List[Optional[List[float]]]:
+        batches = [processed_texts[i:i + batch_size] for i in range(0, len(processed_texts), batch_size)]
+        
+        # Batches run concurrently (bounded by max_concurrency); map() keeps input order
+        if self.max_concurrency > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(self._embed_one_batch, range(len(batches)), batches,
+                                        [len(batches)] * len(batches)))
+        else:
+            results = [self._embed_one_batch(i, batch, len(batches)) for i, batch in enumerate(batches)]
+        
+        all_embeddings = [embedding for batch_embeddings in results for embedding in batch_embeddings]
+        failed = sum(embedding is None for embedding in all_embeddings)
+        if failed:
+            logger.warning(f"Failed to embed {failed}/{len(all_embeddings)} texts")
+        logger.info(f"Generated {len(all_embeddings) - failed} embeddings total")
+        return all_embeddings
+    
+    def _embed_one_batch(self, index: int, batch: List[str], total_batches: int) -> List[Optional[List[float]]]:
+        batch_embeddings = self._embed_bisect(batch)
+        logger.info(f"Batch {index + 1}/{total_batches} completed: "
+                    f"{sum(e is not None for e in batch_embeddings)}/{len(batch)} embeddings")
+        return batch_embeddings
+    
+    def _embed_bisect(self, batch: List[str]) -> List[Optional[List[float]]]:
+        """Embed a batch, splitting it in half recursively to isolate inputs the API rejects."""
+        try:
+            return self._request_embeddings(batch)
+        except Exception as e:
+            if _is_retryable(e):
+                # Still rate-limited/unavailable after retries: splitting would only add calls
+                logger.error(f"Giving up on batch of {len(batch)} after retries: {str(e)}")
+                return [None] * len(batch)
+            if len(batch) == 1:
+                logger.error(f"Failed to embed text ({len(batch[0])} chars, preview: {batch[0][:100]}...): {str(e)}")
+                return [None]
+            
+            mid = len(batch) // 2
+            logger.warning(f"Batch of {len(batch)} failed, splitting: {str(e)}")
+            return self._embed_bisect(batch[:mid]) + self._embed_bisect(batch[mid:])
+    
     def embed_chunks(self, chunks: List[dict]) -> List[dict]:
-        """Add embeddings to chunk dictionaries."""
+        """Add embeddings to chunk dictionaries.
+        
+        Chunks that could not be embedded are logged and left out of the result.
+        """
         texts = [chunk['text'] for chunk in chunks]
         embeddings = self.embed_batch(texts)
         
+        embedded = []
         for chunk, embedding in zip(chunks, embeddings):
+            if embedding is None:
+                logger.error(f"Skipping chunk {chunk.get('chunk_id')} of {chunk.get('source_file')}: embedding failed")
+                continue
             chunk['embedding'] = embedding
+            embedded.append(chunk)
         
-        return chunks
+        return embedded
 
@@ -1,20 +1,37 @@
 """Vector embedding generation using Ollama."""
 
+import asyncio
 import logging
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 import time
-import ollama
+from .config import settings
+from .embedding_cache import EmbeddingCache
+from .ollama_session import OllamaSession
+from .rate_limiter import RateLimiter
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
 
 class EmbeddingGenerator:
-    def __init__(self, model_name: str = "nomic-embed-text:v1.5", host: str = "http://localhost:11434"):
+    def __init__(self, model_name: str = "nomic-embed-text:v1.5", host: str = "http://localhost:11434",
+                 cache: Optional[EmbeddingCache] = None, max_concurrency: int = 1,
+                 rate_limiter: Optional[RateLimiter] = None, session: Optional[OllamaSession] = None,
+                 warmup: bool = True):
         self.model_name = model_name
         self.host = host
-        self.client = ollama.Client(host=host)
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = rate_limiter
+        # Shared with the generator when both run against the same Ollama host
+        self.session = session or OllamaSession(host, keep_alive=settings.ollama_keep_alive,
+                                                min_ctx=settings.ollama_min_ctx, max_ctx=settings.ollama_max_ctx)
+        self.client = self.session.client
         logger.info(f"EmbeddingGenerator initialized ({model_name})")
         self._verify_model()
+        if warmup:
+            self.session.warmup(model_name, embedding=True)
     
     def _verify_model(self):
         try:
@@ -35,7 +52,7 @@ class EmbeddingGenerator:
             logger.error(f"Failed to connect to Ollama: {str(e)}")
             raise
     
-    def embed_text(self, text: str, retries: int = 3) -> List[float]:
+    def _clean_text(self, text: str) -> str:
         max_chars = 8192
         if len(text) > max_chars:
             logger.warning(f"Truncating text from {len(text)} to {max_chars} chars")
@@ -46,11 +63,66 @@ class EmbeddingGenerator:
         if not text:
             logger.warning("Empty text after cleaning, using placeholder")
             text = "empty"
+        return text
+    
+    @traced("embedding.embed_text")
+    def embed_text(self, text: str, retries: int = 3) -> List[float]:
+        text = self._clean_text(text)
+        
+        if self.cache is not None:
+            cached = self.cache.get(self.model_name, text)
+            if cached is not None:
+                return cached
+        
+        embedding = self._request_embedding(text, retries)
+        if self.cache is not None:
+            self.cache.put(self.model_name, text, embedding)
+        return embedding
+    
+    async def embed_text_async(self, text: str, retries: int = 3) -> List[float]:
+        """embed_text on ``ollama.AsyncClient``; waits without holding a thread."""
+        text = self._clean_text(text)
+        
+        if self.cache is not None:
+            cached = self.cache.get(self.model_name, text)
+            if cached is not None:
+                return cached
+        
+        for attempt in range(retries):
+            try:
+                if self.rate_limiter is not None:
+                    await asyncio.to_thread(self.rate_limiter.acquire, RateLimiter.estimate_tokens(text))
+                response = await self.session.async_client.embed(
+                    model=self.model_name, input=[text], keep_alive=self.session.keep_alive
+                )
+                self.session.record(self.model_name, response)
+                embedding = response['embeddings'][0]
+                break
+            except Exception as e:
+                if attempt < retries - 1:
+                    wait_time = 2 ** attempt
+                    logger.warning(f"Attempt {attempt + 1} failed, retrying in {wait_time}s...")
+                    await asyncio.sleep(wait_time)
+                else:
+                    logger.error(f"Failed after {retries} attempts: {str(e)}")
+                    raise
         
+        if self.cache is not None:
+            self.cache.put(self.model_name, text, embedding)
+        return embedding
+    
+    def _request_embedding(self, text: str, retries: int = 3) -> List[float]:
+        return self._request_embeddings([text], retries)[0]
+    
+    def _request_embeddings(self, texts: List[str], retries: int = 3) -> List[List[float]]:
+        """One multi-input /api/embed call for a list of texts."""
         for attempt in range(retries):
             try:
-                response = self.client.embeddings(model=self.model_name, prompt=text)
-                return response['embedding']
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(sum(RateLimiter.estimate_tokens(text) for text in texts))
+                response = self.client.embed(model=self.model_name, input=texts, keep_alive=self.session.keep_alive)
+                self.session.record(self.model_name, response)
+                return response['embeddings']
             except Exception as e:
                 if attempt < retries - 1:
                     wait_time = 2 ** attempt  # Exponential backoff: 1s, 2s, 4s
@@ -58,27 +130,37 @@ class EmbeddingGenerator:
                     time.sleep(wait_time)
                 else:
                     logger.error(f"Failed after {retries} attempts: {str(e)}")
-                    logger.error(f"Text length: {len(text)} chars, preview: {text[:100]}...")
+                    logger.error(f"Batch of {len(texts)} texts, first preview: {texts[0][:100]}...")
                     raise
     
-    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+    @traced("embedding.embed_batch")
+    def embed_batch(self, texts: List[str], batch_size: int = 32) -> List[Optional[List[float]]]:
+        """Embed texts in multi-input batches; failed texts come back as None."""
         logger.info(f"Generating embeddings for {len(texts)} texts...")
-        embeddings = []
-        failed_indices = []
         
-        for i, text in enumerate(texts):
-            try:
-                embeddings.append(self.embed_text(text))
-                if (i + 1) % 10 == 0:
-                    logger.info(f"Progress: {i + 1}/{len(texts)}")
-                # Small delay to prevent overwhelming Ollama
-                time.sleep(0.1)
-            except Exception as e:
-                logger.error(f"Failed on chunk {i+1}/{len(texts)}")
-                failed_indices.append(i)
-                # Use zero vector as fallback to continue processing
-                logger.warning(f"Using zero vector for failed chunk {i+1}")
-                embeddings.append([0.0] * 768)  # nomic-embed-text is 768 dims
+        cleaned_texts = [self._clean_text(text) for text in texts]
+        if self.cache is not None:
+            embeddings = self.cache.get_many(self.model_name, cleaned_texts)
+            logger.info(f"Embedding cache: {sum(e is not None for e in embeddings)} hits")
+        else:
+            embeddings = [None] * len(cleaned_texts)
+        
+        miss_indices = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        batches = [miss_indices[i:i + batch_size] for i in range(0, len(miss_indices), batch_size)]
+        
+        # Batches run concurrently (bounded by max_concurrency); map() keeps input order
+        if self.max_concurrency > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(lambda batch: self._embed_indices(cleaned_texts, batch), batches))
+        else:
+            results = [self._embed_indices(cleaned_texts, batch) for batch in batches]
+        
+        failed_indices = []
+        for batch, batch_embeddings in zip(batches, results):
+            for i, embedding in zip(batch, batch_embeddings):
+                if embedding is None:
+                    failed_indices.append(i)
+                embeddings[i] = embedding
         
         if failed_indices:
             logger.warning(f"Failed to embed {len(failed_indices)} chunks: {failed_indices[:10]}...")
@@ -86,13 +168,38 @@ class EmbeddingGenerator:
         logger.info(f"Generated {len(embeddings)} embeddings ({len(embeddings) - len(failed_indices)} successful)")
         return embeddings
     
+    def _embed_indices(self, texts: List[str], indices: List[int]) -> List[Optional[List[float]]]:
+        batch = [texts[i] for i in indices]
+        try:
+            batch_embeddings = self._request_embeddings(batch)
+        except Exception:
+            # Fall back to one call per text so one bad input doesn't sink the batch
+            logger.warning(f"Batch of {len(batch)} failed, retrying texts individually...")
+            batch_embeddings = []
+            for i, text in zip(indices, batch):
+                try:
+                    batch_embeddings.append(self._request_embedding(text, retries=1))
+                except Exception:
+                    logger.error(f"Failed on chunk {i+1}/{len(texts)}")
+                    batch_embeddings.append(None)
+        
+        if self.cache is not None:
+            self.cache.put_many(self.model_name, batch, batch_embeddings)
+        logger.info(f"Embedded batch of {len(batch)} texts")
+        return batch_embeddings
+    
     def embed_chunks(self, chunks: List[dict]) -> List[dict]:
         texts = [chunk['text'] for chunk in chunks]
         embeddings = self.embed_batch(texts)
         
+        embedded = []
         for chunk, embedding in zip(chunks, embeddings):
+            if embedding is None:
+                logger.error(f"Skipping chunk {chunk.get('chunk_id')} of {chunk.get('source_file')}: embedding failed")
+                continue
             chunk['embedding'] = embedding
+            embedded.append(chunk)
         
-        return chunks
+        return embedded
 
 
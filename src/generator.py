@@ -2,12 +2,48 @@
 
 import logging
 import os
+from typing import AsyncIterator
 from google import genai
+from .tracing import traced, tracer
 
 logger = logging.getLogger(__name__)
 
 
-class Generator:
+def _build_prompt(query: str, context: str) -> str:
+    """Build the prompt with context and instructions."""
+    return f"""You are a helpful assistant that provides detailed answers based on the provided context.
+
+Context:
+{context}
+
+Question: {query}
+
+Instructions:
+- Provide a thorough answer based on the information in the context
+- Include all relevant details and explanations
+- If the context doesn't contain enough information, explain what's missing
+- Cite which context section you're referencing when relevant
+- Break down complex topics clearly
+
+Answer:"""
+
+
+def _generation_config(max_tokens: int) -> dict:
+    return {
+        'max_output_tokens': max_tokens,
+        'temperature': 0.7,
+        'top_p': 0.9,
+        'top_k': 40,
+    }
+
+
+class _GeminiGenerator:
+    """Client, request and response handling shared by Generator and AsyncGenerator.
+
+    Only the client calls and the stream loop differ between the two, since
+    they are sync on one and awaited on the other.
+    """
+
     def __init__(self, model_name: str = "gemini-2.0-flash-exp"):
         self.model_name = model_name
         
@@ -17,77 +53,88 @@ class Generator:
             raise ValueError("GEMINI_API_KEY environment variable not set")
         
         self.client = genai.Client(api_key=api_key)
-        logger.info(f"Generator initialized (Gemini {model_name})")
+        logger.info(f"{type(self).__name__} initialized (Gemini {model_name})")
+    
+    def _request(self, query: str, context: str, max_tokens: int, stream: bool = False) -> dict:
+        logger.info(f"{'Streaming' if stream else 'Generating'} answer (max_tokens={max_tokens})...")
+        return {
+            'model': self.model_name,
+            'contents': self._build_prompt(query, context),
+            'config': _generation_config(max_tokens),
+        }
     
+    def _answer(self, response) -> str:
+        answer = response.text
+        logger.info(f"Generated {len(answer)} chars (~{len(answer.split())} words)")
+        return answer
+    
+    def _error(self, error: Exception, stream: bool = False) -> str:
+        logger.error(f"{'Stream failed' if stream else 'Failed to generate answer'}: {str(error)}")
+        return f"Error: {str(error)}"
+    
+    def _build_prompt(self, query: str, context: str) -> str:
+        """Build the prompt with context and instructions."""
+        return _build_prompt(query, context)
+
+
+class Generator(_GeminiGenerator):
+    @traced("generator.generate_answer")
     def generate_answer(self, query: str, context: str, max_tokens: int = 500) -> str:
         """Generate a complete answer (non-streaming)."""
-        prompt = self._build_prompt(query, context)
-        logger.info(f"Generating answer (max_tokens={max_tokens})...")
-        
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config={
-                    'max_output_tokens': max_tokens,
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'top_k': 40,
-                }
-            )
-            
-            answer = response.text
-            logger.info(f"Generated {len(answer)} chars (~{len(answer.split())} words)")
-            return answer
-            
+            return self._answer(self.client.models.generate_content(**self._request(query, context, max_tokens)))
         except Exception as e:
-            logger.error(f"Failed to generate answer: {str(e)}")
-            return f"Error: {str(e)}"
+            return self._error(e)
     
     def generate_answer_stream(self, query: str, context: str, max_tokens: int = 500):
         """Generate answer with streaming (yields text chunks)."""
-        prompt = self._build_prompt(query, context)
-        logger.info(f"Streaming answer (max_tokens={max_tokens})...")
+        request = self._request(query, context, max_tokens, stream=True)
+        trace = tracer.stream("generator.stream", model=self.model_name)
         
         try:
-            response_stream = self.client.models.generate_content_stream(
-                model=self.model_name,
-                contents=prompt,
-                config={
-                    'max_output_tokens': max_tokens,
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'top_k': 40,
-                }
-            )
-            
-            full_text = ""
-            for chunk in response_stream:
+            chars = 0
+            for chunk in self.client.models.generate_content_stream(**request):
                 if chunk.text:
-                    full_text += chunk.text
+                    chars += len(chunk.text)
+                    trace.piece(chunk.text)
                     yield chunk.text
             
-            logger.info(f"Stream complete ({len(full_text)} chars)")
+            logger.info(f"Stream complete ({chars} chars)")
             
         except Exception as e:
-            logger.error(f"Stream failed: {str(e)}")
-            yield f"Error: {str(e)}"
-    
-    def _build_prompt(self, query: str, context: str) -> str:
-        """Build the prompt with context and instructions."""
-        return f"""You are a helpful assistant that provides detailed answers based on the provided context.
+            yield self._error(e, stream=True)
+        finally:
+            trace.finish()
 
-Context:
-{context}
 
-Question: {query}
+class AsyncGenerator(_GeminiGenerator):
+    """Async counterpart of Generator on the google-genai ``aio`` client.
 
-Instructions:
-- Provide a thorough answer based on the information in the context
-- Include all relevant details and explanations
-- If the context doesn't contain enough information, explain what's missing
-- Cite which context section you're referencing when relevant
-- Break down complex topics clearly
-
-Answer:"""
+    ``generate_answer`` is a coroutine and ``generate_answer_stream`` an async
+    iterator, so one event loop can serve many concurrent answers.
+    """
 
+    async def generate_answer(self, query: str, context: str, max_tokens: int = 500) -> str:
+        try:
+            return self._answer(await self.client.aio.models.generate_content(**self._request(query, context, max_tokens)))
+        except Exception as e:
+            return self._error(e)
+    
+    async def generate_answer_stream(self, query: str, context: str, max_tokens: int = 500) -> AsyncIterator[str]:
+        request = self._request(query, context, max_tokens, stream=True)
+        trace = tracer.stream("generator.stream", model=self.model_name)
+        
+        try:
+            chars = 0
+            async for chunk in await self.client.aio.models.generate_content_stream(**request):
+                if chunk.text:
+                    chars += len(chunk.text)
+                    trace.piece(chunk.text)
+                    yield chunk.text
+            
+            logger.info(f"Stream complete ({chars} chars)")
+            
+        except Exception as e:
+            yield self._error(e, stream=True)
+        finally:
+            trace.finish()
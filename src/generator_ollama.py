@@ -1,89 +1,165 @@
 """LLM-based answer generation."""
 
 import logging
-import ollama
+from typing import AsyncIterator, Optional
+from .config import settings
+from .ollama_session import OllamaSession
+from .tracing import traced, tracer
 
 logger = logging.getLogger(__name__)
 
 
-class Generator:
-    def __init__(self, model_name: str = "llama3.2:latest", host: str = "http://localhost:11434"):
+def _build_prompt(query: str, context: str) -> str:
+    return f"""You are a helpful assistant that provides detailed answers based on the provided context.
+
+Context:
+{context}
+
+Question: {query}
+
+Instructions:
+- Provide a thorough answer based on the information in the context
+- Include all relevant details and explanations
+- If the context doesn't contain enough information, explain what's missing
+- Cite which context section you're referencing when relevant
+- Break down complex topics clearly
+
+Answer:"""
+
+
+def _session_for(host: str) -> OllamaSession:
+    return OllamaSession(host, keep_alive=settings.ollama_keep_alive, min_ctx=settings.ollama_min_ctx,
+                         max_ctx=settings.ollama_max_ctx)
+
+
+def _generation_options(max_tokens: int) -> dict:
+    return {
+        'num_predict': max_tokens,
+        'temperature': 0.7,
+        'top_p': 0.9,
+        'top_k': 40,
+        'repeat_penalty': 1.1,
+    }
+
+
+class _OllamaGenerator:
+    """Session, request and response handling shared by Generator and AsyncGenerator.
+
+    Only the client (``ollama.Client`` or ``ollama.AsyncClient``) and the
+    stream loop differ between the two.
+    """
+
+    def __init__(self, model_name: str = "llama3.2:latest", host: str = "http://localhost:11434",
+                 session: Optional[OllamaSession] = None, warmup: bool = True):
         self.model_name = model_name
         self.host = host
-        self.client = ollama.Client(host=host)
-        logger.info(f"Generator initialized ({model_name})")
+        # The session keeps the model loaded and sizes num_ctx to the prompts
+        self.session = session or _session_for(host)
+        self.client = self._client()
+        if warmup:
+            self.session.warmup(model_name)
+        logger.info(f"{type(self).__name__} initialized ({model_name})")
     
-    def generate_answer(self, query: str, context: str, max_tokens: int = 500) -> str:
+    def _client(self):
+        raise NotImplementedError
+    
+    def _options(self, prompt: str, max_tokens: int) -> dict:
+        num_ctx = self.session.num_ctx_for(prompt, max_tokens, self.model_name)
+        return {**_generation_options(max_tokens), 'num_ctx': num_ctx}
+    
+    def _request(self, query: str, context: str, max_tokens: int, stream: bool = False) -> dict:
+        logger.info(f"{'Streaming' if stream else 'Generating'} answer (max_tokens={max_tokens})...")
         prompt = self._build_prompt(query, context)
-        logger.info(f"Generating answer (max_tokens={max_tokens})...")
-        
+        return {
+            'model': self.model_name,
+            'prompt': prompt,
+            'options': self._options(prompt, max_tokens),
+            'keep_alive': self.session.keep_alive,
+            'stream': stream,
+        }
+    
+    def _answer(self, response, prompt: str) -> str:
+        self.session.record(self.model_name, response, prompt)
+        answer = response['response']
+        logger.info(f"Generated {len(answer)} chars (~{len(answer.split())} words)")
+        return answer
+    
+    def _chunk_text(self, chunk, prompt: str) -> str:
+        if chunk.get('done'):
+            # Timings arrive with the final chunk
+            self.session.record(self.model_name, chunk, prompt)
+        return chunk.get('response', "")
+    
+    def _error(self, error: Exception, stream: bool = False) -> str:
+        logger.error(f"{'Stream failed' if stream else 'Failed to generate answer'}: {str(error)}")
+        return f"Error: {str(error)}"
+    
+    def _build_prompt(self, query: str, context: str) -> str:
+        return _build_prompt(query, context)
+
+
+class Generator(_OllamaGenerator):
+    def _client(self):
+        return self.session.client
+    
+    @traced("generator.generate_answer")
+    def generate_answer(self, query: str, context: str, max_tokens: int = 500) -> str:
+        request = self._request(query, context, max_tokens)
         try:
-            response = self.client.generate(
-                model=self.model_name,
-                prompt=prompt,
-                options={
-                    'num_predict': max_tokens,
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'top_k': 40,
-                    'repeat_penalty': 1.1,
-                },
-                stream=False
-            )
-            
-            answer = response['response']
-            logger.info(f"Generated {len(answer)} chars (~{len(answer.split())} words)")
-            return answer
-            
+            return self._answer(self.client.generate(**request), request['prompt'])
         except Exception as e:
-            logger.error(f"Failed to generate answer: {str(e)}")
-            return f"Error: {str(e)}"
+            return self._error(e)
     
     def generate_answer_stream(self, query: str, context: str, max_tokens: int = 500):
-        prompt = self._build_prompt(query, context)
-        logger.info(f"Streaming answer (max_tokens={max_tokens})...")
+        request = self._request(query, context, max_tokens, stream=True)
+        trace = tracer.stream("generator.stream", model=self.model_name)
         
         try:
-            response_stream = self.client.generate(
-                model=self.model_name,
-                prompt=prompt,
-                options={
-                    'num_predict': max_tokens,
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'top_k': 40,
-                    'repeat_penalty': 1.1,
-                },
-                stream=True
-            )
-            
-            full_text = ""
-            for chunk in response_stream:
-                if 'response' in chunk:
-                    text = chunk['response']
-                    full_text += text
+            chars = 0
+            for chunk in self.client.generate(**request):
+                text = self._chunk_text(chunk, request['prompt'])
+                if text:
+                    chars += len(text)
+                    trace.piece(text)
                     yield text
             
-            logger.info(f"Stream complete ({len(full_text)} chars)")
+            logger.info(f"Stream complete ({chars} chars)")
             
         except Exception as e:
-            logger.error(f"Stream failed: {str(e)}")
-            yield f"Error: {str(e)}"
-    
-    def _build_prompt(self, query: str, context: str) -> str:
-        return f"""You are a helpful assistant that provides detailed answers based on the provided context.
+            yield self._error(e, stream=True)
+        finally:
+            trace.finish()
 
-Context:
-{context}
 
-Question: {query}
-
-Instructions:
-- Provide a thorough answer based on the information in the context
-- Include all relevant details and explanations
-- If the context doesn't contain enough information, explain what's missing
-- Cite which context section you're referencing when relevant
-- Break down complex topics clearly
-
-Answer:"""
+class AsyncGenerator(_OllamaGenerator):
+    """Async counterpart of Generator on ``ollama.AsyncClient``."""
 
+    def _client(self):
+        return self.session.async_client
+    
+    async def generate_answer(self, query: str, context: str, max_tokens: int = 500) -> str:
+        request = self._request(query, context, max_tokens)
+        try:
+            return self._answer(await self.client.generate(**request), request['prompt'])
+        except Exception as e:
+            return self._error(e)
+    
+    async def generate_answer_stream(self, query: str, context: str, max_tokens: int = 500) -> AsyncIterator[str]:
+        request = self._request(query, context, max_tokens, stream=True)
+        trace = tracer.stream("generator.stream", model=self.model_name)
+        
+        try:
+            chars = 0
+            async for chunk in await self.client.generate(**request):
+                text = self._chunk_text(chunk, request['prompt'])
+                if text:
+                    chars += len(text)
+                    trace.piece(text)
+                    yield text
+            
+            logger.info(f"Stream complete ({chars} chars)")
+            
+        except Exception as e:
+            yield self._error(e, stream=True)
+        finally:
+            trace.finish()
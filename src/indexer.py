@@ -0,0 +1,137 @@
+"""Incremental, manifest-driven indexing of the uploads directory."""
+
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from .chunker import TextChunker
+from .manifest import IndexManifest
+from .pipeline import IngestPipeline
+
+logger = logging.getLogger(__name__)
+
+
+class Indexer:
+    """Keeps the vector store in sync with a directory of PDFs.
+
+    Only added or changed files are converted, chunked and embedded; chunks of
+    removed files are deleted. Chunk IDs are deterministic, so re-adding a file
+    replaces exactly its own vectors.
+    """
+
+    def __init__(self, embedder, vector_store, manifest_path: Path,
+                 chunker: Optional[TextChunker] = None, processed_dir: Optional[Path] = None,
+                 workers: int = 1, queue_size: int = 4,
+                 on_sources_changed: Optional[Callable[[List[str]], None]] = None):
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.manifest = IndexManifest(manifest_path)
+        self.chunker = chunker or TextChunker()
+        self.processed_dir = processed_dir
+        self.workers = workers
+        self.queue_size = queue_size
+        # Notified with source_file names whose chunks were replaced or removed
+        self.on_sources_changed = on_sources_changed
+        self._processor = None
+        logger.info("Indexer initialized")
+
+    @property
+    def processor(self):
+        # Docling is only loaded when something actually needs converting
+        if self._processor is None:
+            from .document_processor import DocumentProcessor
+            self._processor = DocumentProcessor()
+        return self._processor
+
+    def sync(self, directory: Path, full: bool = False,
+             on_progress: Optional[Callable[[int, int, str], None]] = None) -> Dict:
+        """Bring the index in line with the PDFs in ``directory``.
+
+        ``on_progress(done, total, filename)`` is called once the files to
+        index are known (``done=0``) and after each file has been written.
+        """
+        if full or (self.manifest.entries and self._index_missing()):
+            logger.info("Full rebuild: clearing collection and manifest")
+            previous = [Path(name).stem for name in self.manifest.entries]
+            self.vector_store.delete_collection()
+            self.manifest.clear()
+            self.manifest.save()
+            self._notify(previous)
+
+        changes = self.manifest.diff(sorted(directory.glob("*.pdf")))
+        logger.info(
+            f"Sync: {len(changes['added'])} added, {len(changes['changed'])} changed, "
+            f"{len(changes['removed'])} removed, {len(changes['unchanged'])} unchanged"
+        )
+
+        for name in changes['removed']:
+            self.remove_file(name)
+
+        to_index = changes['added'] + changes['changed']
+        if on_progress is not None:
+            on_progress(0, len(to_index), "")
+        indexed = self._ingest(to_index, on_progress) if to_index else {}
+        failed: List[str] = [p.name for p in to_index if p.name not in indexed]
+
+        # Unchanged files may have had their mtime refreshed
+        self.manifest.save()
+
+        return {
+            'added': [p.name for p in changes['added']],
+            'changed': [p.name for p in changes['changed']],
+            'removed': changes['removed'],
+            'unchanged': len(changes['unchanged']),
+            'failed': failed,
+            'chunks': sum(indexed.values()),
+        }
+
+    def _index_missing(self) -> bool:
+        """True when the manifest lists files but the store (or its BM25 index) holds none of them."""
+        if self.vector_store.get_collection_info()['points_count'] == 0:
+            return True
+        lexical_index = self.vector_store.lexical_index
+        return lexical_index is not None and lexical_index.count() == 0
+
+    def index_file(self, pdf_path: Path) -> int:
+        """(Re)index one PDF, replacing any chunks it had before."""
+        indexed = self._ingest([pdf_path])
+        if pdf_path.name not in indexed:
+            raise RuntimeError(f"Failed to index {pdf_path.name}")
+        return indexed[pdf_path.name]
+
+    def _ingest(self, pdf_paths: List[Path],
+                on_progress: Optional[Callable[[int, int, str], None]] = None) -> Dict[str, int]:
+        """Stream files through the pipeline; returns chunk counts of fully indexed files."""
+        indexed: Dict[str, int] = {}
+        done = 0
+
+        def on_document(pdf_path: Path, num_chunks: int, num_failed: int):
+            nonlocal done
+            done += 1
+            if on_progress is not None:
+                on_progress(done, len(pdf_paths), pdf_path.name)
+            self._notify([pdf_path.stem])
+            if num_failed:
+                # Keep what was embedded, but leave the file out of the manifest so the next sync retries it
+                logger.error(f"{num_failed}/{num_chunks} chunks of {pdf_path.name} could not be embedded")
+                return
+            self.manifest.record(pdf_path, num_chunks)
+            self.manifest.save()
+            indexed[pdf_path.name] = num_chunks
+            logger.info(f"Indexed {pdf_path.name} ({num_chunks} chunks)")
+
+        pipeline = IngestPipeline(self.processor, self.chunker, self.embedder, self.vector_store,
+                                  queue_size=self.queue_size, workers=self.workers,
+                                  processed_dir=self.processed_dir)
+        pipeline.run(pdf_paths, on_document=on_document)
+        return indexed
+
+    def remove_file(self, name: str):
+        self.vector_store.delete_source(Path(name).stem)
+        self.manifest.remove(name)
+        self.manifest.save()
+        self._notify([Path(name).stem])
+        logger.info(f"Removed {name} from index")
+
+    def _notify(self, source_files: List[str]):
+        if self.on_sources_changed is not None and source_files:
+            self.on_sources_changed(source_files)
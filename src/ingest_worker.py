@@ -0,0 +1,196 @@
+"""Worker processes that run queued ingestion jobs.
+
+    python -m src.ingest_worker --workers 2     # serve the queue until stopped
+    python -m src.ingest_worker --drain         # run what is queued, then exit
+
+The Streamlit app and the HTTP server start ``settings.ingest_workers`` of
+these themselves; run them separately with ``INGEST_WORKERS=0``.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from .config import settings
+from .job_queue import JobQueue
+from .store_lock import store_write_lock
+
+logger = logging.getLogger(__name__)
+
+# Per-process embedder for build_indexer (its cache and rate limiter outlive single jobs)
+_embedder = None
+
+
+def open_job_queue() -> JobQueue:
+    return JobQueue(settings.jobs_db_path, max_attempts=settings.ingest_max_attempts,
+                    retry_delay=settings.ingest_retry_delay, lease_seconds=settings.ingest_job_lease)
+
+
+def build_indexer():
+    """An Indexer over a freshly opened store, configured from settings."""
+    global _embedder
+    from .chunker import TextChunker
+    from .indexer import Indexer
+    from .stores import create_vector_store
+
+    if _embedder is None:
+        from .embedding_cache import EmbeddingCache
+        from .embeddings import EmbeddingGenerator
+        from .rate_limiter import RateLimiter
+        _embedder = EmbeddingGenerator(settings.gemini_embedding_model,
+                                       cache=EmbeddingCache(settings.embedding_cache_path,
+                                                            settings.embedding_cache_max_entries),
+                                       max_concurrency=settings.embedding_max_concurrency,
+                                       rate_limiter=RateLimiter(settings.embedding_requests_per_minute,
+                                                                settings.embedding_tokens_per_minute))
+    return Indexer(_embedder, create_vector_store(), settings.manifest_path,
+                   TextChunker(settings.chunk_size, settings.chunk_overlap, settings.chunk_unit),
+                   settings.processed_dir, workers=settings.conversion_workers,
+                   queue_size=settings.ingest_queue_size)
+
+
+class IngestWorker:
+    """Claims jobs from the queue one at a time and runs them under the store write lock.
+
+    The indexer is rebuilt for every job, so the store and manifest reflect
+    whatever other writers did since the last one. After each job the index
+    generation file is touched, which makes server workers reopen their stores.
+    """
+
+    def __init__(self, queue: JobQueue, indexer_factory: Callable = build_indexer,
+                 uploads_dir: Optional[Path] = None, poll_interval: float = 1.0):
+        self.queue = queue
+        self.indexer_factory = indexer_factory
+        self.uploads_dir = Path(uploads_dir or settings.uploads_dir)
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+
+    def run(self, stop: Optional[threading.Event] = None, drain: bool = False):
+        """Process jobs until ``stop`` is set (or, with ``drain``, until none is runnable)."""
+        stop = stop or threading.Event()
+        logger.info(f"Ingest worker {self.name} started")
+        while not stop.is_set():
+            if not self.run_once() and (drain or stop.wait(self.poll_interval)):
+                break
+        logger.info(f"Ingest worker {self.name} stopped")
+
+    def run_once(self) -> bool:
+        """Run one job if any is runnable; returns whether one was run."""
+        job = self.queue.claim(self.name)
+        if job is None:
+            return False
+        logger.info(f"Running {job['kind']} job {job['id']} {job['target']} (attempt {job['attempts']})".rstrip())
+
+        # Keeps the lease alive through long conversions that report no progress
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job['id'], done), daemon=True)
+        heartbeat.start()
+        try:
+            with store_write_lock(settings.store_lock_path):
+                try:
+                    result = self.run_job(job)
+                finally:
+                    # A job that failed part way may still have written rows; readers reopen either way
+                    settings.index_generation_path.touch()
+        except Exception as e:
+            self.queue.fail(job['id'], str(e))
+        else:
+            self.queue.complete(job['id'], result)
+            logger.info(f"Job {job['id']} done: {result}")
+        finally:
+            done.set()
+            heartbeat.join()
+        return True
+
+    def _heartbeat(self, job_id: int, done: threading.Event):
+        while not done.wait(self.queue.lease_seconds / 3):
+            self.queue.renew(job_id)
+
+    def run_job(self, job: Dict) -> Dict:
+        indexer = self.indexer_factory()
+        try:
+            return self._run_job(job, indexer)
+        finally:
+            # The next job opens its own store; a long-lived worker must not collect them
+            indexer.vector_store.close()
+
+    def _run_job(self, job: Dict, indexer) -> Dict:
+        def on_progress(done: int, total: int, item: str):
+            self.queue.progress(job['id'], done, total, item)
+
+        if job['kind'] == 'sync':
+            stats = indexer.sync(self.uploads_dir, full=job['full'], on_progress=on_progress)
+            if stats['failed']:
+                # Indexed files are in the manifest now, so the retry only redoes these
+                raise RuntimeError(f"Failed to index: {', '.join(stats['failed'])}")
+            return stats
+
+        pdf_path = self.uploads_dir / job['target']
+        if not pdf_path.exists():
+            if job['target'] in indexer.manifest.entries:
+                indexer.remove_file(job['target'])
+            return {'file': job['target'], 'removed': True}
+        if indexer.manifest.is_current(pdf_path):
+            # Already indexed with this content: enqueueing the same file again is a no-op
+            return {'file': job['target'], 'unchanged': True,
+                    'chunks': indexer.manifest.entries[pdf_path.name].get('num_chunks', 0)}
+        on_progress(0, 1, pdf_path.name)
+        num_chunks = indexer.index_file(pdf_path)
+        on_progress(1, 1, pdf_path.name)
+        return {'file': job['target'], 'chunks': num_chunks}
+
+
+def _worker_main(drain: bool = False):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(name)s %(levelname)s %(message)s")
+    stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda _signum, _frame: stop.set())
+    IngestWorker(open_job_queue()).run(stop, drain=drain)
+
+
+def start_workers(count: int, drain: bool = False) -> List[multiprocessing.Process]:
+    """Start ``count`` daemon worker processes (spawned, so no client or lock crosses a fork)."""
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_worker_main, args=(drain,), name=f"ingest-worker-{i}", daemon=True)
+                 for i in range(count)]
+    for process in processes:
+        process.start()
+    if processes:
+        logger.info(f"Started {count} ingest worker process(es)")
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued ingestion jobs")
+    parser.add_argument('--workers', type=int, default=max(1, settings.ingest_workers))
+    parser.add_argument('--drain', action='store_true', help="Exit once no job is runnable")
+    args = parser.parse_args()
+
+    settings.ensure_dirs()
+    if args.workers <= 1:
+        _worker_main(drain=args.drain)
+        return
+    processes = start_workers(args.workers, drain=args.drain)
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.pid is not None:
+                try:
+                    os.kill(process.pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
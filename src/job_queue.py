@@ -0,0 +1,205 @@
+"""Persistent ingestion job queue shared by the app, the server and ingest workers."""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("file", "sync")
+JOB_STATES = ("queued", "running", "done", "failed")
+
+
+class JobQueue:
+    """SQLite-backed queue of ingestion jobs, safe to use from several processes.
+
+    A ``file`` job (re)indexes one PDF in the uploads directory; a ``sync`` job
+    runs ``Indexer.sync`` over the whole directory. Enqueueing is idempotent:
+    a job identical to one that is still queued is not added twice.
+
+    Workers ``claim`` a job under a lease that they renew while it runs, so a
+    job whose worker died is picked up again once its lease expires. Failed
+    jobs are retried with exponential backoff up to ``max_attempts``.
+    """
+
+    def __init__(self, path: Path, max_attempts: int = 3, retry_delay: float = 30.0, lease_seconds: float = 600.0):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, target TEXT NOT NULL, "
+            "full INTEGER NOT NULL DEFAULT 0, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "progress_done INTEGER NOT NULL DEFAULT 0, progress_total INTEGER NOT NULL DEFAULT 0, "
+            "progress_item TEXT NOT NULL DEFAULT '', result TEXT, error TEXT, worker TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, run_after REAL NOT NULL, lease_until REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, run_after)")
+        logger.info(f"JobQueue initialized ({self.path})")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock up front, so claim/enqueue cannot interleave across processes
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, kind: str, target: str = "", full: bool = False) -> int:
+        """Add a job unless the same one is already queued; returns its id."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}' (expected one of {JOB_KINDS})")
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND target = ? AND full = ? AND state = 'queued'",
+                (kind, target, int(full))
+            ).fetchone()
+            if row is not None:
+                return row['id']
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, target, full, state, created_at, updated_at, run_after) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (kind, target, int(full), now, now, now)
+            )
+        logger.info(f"Enqueued {kind} job {cursor.lastrowid} {target}".rstrip())
+        return cursor.lastrowid
+
+    def enqueue_file(self, filename: str) -> int:
+        return self.enqueue("file", Path(filename).name)
+
+    def enqueue_sync(self, full: bool = False) -> int:
+        return self.enqueue("sync", full=full)
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Take the oldest runnable job (or one whose worker's lease expired) and mark it running."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (state = 'queued' AND run_after <= ?) "
+                "OR (state = 'running' AND lease_until < ?) ORDER BY id LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                return None
+            if row['state'] == 'running':
+                logger.warning(f"Job {row['id']} lost its worker ({row['worker']}), running it again")
+            conn.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, worker = ?, error = NULL, "
+                "progress_done = 0, progress_total = 0, progress_item = '', updated_at = ?, lease_until = ? "
+                "WHERE id = ?",
+                (worker, now, now + self.lease_seconds, row['id'])
+            )
+        job = dict(row)
+        job['attempts'] += 1
+        return job
+
+    def renew(self, job_id: int):
+        """Extend the running job's lease."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND state = 'running'",
+                         (now + self.lease_seconds, now, job_id))
+
+    def progress(self, job_id: int, done: int, total: int, item: str = ""):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress_done = ?, progress_total = ?, progress_item = ?, updated_at = ?, "
+                "lease_until = ? WHERE id = ? AND state = 'running'",
+                (done, total, item, now, now + self.lease_seconds, job_id)
+            )
+
+    def complete(self, job_id: int, result: Optional[Dict] = None):
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET state = 'done', result = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                         (json.dumps(result or {}), time.time(), job_id))
+
+    def fail(self, job_id: int, error: str) -> bool:
+        """Record a failed attempt; returns True if the job will be retried."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            retry = row is not None and row['attempts'] < self.max_attempts
+            if retry:
+                delay = self.retry_delay * 2 ** (row['attempts'] - 1)
+                conn.execute(
+                    "UPDATE jobs SET state = 'queued', error = ?, run_after = ?, lease_until = NULL, updated_at = ? "
+                    "WHERE id = ?",
+                    (error, now + delay, now, job_id)
+                )
+            else:
+                conn.execute("UPDATE jobs SET state = 'failed', error = ?, lease_until = NULL, updated_at = ? "
+                             "WHERE id = ?", (error, now, job_id))
+        if retry:
+            logger.warning(f"Job {job_id} failed ({error}), retrying in {delay:.0f}s")
+        else:
+            logger.error(f"Job {job_id} failed permanently: {error}")
+        return retry
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def jobs(self, limit: int = 20, states: Optional[List[str]] = None) -> List[Dict]:
+        """Most recent jobs first, optionally only those in ``states``."""
+        query, params = "SELECT * FROM jobs", []
+        if states:
+            query += f" WHERE state IN ({','.join('?' * len(states))})"
+            params.extend(states)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update({state: count for state, count in rows})
+        return counts
+
+    def last_finished_at(self) -> float:
+        """When a job last finished (0 if never); changes whenever a worker may have changed the index."""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(updated_at) FROM jobs WHERE state IN ('done', 'failed')").fetchone()
+        return row[0] or 0.0
+
+    def prune(self, keep_seconds: float = 7 * 24 * 3600) -> int:
+        """Delete finished jobs older than ``keep_seconds``."""
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?",
+                                  (time.time() - keep_seconds,))
+        return cursor.rowcount
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job['full'] = bool(job['full'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
@@ -0,0 +1,195 @@
+"""BM25 inverted index over chunk text, kept in sync with the vector store."""
+
+import heapq
+import logging
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Very common English words: they carry almost no BM25 weight but have the longest postings
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the this to was were
+which will with what when where who how do does did not no can
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """Okapi BM25 over chunks, stored as a SQLite inverted index.
+
+    Postings are ``(term, row, tf)`` in a clustered table, so a query reads only
+    the postings of its own terms, joined with the lengths of their documents.
+    Chunk text is stored too, so lexical results need no vector store or
+    embedding call. Ingest worker processes write the same file, so nothing
+    about the documents is cached beyond the collection totals, which are
+    re-read whenever another connection has committed.
+    """
+
+    def __init__(self, path: Path, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._open()
+
+    def _open(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, source_file TEXT NOT NULL, "
+                "chunk_id INTEGER, length INTEGER NOT NULL, text TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_docs_source ON docs(source_file)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "term TEXT NOT NULL, row INTEGER NOT NULL, tf INTEGER NOT NULL, "
+                "PRIMARY KEY (term, row)) WITHOUT ROWID"
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"Failed to initialize lexical index: {str(e)}")
+            raise
+
+        self._stats: Optional[Tuple[int, int]] = None
+        self._data_version = None
+        logger.info(f"Lexical index ready ({self.count()} chunks, {self.path})")
+
+    def _collection_stats(self) -> Tuple[int, int]:
+        """``(number of docs, total length)``, re-read after commits by other connections."""
+        # data_version changes only for commits made through other connections; own writes reset _stats
+        data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if self._stats is None or data_version != self._data_version:
+            num_docs, total_length = self._db.execute("SELECT COUNT(*), SUM(length) FROM docs").fetchone()
+            self._stats = (num_docs, total_length or 0)
+            self._data_version = data_version
+        return self._stats
+
+    def count(self) -> int:
+        with self._lock:
+            return self._collection_stats()[0]
+
+    def _delete_rows(self, rows: List[Tuple[int, str]]):
+        """Delete ``(row, text)`` docs; re-tokenizing the text gives the postings keys to remove."""
+        postings = []
+        for row, text in rows:
+            postings.extend((term, row) for term in set(tokenize(text)))
+        postings.sort()
+        self._db.executemany("DELETE FROM postings WHERE term = ? AND row = ?", postings)
+        self._db.executemany("DELETE FROM docs WHERE row = ?", [(row,) for row, _ in rows])
+
+    def add_chunks(self, chunks: List[Dict], ids: List[str]):
+        """Index chunks under the IDs the vector store gave them, replacing existing ones."""
+        if not chunks:
+            return
+
+        with self._lock:
+            existing = [self._db.execute("SELECT row, text FROM docs WHERE id = ?", (chunk_id,)).fetchone()
+                        for chunk_id in ids]
+            self._delete_rows([found for found in existing if found])
+
+            postings = []
+            for chunk_id, chunk in zip(ids, chunks):
+                terms = Counter(tokenize(chunk['text']))
+                length = sum(terms.values())
+                row = self._db.execute(
+                    "INSERT INTO docs (id, source_file, chunk_id, length, text) VALUES (?, ?, ?, ?, ?)",
+                    (chunk_id, chunk['source_file'], chunk['chunk_id'], length, chunk['text'])
+                ).lastrowid
+                postings.extend((term, row, tf) for term, tf in terms.items())
+
+            # Inserting in key order keeps B-tree page writes local
+            postings.sort()
+            self._db.executemany("INSERT INTO postings (term, row, tf) VALUES (?, ?, ?)", postings)
+            self._db.commit()
+            self._stats = None
+
+    def delete_source(self, source_file: str):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT row, text FROM docs WHERE source_file = ?", (source_file,)
+            ).fetchall()
+            if rows:
+                self._delete_rows(rows)
+                self._db.commit()
+                self._stats = None
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM docs")
+            self._db.commit()
+            self._stats = None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @traced("lexical.search")
+    def search(self, query: str, limit: int = 5, source_filter: Optional[str] = None) -> List[Dict]:
+        terms = set(tokenize(query))
+        with self._lock:
+            num_docs, total_length = self._collection_stats()
+            if not terms or not num_docs:
+                return []
+            avg_length = total_length / num_docs
+
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._db.execute(
+                    "SELECT p.row, p.tf, d.length FROM postings p JOIN docs d ON d.row = p.row WHERE p.term = ?",
+                    (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for row, tf, length in postings:
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[row] = scores.get(row, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if not scores:
+                return []
+
+            candidates = scores
+            if source_filter is not None:
+                allowed = {row for row, in self._db.execute(
+                    "SELECT row FROM docs WHERE source_file = ?", (source_filter,)
+                )}
+                candidates = [row for row in scores if row in allowed]
+            ranked = heapq.nlargest(limit, candidates, key=scores.get)
+            if not ranked:
+                return []
+            placeholders = ",".join("?" * len(ranked))
+            rows = self._db.execute(
+                f"SELECT row, id, source_file, chunk_id, text FROM docs WHERE row IN ({placeholders})", ranked
+            ).fetchall()
+
+        by_row = {row[0]: row for row in rows}
+        results = []
+        for row in ranked:
+            if row not in by_row:
+                continue  # Deleted by an ingest worker since its postings were read
+            _, chunk_id, source_file, chunk_index, text = by_row[row]
+            results.append({
+                'id': chunk_id,
+                'score': scores[row],
+                'text': text,
+                'source_file': source_file,
+                'chunk_id': chunk_index,
+            })
+        return results
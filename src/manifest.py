@@ -0,0 +1,99 @@
+"""Persisted per-file fingerprints of what is currently indexed."""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    """JSON manifest mapping file name -> {size, mtime, sha256, num_chunks}.
+
+    Size and mtime are a cheap first check; the content hash is only computed
+    when they differ, so touching a file without changing it is not a reindex.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self):
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable manifest {self.path}: {str(e)}")
+                self.entries = {}
+        logger.info(f"Manifest loaded ({len(self.entries)} files)")
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.entries, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, path: Path, sha256: Optional[str] = None) -> Dict:
+        stat = path.stat()
+        return {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': sha256 or file_sha256(path),
+        }
+
+    def is_current(self, path: Path) -> bool:
+        """True if the file is indexed and its content has not changed."""
+        entry = self.entries.get(path.name)
+        if entry is None:
+            return False
+
+        stat = path.stat()
+        if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+            return True
+        if stat.st_size != entry['size']:
+            return False
+
+        # Same size, new mtime: only a content change counts
+        if file_sha256(path) == entry['sha256']:
+            entry['mtime'] = stat.st_mtime
+            return True
+        return False
+
+    def diff(self, paths: List[Path]) -> Dict[str, List]:
+        """Split the files on disk into added, changed and unchanged, plus removed names."""
+        on_disk = {p.name: p for p in paths}
+        result = {'added': [], 'changed': [], 'unchanged': [], 'removed': []}
+
+        for name, path in sorted(on_disk.items()):
+            if name not in self.entries:
+                result['added'].append(path)
+            elif self.is_current(path):
+                result['unchanged'].append(path)
+            else:
+                result['changed'].append(path)
+
+        result['removed'] = sorted(name for name in self.entries if name not in on_disk)
+        return result
+
+    def record(self, path: Path, num_chunks: int, sha256: Optional[str] = None):
+        entry = self.fingerprint(path, sha256)
+        entry['num_chunks'] = num_chunks
+        self.entries[path.name] = entry
+
+    def remove(self, name: str):
+        self.entries.pop(name, None)
+
+    def clear(self):
+        self.entries = {}
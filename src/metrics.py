@@ -0,0 +1,159 @@
+"""Lightweight in-process metrics (histograms) shared across components."""
+
+import bisect
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# Upper bounds for latency-style histograms, in milliseconds
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Upper bounds for size-style histograms (items per batch)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+# Quantiles reported over each histogram's recent observations
+PERCENTILES = (0.5, 0.95, 0.99)
+
+# Prometheus metric names allow [a-zA-Z0-9_:] only
+_METRIC_NAME_RE = re.compile(r'[^a-zA-Z0-9_:]')
+
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus style (count per upper bound, plus +Inf).
+
+    The last ``window`` observations are also kept, so ``percentiles()`` gives
+    exact rolling p50/p95/p99 that follow recent behavior rather than the
+    all-time bucket counts.
+    """
+
+    def __init__(self, name: str, buckets: Sequence[float], description: str = "", window: int = 1024):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            self._recent.append(value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile: the upper bound of the bucket holding the q-th observation."""
+        with self._lock:
+            if not self._count:
+                return None
+            target = q * self._count
+            seen = 0
+            for bound, count in zip(self.buckets, self._counts):
+                seen += count
+                if seen >= target:
+                    return bound
+            return float('inf')
+
+    def percentiles(self, quantiles: Sequence[float] = PERCENTILES) -> Dict[str, Optional[float]]:
+        """Nearest-rank quantiles of the recent window, keyed ``p50``, ``p95``, ..."""
+        with self._lock:
+            recent = sorted(self._recent)
+        result = {}
+        for q in quantiles:
+            key = f"p{q * 100:g}"
+            result[key] = recent[max(0, math.ceil(q * len(recent)) - 1)] if recent else None
+        return result
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            cumulative, counts = 0, []
+            for bound, count in zip(self.buckets + (float('inf'),), self._counts):
+                cumulative += count
+                counts.append((bound, cumulative))
+            snapshot = {
+                'count': self._count,
+                'sum': self._sum,
+                'mean': self._sum / self._count if self._count else 0.0,
+                'buckets': counts,
+            }
+        snapshot.update(self.percentiles())
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+            self._recent.clear()
+
+
+class MetricsRegistry:
+    """Named histograms; ``histogram()`` returns the existing one if already registered."""
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, buckets: Sequence[float] = LATENCY_BUCKETS_MS,
+                  description: str = "") -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, buckets, description)
+            return self._histograms[name]
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._histograms)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            histograms = list(self._histograms.values())
+        return {histogram.name: histogram.snapshot() for histogram in histograms}
+
+    def to_prometheus(self, prefix: str = "rag_") -> str:
+        """Prometheus text exposition: each histogram, plus its rolling percentiles as a summary."""
+        with self._lock:
+            descriptions = {name: histogram.description for name, histogram in self._histograms.items()}
+        lines = []
+        for name, snapshot in sorted(self.snapshot().items()):
+            metric = prefix + _METRIC_NAME_RE.sub("_", name)
+            description = descriptions.get(name) or name
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in snapshot['buckets']:
+                le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                lines.append(f'{metric}_bucket{{le="{le}"}} {count}')
+            lines.append(f"{metric}_sum {snapshot['sum']:g}")
+            lines.append(f"{metric}_count {snapshot['count']}")
+
+            lines.append(f"# HELP {metric}_recent {description} (last observations)")
+            lines.append(f"# TYPE {metric}_recent summary")
+            for q in PERCENTILES:
+                value = snapshot[f"p{q * 100:g}"]
+                lines.append(f'{metric}_recent{{quantile="{q:g}"}} {"NaN" if value is None else f"{value:g}"}')
+        return "\n".join(lines) + "\n"
+
+    def to_json_line(self) -> str:
+        """One JSON line holding a timestamped snapshot of every histogram."""
+        snapshot = self.snapshot()
+        for histogram in snapshot.values():
+            histogram['buckets'] = [["+Inf" if bound == float('inf') else bound, count]
+                                    for bound, count in histogram['buckets']]
+        return json.dumps({'timestamp': time.time(), 'metrics': snapshot}) + "\n"
+
+    def write_jsonl(self, path: Path):
+        """Append ``to_json_line()`` to ``path``."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a") as f:
+            f.write(self.to_json_line())
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
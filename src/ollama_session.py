@@ -0,0 +1,120 @@
+"""Shared Ollama connection: model warmup, keep-alive, context sizing and timings."""
+
+import logging
+import math
+import threading
+from typing import Dict, Optional, Union
+import ollama
+from .metrics import MetricsRegistry, metrics as default_metrics
+
+logger = logging.getLogger(__name__)
+
+NS_PER_MS = 1_000_000
+
+
+class OllamaSession:
+    """One Ollama host shared by the generator and embedder.
+
+    - ``warmup(model)`` sends an empty request so the model is loaded before the
+      first real query, and every request passes ``keep_alive`` so it stays resident.
+    - ``num_ctx_for(prompt, max_tokens, model)`` picks the context window. Ollama
+      reloads a model whenever ``num_ctx`` changes, so each model keeps one size:
+      ``min_ctx``, which warmup loads it with, doubled (and kept from then on)
+      only when a prompt plus its answer does not fit. The characters-per-token
+      ratio is learned from the ``prompt_eval_count`` Ollama reports.
+    - ``record(model, response)`` splits each response's timings into model load
+      time and inference time (histograms in ``metrics``, last values in ``last_timings``).
+    """
+
+    def __init__(self, host: str = "http://localhost:11434", keep_alive: Union[str, float] = "30m",
+                 min_ctx: int = 2048, max_ctx: int = 32768, metrics: Optional[MetricsRegistry] = None):
+        self.host = host
+        self.keep_alive = keep_alive
+        self.min_ctx = min_ctx
+        self.max_ctx = max_ctx
+        self.client = ollama.Client(host=host)
+        self._async_client = None
+        self.metrics = metrics or default_metrics
+        self.chars_per_token = 4.0
+        self.last_timings: Dict[str, Dict[str, float]] = {}
+        self._warm = set()
+        # num_ctx each model is loaded with; it only grows
+        self._num_ctx: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        logger.info(f"OllamaSession initialized ({host}, keep_alive={keep_alive})")
+
+    @property
+    def async_client(self) -> ollama.AsyncClient:
+        if self._async_client is None:
+            self._async_client = ollama.AsyncClient(host=self.host)
+        return self._async_client
+
+    def warmup(self, model: str, embedding: bool = False):
+        """Load ``model`` now instead of on the first query; failures are only logged."""
+        if model in self._warm:
+            return
+        try:
+            if embedding:
+                response = self.client.embed(model=model, input="warmup", keep_alive=self.keep_alive)
+            else:
+                # An empty prompt loads the model without generating anything, at the
+                # num_ctx queries will use (a different one would make the first query reload it)
+                response = self.client.generate(model=model, prompt="", keep_alive=self.keep_alive,
+                                                options={'num_ctx': self.num_ctx_for("", 0, model)})
+            timings = self.record(model, response, expect_load=True)
+            self._warm.add(model)
+            logger.info(f"Warmed up {model} (load {timings['load_ms']:.0f} ms)")
+        except Exception as e:
+            logger.warning(f"Warmup of {model} failed: {str(e)}")
+
+    def estimate_tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def num_ctx_for(self, prompt: str, max_tokens: int, model: Optional[str] = None) -> int:
+        # 10% headroom on the estimate for the model's prompt template
+        needed = int(self.estimate_tokens(prompt) * 1.1) + max_tokens
+        with self._lock:
+            num_ctx = self._num_ctx.get(model, self.min_ctx)
+            while num_ctx < needed and num_ctx < self.max_ctx:
+                num_ctx *= 2
+            num_ctx = min(num_ctx, self.max_ctx)
+            if model is not None:
+                if num_ctx > self._num_ctx.get(model, self.min_ctx):
+                    logger.info(f"Growing num_ctx of {model} to {num_ctx} (the model will be reloaded once)")
+                self._num_ctx[model] = num_ctx
+        if needed > self.max_ctx:
+            logger.warning(f"Prompt needs ~{needed} tokens, more than max_ctx={self.max_ctx}; it will be truncated")
+        return num_ctx
+
+    def record(self, model: str, response, prompt: Optional[str] = None,
+               expect_load: bool = False) -> Dict[str, float]:
+        """Log load vs inference time of a (final) response and refine the token estimate."""
+        def field(name):
+            value = response.get(name) if isinstance(response, dict) else getattr(response, name, None)
+            return value or 0
+
+        load_ms = field('load_duration') / NS_PER_MS
+        total_ms = field('total_duration') / NS_PER_MS
+        timings = {
+            'load_ms': load_ms,
+            'prompt_eval_ms': field('prompt_eval_duration') / NS_PER_MS,
+            'eval_ms': field('eval_duration') / NS_PER_MS,
+            'inference_ms': max(total_ms - load_ms, 0.0),
+            'prompt_tokens': field('prompt_eval_count'),
+        }
+        self.metrics.histogram("ollama_load_ms", description="Model load time per Ollama request").observe(load_ms)
+        self.metrics.histogram("ollama_inference_ms",
+                               description="Ollama request time excluding model load").observe(timings['inference_ms'])
+
+        with self._lock:
+            self.last_timings[model] = timings
+            if prompt and timings['prompt_tokens'] > 0:
+                # Moving average, so one unusual prompt does not swing the estimate
+                measured = len(prompt) / timings['prompt_tokens']
+                # Prompt-cache hits report only the uncached tokens; skip those readings
+                if 1.0 <= measured <= 8.0:
+                    self.chars_per_token = 0.8 * self.chars_per_token + 0.2 * measured
+
+        if load_ms > 1000 and not expect_load:
+            logger.warning(f"{model} was loaded on demand ({load_ms:.0f} ms); consider a longer keep_alive")
+        return timings
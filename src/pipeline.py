@@ -0,0 +1,163 @@
+"""Streaming convert -> chunk -> embed -> store ingestion pipeline."""
+
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+from .bulk_writer import BulkWriter
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class IngestPipeline:
+    """Runs the ingestion stages in threads connected by bounded queues.
+
+    Conversion, chunking, embedding and storage overlap, and a full queue blocks
+    the stage feeding it, so peak memory depends on ``queue_size`` and
+    ``embed_batch_size`` rather than on the size of the corpus.
+
+    Embedded batches are coalesced into the store's adaptive write size; with
+    ``write_thread`` they are written on a separate thread while the next
+    ones are embedded.
+    """
+
+    def __init__(self, processor, chunker, embedder, vector_store,
+                 queue_size: int = 4, embed_batch_size: int = 100, workers: int = 1,
+                 processed_dir: Optional[Path] = None, write_thread: bool = True):
+        self.processor = processor
+        self.chunker = chunker
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.workers = workers
+        self.processed_dir = processed_dir
+        self.write_thread = write_thread
+
+    def run(self, pdf_paths: Iterable[Path],
+            on_document: Optional[Callable[[Path, int, int], None]] = None) -> Dict:
+        """Ingest PDFs, replacing any chunks they already had in the store.
+
+        ``on_document(pdf_path, num_chunks, num_failed)`` is called once a
+        document's chunks have all been written.
+        """
+        pdf_paths = list(pdf_paths)
+        stop = threading.Event()
+        errors = []
+        documents_q = queue.Queue(maxsize=self.queue_size)
+        chunks_q = queue.Queue(maxsize=self.queue_size)
+        embedded_q = queue.Queue(maxsize=self.queue_size)
+
+        def put(q: queue.Queue, item):
+            # Give up instead of blocking forever once another stage has failed
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def get(q: queue.Queue):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _END
+
+        def stage(name: str, body: Callable[[], None], output: queue.Queue):
+            try:
+                body()
+            except Exception as e:
+                logger.error(f"Pipeline stage '{name}' failed: {str(e)}")
+                errors.append(e)
+                stop.set()
+            finally:
+                put(output, _END)
+
+        def convert():
+            for document in self.processor.iter_pdfs(pdf_paths, workers=self.workers):
+                if stop.is_set():
+                    break
+                if self.processed_dir is not None:
+                    self.processor.save_markdown(document, self.processed_dir)
+                put(documents_q, document)
+
+        def chunk():
+            while (document := get(documents_q)) is not _END:
+                chunks = self.chunker.chunk_document(document)
+                for i in range(0, len(chunks), self.embed_batch_size):
+                    put(chunks_q, ('chunks', document['filename'], chunks[i:i + self.embed_batch_size]))
+                # Drop the markdown before queueing the marker; only chunk text travels on
+                put(chunks_q, ('done', Path(document['source_path']), document['filename'], len(chunks)))
+                del document, chunks
+
+        def embed():
+            while (item := get(chunks_q)) is not _END:
+                if item[0] == 'chunks':
+                    _, source_file, batch = item
+                    embedded = self.embedder.embed_chunks(batch)
+                    put(embedded_q, ('chunks', source_file, embedded, len(batch) - len(embedded)))
+                else:
+                    put(embedded_q, item)
+
+        threads = [
+            threading.Thread(target=stage, args=('convert', convert, documents_q), daemon=True),
+            threading.Thread(target=stage, args=('chunk', chunk, chunks_q), daemon=True),
+            threading.Thread(target=stage, args=('embed', embed, embedded_q), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        stats = {'documents': 0, 'chunks': 0, 'failed_chunks': 0}
+        cleared = set()
+        failed_per_source: Dict[str, int] = {}
+        writer = BulkWriter(self.vector_store, threaded=self.write_thread)
+        try:
+            while (item := get(embedded_q)) is not _END:
+                if item[0] == 'chunks':
+                    _, source_file, embedded, num_failed = item
+                    if source_file not in cleared:
+                        writer.delete_source(source_file)
+                        cleared.add(source_file)
+                    writer.add_chunks(embedded)
+                    stats['chunks'] += len(embedded)
+                    stats['failed_chunks'] += num_failed
+                    failed_per_source[source_file] = failed_per_source.get(source_file, 0) + num_failed
+                else:
+                    _, pdf_path, source_file, num_chunks = item
+                    if source_file not in cleared:
+                        # Document produced no chunks: still drop what it had before
+                        writer.delete_source(source_file)
+                        cleared.add(source_file)
+                    # Stored before it is reported, since the callback records it as indexed
+                    writer.flush()
+                    stats['documents'] += 1
+                    if on_document is not None:
+                        on_document(pdf_path, num_chunks, failed_per_source.pop(source_file, 0))
+        except Exception as e:
+            logger.error(f"Pipeline stage 'store' failed: {str(e)}")
+            errors.append(e)
+            stop.set()
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            if errors:
+                writer.abort()
+            else:
+                try:
+                    writer.close()
+                except Exception as e:
+                    logger.error(f"Pipeline stage 'store' failed: {str(e)}")
+                    errors.append(e)
+
+        if errors:
+            raise errors[0]
+
+        logger.info(f"Pipeline ingested {stats['chunks']} chunks from {stats['documents']} documents "
+                    f"({stats['failed_chunks']} chunks failed)")
+        return stats
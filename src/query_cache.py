@@ -0,0 +1,121 @@
+"""In-process LRU + TTL cache for query embeddings."""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingCache:
+    """Caches query vectors keyed by (embedding model, normalized query text).
+
+    Lookups are O(1) and never touch disk. With ``persist_path`` the cache is
+    loaded at startup and written back every ``persist_every`` new entries, so
+    popular questions stay warm across restarts.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 24 * 3600,
+                 persist_path: Optional[Path] = None, persist_every: int = 50):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.persist_every = persist_every
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        if self.persist_path is not None:
+            self.load()
+            atexit.register(self.save)
+        logger.info(f"QueryEmbeddingCache initialized (max_entries={max_entries}, ttl={ttl_seconds}s)")
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.split())
+
+    def get(self, model_name: str, query: str) -> Optional[List[float]]:
+        key = (model_name, self.normalize(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, model_name: str, query: str, embedding: List[float]):
+        key = (model_name, self.normalize(query))
+        with self._lock:
+            self._entries[key] = (time.time(), list(embedding))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.persist_path is not None and self._unsaved >= self.persist_every
+
+        if should_save:
+            self.save()
+
+    def load(self):
+        if self.persist_path is None or not self.persist_path.exists():
+            return
+        try:
+            rows = json.loads(self.persist_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable query cache {self.persist_path}: {str(e)}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for model_name, query, created, embedding in rows:
+                if now - created <= self.ttl_seconds:
+                    self._entries[(model_name, query)] = (created, embedding)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        logger.info(f"Loaded {len(self._entries)} cached query embeddings")
+
+    def save(self):
+        if self.persist_path is None:
+            return
+        with self._lock:
+            if not self._unsaved:
+                return
+            rows = [[model, query, created, embedding]
+                    for (model, query), (created, embedding) in self._entries.items()]
+            self._unsaved = 0
+
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.persist_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(rows), encoding='utf-8')
+        os.replace(tmp_path, self.persist_path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
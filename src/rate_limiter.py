@@ -0,0 +1,57 @@
+"""Token-bucket rate limiting for embedding and generation API calls."""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to ``capacity`` tokens, refilled continuously."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """Block until ``amount`` tokens are available, then take them."""
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.refill_per_second
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits; 0 or None disables a limit."""
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute else None
+        logger.info(f"RateLimiter initialized (rpm={requests_per_minute}, tpm={tokens_per_minute})")
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # ~4 characters per token is close enough for budgeting
+        return max(1, len(text) // 4)
+
+    def acquire(self, tokens: int = 0):
+        if self.requests is not None:
+            self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            self.tokens.acquire(tokens)
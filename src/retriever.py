@@ -1,34 +1,294 @@
 """Query processing and context retrieval."""
 
+import asyncio
+import contextvars
 import logging
-from typing import List, Dict
-from .embeddings import EmbeddingGenerator
-from .vector_store import VectorStore
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Dict, Optional
+from .context_packer import ContextPacker
+from .query_cache import QueryEmbeddingCache
+from .tracing import traced
+
+if TYPE_CHECKING:
+    # Annotations only: importing these would load google-genai and chromadb
+    from .embeddings import EmbeddingGenerator
+    from .vector_store import VectorStore
 
 logger = logging.getLogger(__name__)
 
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], limit: int, k: int = 60) -> List[Dict]:
+    """Merge ranked lists by summing 1 / (k + rank); ``score`` becomes the fused score.
+
+    Fused results are marked ``fused``: their scores are on another scale than
+    similarities or BM25 scores (0.016 to 0.033 for two lists with k=60).
+    """
+    fused: Dict[str, Dict] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            entry = fused.setdefault(result['id'], {**result, 'score': 0.0, 'fused': True})
+            entry['score'] += 1 / (k + rank)
+    return sorted(fused.values(), key=lambda r: r['score'], reverse=True)[:limit]
+
 
 class Retriever:
-    def __init__(self, embedding_generator: EmbeddingGenerator, vector_store: VectorStore):
+    """Vector, BM25 or hybrid retrieval.
+
+    Hybrid mode runs the BM25 lookup while the query is embedded and searched,
+    then fuses both rankings. If the embedding call fails or takes longer than
+    ``vector_timeout`` seconds, the BM25 results are returned on their own.
+    Lexical mode never calls the embedding provider.
+    """
+
+    def __init__(self, embedding_generator: "EmbeddingGenerator", vector_store: "VectorStore",
+                 query_cache: Optional[QueryEmbeddingCache] = None, mode: str = "vector",
+                 rrf_k: int = 60, vector_timeout: Optional[float] = None,
+                 packer: Optional[ContextPacker] = None):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}' (expected one of {RETRIEVAL_MODES})")
         self.embedder = embedding_generator
         self.vector_store = vector_store
-        logger.info("Retriever initialized")
+        self.lexical_index = vector_store.lexical_index
+        if mode != "vector" and self.lexical_index is None:
+            logger.warning(f"No lexical index on the vector store, '{mode}' retrieval falls back to vector")
+            mode = "vector"
+        self.mode = mode
+        self.rrf_k = rrf_k
+        self.vector_timeout = vector_timeout
+        self.query_cache = query_cache
+        self.packer = packer
+        # Hybrid queries embed and search here while BM25 runs on the caller's thread
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retriever")
+        # Recently formatted contexts -> the chunks behind them (used by the answer cache)
+        self._recent_contexts: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._contexts_lock = threading.Lock()
+        logger.info(f"Retriever initialized (mode={mode})")
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict]:
-        logger.info(f"Query: {query[:100]}...")
+    def embed_query(self, query: str) -> List[float]:
+        if self.query_cache is not None:
+            cached = self.query_cache.get(self.embedder.model_name, query)
+            if cached is not None:
+                return cached
+        
         query_embedding = self.embedder.embed_text(query)
-        results = self.vector_store.search(query_vector=query_embedding, limit=top_k)
+        self.remember_query_embedding(query, query_embedding)
+        return query_embedding
+    
+    def cached_query_embedding(self, query: str) -> Optional[List[float]]:
+        """The query's vector if retrieval already embedded it; never calls the provider."""
+        if self.query_cache is None:
+            return None
+        return self.query_cache.get(self.embedder.model_name, query)
+    
+    def remember_query_embedding(self, query: str, query_embedding: List[float]):
+        if self.query_cache is not None:
+            self.query_cache.put(self.embedder.model_name, query, query_embedding)
+    
+    def embed_queries(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """Vectors for many queries: cached ones first, the rest in one ``embed_batch`` call.
+
+        Queries that could not be embedded come back as None.
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(queries)
+        missing = []
+        for i, query in enumerate(queries):
+            cached = self.query_cache.get(self.embedder.model_name, query) if self.query_cache is not None else None
+            if cached is not None:
+                embeddings[i] = cached
+            else:
+                missing.append(i)
+        
+        if missing:
+            fresh = self.embedder.embed_batch([queries[i] for i in missing])
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+                if embedding is not None:
+                    self.remember_query_embedding(queries[i], embedding)
+        return embeddings
+    
+    def resolve_mode(self, mode: Optional[str]) -> str:
+        mode = mode or self.mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}' (expected one of {RETRIEVAL_MODES})")
+        if mode != "vector" and self.lexical_index is None:
+            return "vector"
+        return mode
+    
+    @traced("retriever.retrieve")
+    def retrieve(self, query: str, top_k: int = 5, mode: Optional[str] = None,
+                 query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Top chunks for a query; ``mode`` overrides the retriever's default for this call.
+
+        A ``query_embedding`` computed by the caller is searched with instead of embedding the query here.
+        """
+        logger.info(f"Query: {query[:100]}...")
+        mode = self.resolve_mode(mode)
+        if mode == "lexical":
+            results = self.lexical_index.search(query, limit=top_k)
+        elif mode == "hybrid":
+            results = self._retrieve_hybrid(query, top_k, query_embedding)
+        else:
+            results = self._vector_search(query, top_k, query_embedding)
         logger.info(f"Retrieved {len(results)} chunks")
         return results
     
+    def _vector_search(self, query: str, limit: int, query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        return self.vector_store.search(query_vector=query_embedding, limit=limit)
+    
+    def _retrieve_hybrid(self, query: str, top_k: int, query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        # Fuse deeper lists than requested so chunks ranked well by only one side can surface
+        num_candidates = max(top_k * 4, 20)
+        vector_future = self.submit(self._vector_search, query, num_candidates, query_embedding)
+        lexical_results = self.lexical_index.search(query, limit=num_candidates)
+        try:
+            vector_results = vector_future.result(timeout=self.vector_timeout)
+        except Exception as e:
+            logger.warning(f"Vector search unavailable ({type(e).__name__}: {str(e)}), using BM25 results only")
+            return lexical_results[:top_k]
+        return reciprocal_rank_fusion([vector_results, lexical_results], top_k, self.rrf_k)
+    
+    def retrieve_batch(self, queries: List[str], top_k: int = 5, mode: Optional[str] = None) -> List[List[Dict]]:
+        """Retrieve for many queries at once; results are returned per query, in order.
+        
+        All queries are embedded with one batched call and searched with one
+        ``search_batch`` call. A query that could not be embedded gets no vector
+        results (BM25 only in hybrid mode).
+        """
+        logger.info(f"Batch query: {len(queries)} queries")
+        mode = self.resolve_mode(mode)
+        if mode == "lexical":
+            return [self.lexical_index.search(query, limit=top_k) for query in queries]
+        
+        num_candidates = top_k if mode == "vector" else max(top_k * 4, 20)
+        lexical_future = None
+        if mode == "hybrid":
+            lexical_future = self.submit(
+                lambda: [self.lexical_index.search(query, limit=num_candidates) for query in queries]
+            )
+        
+        vector_results: List[List[Dict]] = [[] for _ in queries]
+        try:
+            embeddings = self.embed_queries(queries)
+            embedded = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+            if len(embedded) < len(queries):
+                logger.warning(f"{len(queries) - len(embedded)} of {len(queries)} queries could not be embedded")
+            found = self.vector_store.search_batch([embeddings[i] for i in embedded], limit=num_candidates)
+            for i, results in zip(embedded, found):
+                vector_results[i] = results
+        except Exception as e:
+            if lexical_future is None:
+                raise
+            logger.warning(f"Vector search unavailable ({type(e).__name__}: {str(e)}), using BM25 results only")
+        
+        if lexical_future is None:
+            return vector_results
+        lexical_results = lexical_future.result()
+        return [reciprocal_rank_fusion([vector, lexical], top_k, self.rrf_k)
+                for vector, lexical in zip(vector_results, lexical_results)]
+    
+    def submit(self, func, *args, **kwargs) -> Future:
+        """Run ``func`` on the retriever's thread pool, in a copy of the caller's context.
+
+        The copied context keeps spans opened by ``func`` in the caller's trace.
+        """
+        return self._executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+    
+    def close(self):
+        """Shut the thread pool down, waiting for searches still on it (a timed-out hybrid one may be)."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+    
     def format_context(self, results: List[Dict]) -> str:
         if not results:
             return "No relevant context found."
         
+        if self.packer is not None:
+            # Merged, de-duplicated passages within the token budget
+            passages = self.packer.pack(results)
+            results = [chunk for passage in passages for chunk in passage['chunks']]
+        else:
+            passages = results
+        
         context_parts = []
-        for i, result in enumerate(results, 1):
-            context_parts.append(f"[Context {i} - from {result['source_file']}]\n{result['text']}")
+        for i, passage in enumerate(passages, 1):
+            context_parts.append(f"[Context {i} - from {passage['source_file']}]\n{passage['text']}")
         
-        return "\n\n".join(context_parts)
+        context = "\n\n".join(context_parts)
+        self._remember_context(context, results)
+        return context
+    
+    def _remember_context(self, context: str, results: List[Dict]):
+        with self._contexts_lock:
+            self._recent_contexts[context] = [
+                {'id': r['id'], 'source_file': r['source_file']} for r in results if 'id' in r
+            ]
+            self._recent_contexts.move_to_end(context)
+            while len(self._recent_contexts) > 256:
+                self._recent_contexts.popitem(last=False)
+    
+    def context_chunks(self, context: str) -> Optional[List[Dict]]:
+        """IDs and sources of the chunks behind a context built by format_context, if still known."""
+        with self._contexts_lock:
+            return self._recent_contexts.get(context)
+
 
+class AsyncRetriever:
+    """Asyncio front end of a Retriever.
 
+    Only the query embedding happens here, with the embedder's
+    ``embed_text_async`` (the Gemini and Ollama embedders and EmbeddingBatcher
+    all have one), so waiting on the provider holds no thread. The searches are
+    local and CPU-bound: the Retriever's own ``retrieve`` runs them in its
+    thread pool with the vector already in hand.
+    """
+
+    def __init__(self, retriever: Retriever):
+        self.retriever = retriever
+        logger.info("AsyncRetriever initialized")
+    
+    async def _run(self, func, *args, **kwargs):
+        return await asyncio.wrap_future(self.retriever.submit(func, *args, **kwargs))
+    
+    async def embed_query(self, query: str) -> List[float]:
+        cached = self.retriever.cached_query_embedding(query)
+        if cached is not None:
+            return cached
+        
+        embedder = self.retriever.embedder
+        embed_text_async = getattr(embedder, 'embed_text_async', None)
+        if embed_text_async is not None:
+            query_embedding = await embed_text_async(query)
+        else:
+            query_embedding = await asyncio.to_thread(embedder.embed_text, query)
+        self.retriever.remember_query_embedding(query, query_embedding)
+        return query_embedding
+    
+    async def retrieve(self, query: str, top_k: int = 5, mode: Optional[str] = None) -> List[Dict]:
+        mode = self.retriever.resolve_mode(mode)
+        query_embedding = None
+        if mode == "vector":
+            query_embedding = await self.embed_query(query)
+        elif mode == "hybrid":
+            try:
+                query_embedding = await asyncio.wait_for(self.embed_query(query), timeout=self.retriever.vector_timeout)
+            except Exception as e:
+                logger.warning(f"Vector search unavailable ({type(e).__name__}: {str(e)}), using BM25 results only")
+                mode = "lexical"
+        return await self._run(self.retriever.retrieve, query, top_k, mode, query_embedding)
+    
+    def format_context(self, results: List[Dict]) -> str:
+        return self.retriever.format_context(results)
+    
+    def context_chunks(self, context: str) -> Optional[List[Dict]]:
+        return self.retriever.context_chunks(context)
+    
+    def cached_query_embedding(self, query: str) -> Optional[List[float]]:
+        return self.retriever.cached_query_embedding(query)
+    
+    def close(self):
+        self.retriever.close()
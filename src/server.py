@@ -0,0 +1,518 @@
+"""Headless HTTP server for the RAG pipeline (asyncio, standard library only).
+
+Endpoints:
+    GET  /health    - liveness and collection size
+    GET  /metrics   - per-stage latency histograms in Prometheus text format
+    GET  /traces    - the most recent request span trees (JSON)
+    POST /retrieve  - {"query", "top_k", "mode"} -> retrieved chunks
+    POST /query     - {"query", "top_k", "max_tokens", "mode", "stream"} -> answer,
+                      streamed as server-sent events unless "stream" is false
+    POST /ingest    - a PDF body (``?filename=doc.pdf``) is saved to uploads and queued
+                      for indexing; a JSON body {"full": bool} queues a sync of the
+                      uploads directory. Returns 202 with the job id, or the finished
+                      job with ``?wait=1`` / {"wait": true}
+    GET  /jobs      - ingestion job counts and recent jobs (``?id=N`` for one job)
+
+Run with ``python -m src.server --port 8000 --workers 4``. Jobs are run by
+``settings.ingest_workers`` ingest worker processes started alongside.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+from .answer_cache import AsyncCachedGenerator, SemanticAnswerCache
+from .config import settings
+from .context_packer import ContextPacker
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache
+from .embeddings import EmbeddingGenerator
+from .generator import AsyncGenerator
+from .ingest_worker import open_job_queue, start_workers
+from .query_cache import QueryEmbeddingCache
+from .rate_limiter import RateLimiter
+from .retriever import AsyncRetriever, Retriever, RETRIEVAL_MODES
+from .stores import create_vector_store
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+# Upper bound for a request's 'max_tokens'
+MAX_ANSWER_TOKENS = 8192
+
+STATUS_TEXT = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+        # Set once a streamed response has sent its head; errors then go into the stream
+        self.streaming = False
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get('connection', '').lower() != 'close'
+
+    def json(self) -> Dict:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return data
+
+
+def _int_param(value, name: str, minimum: Optional[int] = None, maximum: Optional[int] = None) -> int:
+    """A client-supplied integer, clamped to ``[minimum, maximum]``; anything else is a 400."""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"'{name}' must be an integer")
+    if minimum is not None:
+        number = max(number, minimum)
+    if maximum is not None:
+        number = min(number, maximum)
+    return number
+
+
+async def read_request(reader: asyncio.StreamReader, max_body_bytes: int) -> Optional[Request]:
+    """Parse one HTTP/1.1 request; None when the client closed the connection."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(400, "Request headers too large")
+
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    length = _int_param(headers.get('content-length') or 0, "Content-Length")
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > max_body_bytes:
+        raise HTTPError(413, f"Body larger than {max_body_bytes} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, headers, body)
+
+
+def _response_head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool = True):
+    await send_body(writer, status, json.dumps(payload).encode('utf-8'), 'application/json', keep_alive)
+
+
+async def send_body(writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str,
+                    keep_alive: bool = True):
+    writer.write(_response_head(status, {
+        'Content-Type': content_type,
+        'Content-Length': str(len(body)),
+        'Connection': 'keep-alive' if keep_alive else 'close',
+    }) + body)
+    await writer.drain()
+
+
+def _sse(data: Dict, event: Optional[str] = None) -> bytes:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+def _write_atomic(path: Path, data: bytes):
+    # Write-then-rename so an ingest worker never converts a half-written file
+    part_path = path.with_name(path.name + ".part")
+    part_path.write_bytes(data)
+    os.replace(part_path, path)
+
+
+def _public(result: Dict) -> Dict:
+    return {key: result[key] for key in ('id', 'source_file', 'chunk_id', 'score', 'text') if key in result}
+
+
+class RAGServer:
+    """One worker process: shared components, an asyncio listener and a concurrency limit.
+
+    At most ``max_concurrency`` /query and /retrieve requests run at once; others
+    wait up to ``queue_timeout`` seconds for a slot and then get a 503.
+    Ingest workers touch a generation file in ``chroma_dir`` after every job,
+    so each server worker reopens its store before serving its next request.
+    """
+
+    def __init__(self, max_concurrency: int = 64, queue_timeout: float = 10.0, max_body_bytes: int = 50 * 2**20):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_body_bytes = max_body_bytes
+        self.generation_path = settings.index_generation_path
+        self._generation = None
+        # (retriever, store) pairs replaced by a reopen, closed once the requests that may still use them are done
+        self._retired = []
+        self._in_flight = 0
+        self._reopen_lock = asyncio.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._connections = set()
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('GET', '/metrics'): self.metrics,
+            ('GET', '/traces'): self.traces,
+            ('POST', '/retrieve'): self.retrieve,
+            ('POST', '/query'): self.query,
+            ('POST', '/ingest'): self.ingest,
+            ('GET', '/jobs'): self.jobs,
+        }
+
+    def load_components(self):
+        """Build the shared components; called in each worker after fork, so no client crosses a fork."""
+        self._generation = self._read_generation()
+        embedder = EmbeddingGenerator(settings.gemini_embedding_model,
+                                      cache=EmbeddingCache(settings.embedding_cache_path,
+                                                           settings.embedding_cache_max_entries),
+                                      max_concurrency=settings.embedding_max_concurrency,
+                                      rate_limiter=RateLimiter(settings.embedding_requests_per_minute,
+                                                               settings.embedding_tokens_per_minute))
+        self.query_embedder = EmbeddingBatcher(embedder, window_ms=settings.query_batch_window_ms,
+                                               max_batch_size=settings.query_batch_max_size)
+        self.query_cache = QueryEmbeddingCache(settings.query_cache_max_entries, settings.query_cache_ttl_seconds,
+                                               persist_path=settings.query_cache_path)
+        self.vector_store = create_vector_store()
+        self.answer_cache = SemanticAnswerCache(settings.answer_cache_threshold, settings.answer_cache_max_entries)
+        self.retriever = self._open_retriever(self.vector_store)
+        self.generator = AsyncCachedGenerator(AsyncGenerator(settings.gemini_llm_model), self.retriever,
+                                              self.answer_cache)
+        self.job_queue = open_job_queue()
+        logger.info(f"Worker {os.getpid()} ready")
+
+    def _read_generation(self) -> Optional[float]:
+        try:
+            return self.generation_path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _open_retriever(self, vector_store) -> AsyncRetriever:
+        # Each store gets its own retriever, so closing it drains only that store's searches
+        return AsyncRetriever(Retriever(self.query_embedder, vector_store, query_cache=self.query_cache,
+                                        mode=settings.retrieval_mode, rrf_k=settings.rrf_k,
+                                        vector_timeout=settings.hybrid_vector_timeout,
+                                        packer=ContextPacker(settings.context_max_tokens)
+                                        if settings.context_packing else None))
+
+    async def _reopen_if_stale(self):
+        if self._read_generation() == self._generation:
+            return
+        async with self._reopen_lock:
+            # Another request may have reopened while this one waited for the lock
+            generation = self._read_generation()
+            if generation == self._generation:
+                return
+            logger.info("Index changed in another process, reopening the vector store")
+            # Opening loads the index from disk: off the event loop, serving the old store meanwhile
+            vector_store = await asyncio.to_thread(create_vector_store)
+            self._retired.append((self.retriever, self.vector_store))
+            self._generation = generation
+            self.vector_store = vector_store
+            self.retriever = self.generator.retriever = self._open_retriever(vector_store)
+            # Which sources changed is unknown here, so no cached answer can be trusted
+            self.answer_cache.clear()
+
+    def _close_retired(self, retired):
+        for retriever, vector_store in retired:
+            try:
+                # Waits for searches still running on the store, timed-out hybrid ones included
+                retriever.close()
+                vector_store.close()
+            except Exception as e:
+                logger.warning(f"Failed to close a replaced vector store: {str(e)}")
+
+    async def serve(self, sock: socket.socket):
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.load_components()
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, stop.set)
+
+        server = await asyncio.start_server(self.handle_connection, sock=sock, limit=MAX_HEADER_BYTES)
+        await stop.wait()
+        server.close()
+        # Idle keep-alive connections would otherwise hold wait_closed() open
+        for writer in list(self._connections):
+            writer.close()
+        await server.wait_closed()
+        logger.info(f"Worker {os.getpid()} stopped")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.max_body_bytes)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {'error': e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                handler = self.routes.get((request.method, request.path))
+                if handler is None:
+                    known_path = any(path == request.path for _, path in self.routes)
+                    status = 405 if known_path else 404
+                    await send_json(writer, status, {'error': STATUS_TEXT[status]}, request.keep_alive)
+                elif not await self._dispatch(handler, request, writer):
+                    break
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, handler, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """Run a handler; returns False when the connection must be closed afterwards."""
+        self._in_flight += 1
+        try:
+            await self._reopen_if_stale()
+            # Root of the request's span tree; stages called by the handler nest under it
+            with tracer.span(f"http.{request.path.strip('/')}", method=request.method):
+                return await handler(request, writer)
+        except HTTPError as e:
+            return await self._send_error(request, writer, e.status, e.message)
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            logger.error(f"{request.method} {request.path} failed: {str(e)}")
+            return await self._send_error(request, writer, 500, str(e))
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight and self._retired:
+                retired, self._retired = self._retired, []
+                # Closing blocks until the retrievers' threads are done, so not on the event loop
+                asyncio.get_running_loop().run_in_executor(None, self._close_retired, retired)
+
+    async def _send_error(self, request: Request, writer: asyncio.StreamWriter, status: int, message: str) -> bool:
+        if request.streaming:
+            # The 200 head is already out: a second one would corrupt the stream
+            writer.write(_sse({'error': message, 'status': status}, event='error'))
+            await writer.drain()
+            return False
+        await send_json(writer, status, {'error': message}, request.keep_alive)
+        return True
+
+    async def _acquire_slot(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(503, "Server busy, try again later")
+
+    def _query_params(self, request: Request) -> Dict:
+        data = request.json()
+        query = str(data.get('query', '')).strip()
+        if not query:
+            raise HTTPError(400, "'query' is required")
+        mode = data.get('mode')
+        if mode is not None and mode not in RETRIEVAL_MODES:
+            raise HTTPError(400, f"'mode' must be one of {RETRIEVAL_MODES}")
+        return {
+            'query': query,
+            'top_k': _int_param(data.get('top_k', 5), 'top_k', 1, 50),
+            'max_tokens': _int_param(data.get('max_tokens', 1024), 'max_tokens', 1, MAX_ANSWER_TOKENS),
+            'mode': mode,
+            'stream': bool(data.get('stream', True)),
+        }
+
+    async def health(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        info = self.vector_store.get_collection_info()
+        await send_json(writer, 200, {'status': 'ok', 'pid': os.getpid(), 'points_count': info['points_count']},
+                        request.keep_alive)
+        return True
+
+    async def metrics(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        body = tracer.metrics.to_prometheus().encode('utf-8')
+        await send_body(writer, 200, body, 'text/plain; version=0.0.4', request.keep_alive)
+        return True
+
+    async def traces(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        limit = _int_param(request.params.get('limit', 10), 'limit', 1, 1000)
+        await send_json(writer, 200, {'pid': os.getpid(), 'traces': tracer.recent_traces(limit)}, request.keep_alive)
+        return True
+
+    async def retrieve(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        params = self._query_params(request)
+        await self._acquire_slot()
+        try:
+            results = await self.retriever.retrieve(params['query'], params['top_k'], params['mode'])
+        finally:
+            self._slots.release()
+        await send_json(writer, 200, {'results': [_public(r) for r in results]}, request.keep_alive)
+        return True
+
+    async def query(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        params = self._query_params(request)
+        await self._acquire_slot()
+        try:
+            results = await self.retriever.retrieve(params['query'], params['top_k'], params['mode'])
+            context = self.retriever.format_context(results)
+
+            if not params['stream']:
+                answer = await self.generator.generate_answer(params['query'], context, params['max_tokens'])
+                await send_json(writer, 200, {'answer': answer, 'results': [_public(r) for r in results]},
+                                request.keep_alive)
+                return True
+
+            # Server-sent events: the references first, then one event per generated piece
+            writer.write(_response_head(200, {
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+                'Connection': 'close',
+            }))
+            request.streaming = True
+            writer.write(_sse({'results': [_public(r) for r in results]}, event='context'))
+            await writer.drain()
+            async for text in self.generator.generate_answer_stream(params['query'], context, params['max_tokens']):
+                writer.write(_sse({'text': text}))
+                await writer.drain()
+            writer.write(_sse({}, event='done'))
+            await writer.drain()
+            return False
+        finally:
+            self._slots.release()
+
+    async def ingest(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        if request.headers.get('content-type', '').startswith('application/json') or not request.body:
+            data = request.json()
+            job_id = await asyncio.to_thread(self.job_queue.enqueue_sync, bool(data.get('full', False)))
+            wait = bool(data.get('wait', False))
+        else:
+            filename = Path(request.params.get('filename', '')).name
+            if not filename.lower().endswith('.pdf'):
+                raise HTTPError(400, "A PDF body needs a '?filename=<name>.pdf' parameter")
+            await asyncio.to_thread(_write_atomic, settings.uploads_dir / filename, request.body)
+            job_id = await asyncio.to_thread(self.job_queue.enqueue_file, filename)
+            wait = request.params.get('wait', '') not in ('', '0', 'false')
+
+        if not wait:
+            await send_json(writer, 202, {'job': job_id, 'state': 'queued'}, request.keep_alive)
+            return True
+        # Polled: the job runs in an ingest worker process, not here
+        while (job := await asyncio.to_thread(self.job_queue.get, job_id))['state'] in ('queued', 'running'):
+            await asyncio.sleep(0.5)
+        status = 200 if job['state'] == 'done' else 500
+        await send_json(writer, status, job, request.keep_alive)
+        return True
+
+    async def jobs(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        if 'id' in request.params:
+            job = await asyncio.to_thread(self.job_queue.get, _int_param(request.params['id'], 'id'))
+            if job is None:
+                raise HTTPError(404, f"No job {request.params['id']}")
+            await send_json(writer, 200, job, request.keep_alive)
+            return True
+        limit = _int_param(request.params.get('limit', 20), 'limit', 1, 1000)
+        payload = {
+            'counts': await asyncio.to_thread(self.job_queue.counts),
+            'jobs': await asyncio.to_thread(self.job_queue.jobs, limit),
+        }
+        await send_json(writer, 200, payload, request.keep_alive)
+        return True
+
+
+def run(host: str = "127.0.0.1", port: int = 8000, workers: int = 1, **server_options):
+    """Bind once, then serve from ``workers`` forked processes sharing the listening socket."""
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.set_inheritable(True)
+    logger.info(f"Listening on http://{host}:{port} with {workers} worker(s)")
+
+    if workers <= 1:
+        asyncio.run(RAGServer(**server_options).serve(sock))
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                asyncio.run(RAGServer(**server_options).serve(sock))
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def forward(signum, _frame):
+        for child in children:
+            try:
+                os.kill(child, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for child in children:
+        os.waitpid(child, 0)
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the RAG pipeline over HTTP")
+    parser.add_argument('--host', default=settings.server_host)
+    parser.add_argument('--port', type=int, default=settings.server_port)
+    parser.add_argument('--workers', type=int, default=settings.server_workers)
+    parser.add_argument('--max-concurrency', type=int, default=settings.server_max_concurrency,
+                        help="Concurrent /query and /retrieve requests per worker")
+    parser.add_argument('--queue-timeout', type=float, default=settings.server_queue_timeout,
+                        help="Seconds a request may wait for a slot before a 503")
+    parser.add_argument('--ingest-workers', type=int, default=settings.ingest_workers,
+                        help="Ingest worker processes to start (0 if they run separately)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(name)s %(levelname)s %(message)s")
+    settings.ensure_dirs()
+    # Spawned before the server workers fork; as daemons they exit with this process
+    start_workers(args.ingest_workers)
+    run(args.host, args.port, args.workers, max_concurrency=args.max_concurrency, queue_timeout=args.queue_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Cross-process lock serializing writes to the vector store."""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# One in-process lock per lock file, so threads of one process also queue up
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def store_write_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on ``path`` (an advisory ``flock``) for the duration of the block.
+
+    Every writer to the index (ingest workers, the server's /ingest, the app)
+    takes it around a whole indexing run, so two runs never interleave their
+    deletes and adds or race on the manifest.
+    """
+    path = Path(path)
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(str(path), threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            start = time.monotonic()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            waited = time.monotonic() - start
+            if waited > 1:
+                logger.info(f"Waited {waited:.1f}s for the index write lock")
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
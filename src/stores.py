@@ -0,0 +1,39 @@
+"""Vector store backend selection."""
+
+import logging
+from pathlib import Path
+from typing import Optional
+from .config import settings
+from .lexical_index import LexicalIndex
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("chroma", "numpy")
+
+
+def create_vector_store(backend: Optional[str] = None, collection_name: Optional[str] = None,
+                        persist_directory: Optional[str] = None, lexical: bool = True):
+    """Open the configured vector store; every backend has the same VectorStore API.
+
+    With ``lexical`` the store also maintains the BM25 index used by hybrid and
+    lexical retrieval.
+    """
+    backend = backend or settings.vector_backend
+    if backend == "chroma":
+        from .vector_store import VectorStore
+    elif backend == "numpy":
+        from .vector_store_numpy import VectorStore
+    else:
+        raise ValueError(f"Unknown vector backend '{backend}' (expected one of {BACKENDS})")
+
+    logger.info(f"Using {backend} vector store")
+    collection_name = collection_name or settings.collection_name
+    persist_directory = str(persist_directory or settings.chroma_dir)
+    lexical_index = None
+    if lexical:
+        lexical_index = LexicalIndex(Path(persist_directory) / f"{collection_name}.lexical.sqlite")
+    if backend == "numpy":
+        return VectorStore(collection_name, persist_directory, quantization=settings.vector_quantization,
+                           lexical_index=lexical_index, write_batch_bytes=settings.vector_write_batch_bytes)
+    return VectorStore(collection_name, persist_directory, lexical_index=lexical_index,
+                       write_batch_bytes=settings.vector_write_batch_bytes)
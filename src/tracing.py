@@ -0,0 +1,217 @@
+"""Per-request span trees and per-stage latency histograms."""
+
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+from .config import settings
+from .metrics import MetricsRegistry, metrics as default_metrics
+
+logger = logging.getLogger(__name__)
+
+# Innermost open span of the current thread / asyncio task
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+# Tokens per second of streamed answers
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Span:
+    """One timed stage. Used as a context manager it becomes the parent of spans opened inside it;
+    otherwise call ``finish()`` when the stage ends."""
+
+    __slots__ = ('tracer', 'name', 'attributes', 'children', 'parent', 'started_at', 'duration_ms',
+                 '_start', '_token')
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.children: List[Span] = []
+        self.parent = parent
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self._start = time.perf_counter()
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        if self.duration_ms is None:
+            self.duration_ms = (time.perf_counter() - self._start) * 1000
+            self.tracer._finished(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.finish()
+        return False
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'start': self.started_at,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+            'children': [child.to_dict() for child in list(self.children)],
+        }
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled; every operation does nothing."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def finish(self):
+        pass
+
+    def piece(self, text: str):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class StreamSpan:
+    """Span for a streamed answer: time to first piece and approximate tokens per second."""
+
+    __slots__ = ('span', 'chars', 'first_piece_at')
+
+    def __init__(self, span: Span):
+        self.span = span
+        self.chars = 0
+        self.first_piece_at: Optional[float] = None
+
+    def piece(self, text: str):
+        if self.first_piece_at is None:
+            self.first_piece_at = time.perf_counter()
+            self.span.set(first_token_ms=(self.first_piece_at - self.span._start) * 1000)
+        self.chars += len(text)
+
+    def set(self, **attributes):
+        self.span.set(**attributes)
+
+    def finish(self):
+        if self.span.duration_ms is not None:
+            return
+        # ~4 characters per token, as in RateLimiter.estimate_tokens
+        tokens = self.chars // 4
+        self.span.set(tokens=tokens)
+        tracer = self.span.tracer
+        if self.first_piece_at is not None:
+            tracer.observe(f"{self.span.name}.first_token", self.span.attributes['first_token_ms'])
+            elapsed = time.perf_counter() - self.first_piece_at
+            if tokens and elapsed > 0:
+                self.span.set(tokens_per_sec=tokens / elapsed)
+                tracer.observe(f"{self.span.name}.tokens_per_sec", tokens / elapsed, RATE_BUCKETS, unit="")
+        self.span.finish()
+
+
+class Tracer:
+    """Records spans into per-stage histograms and keeps the most recent span trees.
+
+    ``span(name)`` nests under whatever span is open in the current thread or
+    task, so wrapping a request in one root span yields its full tree (retrieval,
+    embedding, search, generation). Every finished span feeds the
+    ``span.<name>_ms`` histogram; finished trees (roots with children) are kept
+    in memory and, with ``export_path`` set, appended to it as JSON lines.
+    Disabled, ``span()`` returns a shared no-op object and records nothing.
+    """
+
+    def __init__(self, enabled: bool = True, metrics: Optional[MetricsRegistry] = None,
+                 max_traces: int = 100, export_path: Optional[Path] = None):
+        self.enabled = enabled
+        self.metrics = metrics or default_metrics
+        self.export_path = Path(export_path) if export_path else None
+        self._traces = deque(maxlen=max_traces)
+        self._export_lock = threading.Lock()
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        span = Span(self, name, parent, attributes)
+        if parent is not None:
+            parent.children.append(span)
+        return span
+
+    def stream(self, name: str, **attributes):
+        """Span for a token stream: call ``piece(text)`` per piece and ``finish()`` at the end."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return StreamSpan(self.span(name, **attributes))
+
+    def observe(self, name: str, value: float, buckets=None, unit: str = "ms"):
+        if not self.enabled:
+            return
+        metric = f"span.{name}_{unit}" if unit else f"span.{name}"
+        if buckets is None:
+            self.metrics.histogram(metric).observe(value)
+        else:
+            self.metrics.histogram(metric, buckets).observe(value)
+
+    def _finished(self, span: Span):
+        self.observe(span.name, span.duration_ms)
+        # A root with no children (a background batch, say) only feeds the histograms
+        if span.parent is not None or not span.children:
+            return
+        self._traces.append(span)
+        if self.export_path is not None:
+            try:
+                with self._export_lock:
+                    self.export_path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.export_path, "a") as f:
+                        f.write(json.dumps(span.to_dict(), default=str) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not export trace to {self.export_path}: {str(e)}")
+
+    def recent_traces(self, limit: int = 10) -> List[Dict]:
+        """The latest finished span trees, newest first."""
+        return [span.to_dict() for span in list(self._traces)[-limit:][::-1]]
+
+    def stage_percentiles(self) -> Dict[str, Dict]:
+        """Rolling p50/p95/p99 (ms) and call count per traced stage."""
+        stages = {}
+        for name, snapshot in self.metrics.snapshot().items():
+            if name.startswith("span.") and name.endswith("_ms"):
+                stages[name[len("span."):-len("_ms")]] = {
+                    'count': snapshot['count'], 'p50': snapshot['p50'], 'p95': snapshot['p95'], 'p99': snapshot['p99'],
+                }
+        return stages
+
+
+# Process-wide tracer
+tracer = Tracer(enabled=settings.tracing_enabled, export_path=settings.trace_export_path)
+
+
+def traced(name: str):
+    """Decorator: run the function inside ``tracer.span(name)``."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -1,27 +1,49 @@
 """Vector storage and retrieval using ChromaDB."""
 
 import logging
+import time
+import weakref
 from typing import List, Dict, Optional
 from pathlib import Path
 import chromadb
+from chromadb.api.client import SharedSystemClient
 from chromadb.config import Settings as ChromaSettings
+from .bulk_writer import WriteStats, adaptive_batch_size
+from .lexical_index import LexicalIndex
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
 
 class VectorStore:
-    def __init__(self, collection_name: str = "documents", persist_directory: str = "./chroma_db"):
+    def __init__(self, collection_name: str = "documents", persist_directory: str = "./chroma_db",
+                 lexical_index: Optional[LexicalIndex] = None, write_batch_bytes: int = 8 * 2**20):
         self.collection_name = collection_name
+        # Kept in step with the collection on every add/delete
+        self.lexical_index = lexical_index
+        # Payload per upsert call; also capped by the client's own limit
+        self.write_batch_bytes = write_batch_bytes
+        self.write_stats = WriteStats("chroma")
         
         try:
             persist_path = Path(persist_directory)
             persist_path.mkdir(parents=True, exist_ok=True)
             
+            # PersistentClient hands every client on a path the same cached system, and that
+            # system never sees what ingest worker processes write: each store starts its own
+            SharedSystemClient.clear_system_cache()
             self.client = chromadb.PersistentClient(
                 path=str(persist_path),
                 settings=ChromaSettings(anonymized_telemetry=False)
             )
-            logger.info(f"Connected to ChromaDB ({persist_path})")
+            # Stops the system once no one holds this store, for owners that drop it without close()
+            self._stop_system = weakref.finalize(self, self.client._system.stop)
+            try:
+                self.max_batch_size: Optional[int] = self.client.get_max_batch_size()
+            except AttributeError:
+                # chromadb < 0.5 exposes it as a property
+                self.max_batch_size = getattr(self.client, 'max_batch_size', None)
+            logger.info(f"Connected to ChromaDB ({persist_path}, max batch size {self.max_batch_size})")
         except Exception as e:
             logger.error(f"Failed to initialize ChromaDB: {str(e)}")
             raise
@@ -39,7 +61,18 @@ class VectorStore:
             logger.error(f"Failed to create/get collection: {str(e)}")
             raise
     
+    @staticmethod
+    def make_chunk_id(source_file: str, chunk_id: int) -> str:
+        """Deterministic ID, stable across reindexes of the same file."""
+        return f"{source_file}_{chunk_id}"
+    
+    def write_batch_size(self, chunks: List[Dict]) -> int:
+        """Rows per upsert for chunks like these: about ``write_batch_bytes``, within the client's limit."""
+        return adaptive_batch_size(chunks, self.write_batch_bytes, self.max_batch_size)
+    
+    @traced("vector_store.add_chunks")
     def add_chunks(self, chunks: List[Dict]) -> List[str]:
+        """Insert or update chunks; an existing ID is overwritten, not rejected."""
         if not chunks:
             return []
         
@@ -48,8 +81,8 @@ class VectorStore:
         metadatas = []
         documents = []
         
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"chunk_{i}_{chunk['source_file']}_{chunk['chunk_id']}"
+        for chunk in chunks:
+            chunk_id = self.make_chunk_id(chunk['source_file'], chunk['chunk_id'])
             ids.append(chunk_id)
             embeddings.append(chunk['embedding'])
             documents.append(chunk['text'])
@@ -58,60 +91,98 @@ class VectorStore:
                 'total_chunks': chunk['total_chunks'],
                 'source_file': chunk['source_file'],
                 'source_path': chunk.get('source_path', ''),
+                # Offsets into the converted markdown (-1 for chunks from older chunkers)
+                'char_start': chunk.get('char_start', -1),
+                'char_end': chunk.get('char_end', -1),
             })
         
-        # Add in batches
-        batch_size = 100
+        batch_size = self.write_batch_size(chunks)
         for i in range(0, len(ids), batch_size):
             batch_end = min(i + batch_size, len(ids))
-            self.collection.add(
+            start = time.perf_counter()
+            self.collection.upsert(
                 ids=ids[i:batch_end],
                 embeddings=embeddings[i:batch_end],
                 documents=documents[i:batch_end],
                 metadatas=metadatas[i:batch_end]
             )
-            logger.info(f"Batch {i//batch_size + 1}: {batch_end - i} chunks")
+            self.write_stats.record(batch_end - i, time.perf_counter() - start)
+        
+        if self.lexical_index is not None:
+            self.lexical_index.add_chunks(chunks, ids)
         
         logger.info(f"Added {len(ids)} chunks")
         return ids
     
     def search(self, query_vector: List[float], limit: int = 5, source_filter: Optional[str] = None) -> List[Dict]:
+        return self.search_batch([query_vector], limit, source_filter)[0]
+    
+    @traced("vector_store.search")
+    def search_batch(self, query_vectors: List[List[float]], limit: int = 5,
+                     source_filter: Optional[str] = None) -> List[List[Dict]]:
+        """Search many query vectors in one collection.query call; one result list per query."""
+        if not query_vectors:
+            return []
         where_filter = {"source_file": source_filter} if source_filter else None
         
         results = self.collection.query(
-            query_embeddings=[query_vector],
+            query_embeddings=query_vectors,
             n_results=limit,
             where=where_filter,
             include=["documents", "metadatas", "distances"]
         )
         
-        formatted_results = []
-        if results and results['ids'] and results['ids'][0]:
-            for i in range(len(results['ids'][0])):
-                # ChromaDB returns distances (lower is better), convert to similarity score
-                distance = results['distances'][0][i]
-                similarity = 1 / (1 + distance)  # Convert distance to similarity
-                
-                formatted_results.append({
-                    'id': results['ids'][0][i],
-                    'score': similarity,
-                    'text': results['documents'][0][i],
-                    'source_file': results['metadatas'][0][i]['source_file'],
-                    'chunk_id': results['metadatas'][0][i]['chunk_id'],
-                })
+        all_results = []
+        for q in range(len(query_vectors)):
+            formatted_results = []
+            if results and results['ids'] and results['ids'][q]:
+                for i in range(len(results['ids'][q])):
+                    # ChromaDB returns distances (lower is better), convert to similarity score
+                    distance = results['distances'][q][i]
+                    similarity = 1 / (1 + distance)  # Convert distance to similarity
+                    
+                    formatted_results.append({
+                        'id': results['ids'][q][i],
+                        'score': similarity,
+                        'text': results['documents'][q][i],
+                        'source_file': results['metadatas'][q][i]['source_file'],
+                        'chunk_id': results['metadatas'][q][i]['chunk_id'],
+                        'char_start': results['metadatas'][q][i].get('char_start', -1),
+                        'char_end': results['metadatas'][q][i].get('char_end', -1),
+                    })
+            all_results.append(formatted_results)
         
-        logger.info(f"Found {len(formatted_results)} chunks")
-        return formatted_results
+        logger.info(f"Found {sum(len(r) for r in all_results)} chunks for {len(query_vectors)} queries")
+        return all_results
+    
+    def delete_source(self, source_file: str):
+        """Remove every chunk that came from one source file."""
+        try:
+            self.collection.delete(where={"source_file": source_file})
+            if self.lexical_index is not None:
+                self.lexical_index.delete_source(source_file)
+            logger.info(f"Deleted chunks from {source_file}")
+        except Exception as e:
+            logger.error(f"Failed to delete {source_file}: {str(e)}")
+            raise
     
     def delete_collection(self):
         try:
             self.client.delete_collection(name=self.collection_name)
+            if self.lexical_index is not None:
+                self.lexical_index.clear()
             logger.info(f"Deleted collection")
             self._ensure_collection()  # Recreate it
         except Exception as e:
             logger.error(f"Failed to delete: {str(e)}")
             raise
     
+    def close(self):
+        """Stop this store's ChromaDB system and close its lexical index."""
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+        self._stop_system()
+    
     def get_collection_info(self) -> Dict:
         try:
             count = self.collection.count()
@@ -0,0 +1,507 @@
+"""In-process exact vector search over a memory-mapped NumPy matrix."""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Iterable, Optional
+import numpy as np
+from .bulk_writer import WriteStats, adaptive_batch_size
+from .lexical_index import LexicalIndex
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("int8", "binary")
+
+# Rows handled per block in calibration and binary scoring
+_BLOCK_ROWS = 65536
+# int8 rows converted per block: small enough for the float32 buffer to stay in cache
+_INT8_BLOCK_ROWS = 4096
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return _POPCOUNT[x]
+
+
+class _Quantizer:
+    """Per-collection scalar (int8) or 1-bit (binary) codes for normalized vectors.
+
+    int8 uses a per-dimension scale (max |x| over the collection / 127) and scores
+    asymmetrically: codes @ (scale * query). binary thresholds each dimension at
+    its collection mean and scores by negative Hamming distance.
+    """
+
+    def __init__(self, mode: str, params: np.ndarray):
+        self.mode = mode
+        self.params = params.astype(np.float32)
+
+    @classmethod
+    def calibrate(cls, mode: str, blocks: Iterable[np.ndarray]) -> "_Quantizer":
+        """Fit on blocks of vectors, so calibration never holds the whole matrix in memory."""
+        stat, count = None, 0
+        for block in blocks:
+            if mode == "int8":
+                block_stat = np.abs(block).max(axis=0)
+                stat = block_stat if stat is None else np.maximum(stat, block_stat)
+            else:
+                block_stat = block.sum(axis=0, dtype=np.float64)
+                stat = block_stat if stat is None else stat + block_stat
+            count += len(block)
+
+        if mode == "int8":
+            scale = stat / 127.0
+            return cls(mode, np.where(scale == 0, 1.0, scale))
+        return cls(mode, stat / max(count, 1))
+
+    def code_width(self, dim: int) -> int:
+        return dim if self.mode == "int8" else (dim + 7) // 8
+
+    @property
+    def code_dtype(self):
+        return np.int8 if self.mode == "int8" else np.uint8
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.mode == "int8":
+            return np.clip(np.rint(vectors / self.params), -127, 127).astype(np.int8)
+        return np.packbits(vectors > self.params, axis=1)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate similarity of every code row to the query (higher is better)."""
+        out = np.empty(len(codes), dtype=np.float32)
+        if self.mode == "int8":
+            weights = (self.params * query).astype(np.float32)
+            buffer = np.empty((min(_INT8_BLOCK_ROWS, len(codes)), codes.shape[1]), dtype=np.float32)
+            for i in range(0, len(codes), _INT8_BLOCK_ROWS):
+                block = codes[i:i + _INT8_BLOCK_ROWS]
+                converted = buffer[:len(block)]
+                np.copyto(converted, block, casting='unsafe')
+                out[i:i + len(block)] = converted @ weights
+        else:
+            query_code = np.packbits(query > self.params)
+            for i in range(0, len(codes), _BLOCK_ROWS):
+                out[i:i + _BLOCK_ROWS] = -_popcount(codes[i:i + _BLOCK_ROWS] ^ query_code).sum(axis=1, dtype=np.int32)
+        return out
+
+    def to_json(self) -> Dict:
+        return {'mode': self.mode, 'params': self.params.tolist()}
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "_Quantizer":
+        return cls(data['mode'], np.asarray(data['params'], dtype=np.float32))
+
+
+class VectorStore:
+    """Brute-force cosine search; a drop-in alternative to the ChromaDB store.
+
+    Vectors are L2-normalized and kept in ``vectors.npy`` (memory-mapped, grown
+    by doubling), so a query is one matrix-vector product plus ``argpartition``.
+    Chunk text and metadata live in a SQLite sidecar. Rows freed by deletes are
+    reused by later inserts.
+
+    With ``quantization`` set to "int8" or "binary", compact codes are kept in
+    ``codes.npy`` and scanned instead of the float matrix; the best
+    ``limit * rescore_factor`` candidates are then rescored with the full-precision
+    vectors, which are only read for those rows. Binary codes are much coarser,
+    so they get a larger default candidate pool.
+    """
+
+    def __init__(self, collection_name: str = "documents", persist_directory: str = "./chroma_db",
+                 quantization: Optional[str] = None, rescore_factor: Optional[int] = None,
+                 lexical_index: Optional[LexicalIndex] = None, write_batch_bytes: int = 8 * 2**20):
+        if quantization is not None and quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization '{quantization}' (expected one of {QUANTIZATION_MODES})")
+        self.collection_name = collection_name
+        self.path = Path(persist_directory) / f"{collection_name}.npstore"
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor or (20 if quantization == "binary" else 4)
+        self.recall_at_k: Optional[float] = None
+        self.lexical_index = lexical_index
+        # Rows written per call by BulkWriter; there is no backend limit, so payload size decides
+        self.write_batch_bytes = write_batch_bytes
+        self.write_stats = WriteStats("numpy")
+        self._lock = threading.RLock()
+        self._open()
+
+    def _open(self):
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path / "meta.sqlite"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, source_file TEXT NOT NULL, "
+                "chunk_id INTEGER, total_chunks INTEGER, source_path TEXT, text TEXT, "
+                "char_start INTEGER NOT NULL DEFAULT -1, char_end INTEGER NOT NULL DEFAULT -1)"
+            )
+            columns = {column[1] for column in self._db.execute("PRAGMA table_info(chunks)")}
+            for column in ('char_start', 'char_end'):
+                if column not in columns:
+                    # Sidecars written before chunks carried offsets
+                    self._db.execute(f"ALTER TABLE chunks ADD COLUMN {column} INTEGER NOT NULL DEFAULT -1")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_source ON chunks(source_file)")
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"Failed to initialize NumPy store: {str(e)}")
+            raise
+
+        self._load()
+        logger.info(f"NumPy store ready: {self.collection_name} ({len(self._ids)} chunks, {self.path})")
+
+    def _load(self):
+        """Map the vector files and rebuild the in-memory row state from the sidecar."""
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        vectors_path = self.path / "vectors.npy"
+        self._vectors = np.load(vectors_path, mmap_mode='r+') if vectors_path.exists() else None
+
+        self._quantizer: Optional[_Quantizer] = None
+        self._codes = None
+        self._calibrated_count = 0
+        quant_path = self.path / "quant.json"
+        if self.quantization and quant_path.exists() and (self.path / "codes.npy").exists():
+            data = json.loads(quant_path.read_text(encoding='utf-8'))
+            if data['mode'] == self.quantization:
+                self._quantizer = _Quantizer.from_json(data)
+                self._calibrated_count = data.get('calibrated_count', 0)
+                self.recall_at_k = data.get('recall_at_k')
+                self._codes = np.load(self.path / "codes.npy", mmap_mode='r+')
+
+        # In-memory row state, rebuilt from the sidecar: which rows are live and their source
+        rows = self._db.execute("SELECT row, id, source_file FROM chunks").fetchall()
+        self._count = max((row for row, _, _ in rows), default=-1) + 1
+        capacity = 0 if self._vectors is None else len(self._vectors)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._sources = np.full(capacity, -1, dtype=np.int32)
+        self._source_codes: Dict[str, int] = {}
+        self._ids: Dict[str, int] = {}
+        for row, chunk_id, source_file in rows:
+            self._alive[row] = True
+            self._sources[row] = self._source_code(source_file)
+            self._ids[chunk_id] = row
+        self._free = [row for row in range(self._count) if not self._alive[row]]
+
+    def _refresh(self):
+        """Reload if another connection (an ingest worker process) has committed since the last look."""
+        # data_version changes only for commits made through other connections
+        if self._db.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            logger.info(f"NumPy store {self.collection_name} changed on disk, reloading")
+            self._load()
+
+    def _source_code(self, source_file: str) -> int:
+        return self._source_codes.setdefault(source_file, len(self._source_codes))
+
+    def _ensure_capacity(self, needed: int, dim: int):
+        capacity = 0 if self._vectors is None else len(self._vectors)
+        if needed <= capacity:
+            return
+
+        new_capacity = max(1024, capacity * 2, needed)
+        vectors_path = self.path / "vectors.npy"
+        tmp_path = self.path / "vectors.npy.tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(new_capacity, dim))
+        if self._vectors is not None:
+            grown[:capacity] = self._vectors
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(tmp_path, vectors_path)
+        self._vectors = np.load(vectors_path, mmap_mode='r+')
+
+        if self._quantizer is not None:
+            self._codes = self._grow_codes(new_capacity, dim)
+
+        self._alive = np.concatenate([self._alive, np.zeros(new_capacity - capacity, dtype=bool)])
+        self._sources = np.concatenate([self._sources, np.full(new_capacity - capacity, -1, dtype=np.int32)])
+        logger.info(f"Grew vector file to {new_capacity} rows")
+
+    def _grow_codes(self, capacity: int, dim: int) -> np.ndarray:
+        codes_path = self.path / "codes.npy"
+        tmp_path = self.path / "codes.npy.tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=self._quantizer.code_dtype,
+                                          shape=(capacity, self._quantizer.code_width(dim)))
+        if self._codes is not None:
+            grown[:len(self._codes)] = self._codes
+        grown.flush()
+        del grown
+        self._codes = None
+        os.replace(tmp_path, codes_path)
+        return np.load(codes_path, mmap_mode='r+')
+
+    def calibrate(self, sample_queries: int = 100, k: int = 10):
+        """(Re)fit the quantizer on all live vectors, re-encode them and measure recall@k."""
+        with self._lock:
+            if not self.quantization or self._vectors is None or not self._ids:
+                return
+            live = np.flatnonzero(self._alive[:self._count])
+            blocks = (np.asarray(self._vectors[live[i:i + _BLOCK_ROWS]]) for i in range(0, len(live), _BLOCK_ROWS))
+            self._quantizer = _Quantizer.calibrate(self.quantization, blocks)
+            self._codes = None
+            self._codes = self._grow_codes(len(self._vectors), self._vectors.shape[1])
+            for i in range(0, self._count, _BLOCK_ROWS):
+                self._codes[i:i + _BLOCK_ROWS] = self._quantizer.encode(np.asarray(self._vectors[i:i + _BLOCK_ROWS]))
+            self._codes.flush()
+            self._calibrated_count = len(live)
+
+            # Stored vectors double as queries: how often does the quantized top-k match exact search?
+            rng = np.random.default_rng(0)
+            sample = rng.choice(live, size=min(sample_queries, len(live)), replace=False)
+            self.recall_at_k = self.measure_recall(np.asarray(self._vectors[sample]), k)
+
+            (self.path / "quant.json").write_text(json.dumps({
+                **self._quantizer.to_json(),
+                'calibrated_count': self._calibrated_count,
+                'recall_at_k': self.recall_at_k,
+                'k': k,
+            }), encoding='utf-8')
+        logger.info(f"Calibrated {self.quantization} codes on {self._calibrated_count} vectors "
+                    f"(recall@{k}={self.recall_at_k:.3f})")
+
+    def measure_recall(self, queries, k: int = 10) -> float:
+        """Mean recall@k of quantized search against exact search for the given query vectors."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        hits = 0
+        total = 0
+        with self._lock:
+            valid = self._alive[:self._count]
+            k = min(k, int(valid.sum()))
+            if self._quantizer is None or k == 0:
+                return 1.0
+            for query in queries:
+                query = query / (np.linalg.norm(query) or 1.0)
+                exact = set(self._top_rows_exact(query, k, valid).tolist())
+                approx = set(self._top_rows_quantized(query, k, valid).tolist())
+                hits += len(exact & approx)
+                total += len(exact)
+        return hits / total if total else 1.0
+
+    @staticmethod
+    def make_chunk_id(source_file: str, chunk_id: int) -> str:
+        """Deterministic ID, stable across reindexes of the same file."""
+        return f"{source_file}_{chunk_id}"
+
+    def write_batch_size(self, chunks: List[Dict]) -> int:
+        return adaptive_batch_size(chunks, self.write_batch_bytes)
+
+    @traced("vector_store.add_chunks")
+    def add_chunks(self, chunks: List[Dict]) -> List[str]:
+        """Insert or update chunks (existing IDs are overwritten in place) in one write."""
+        if not chunks:
+            return []
+
+        start = time.perf_counter()
+        vectors = np.asarray([chunk['embedding'] for chunk in chunks], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            self._refresh()
+            if self._vectors is not None and self._vectors.shape[1] != vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match "
+                                 f"collection dimension {self._vectors.shape[1]}")
+
+            ids = [self.make_chunk_id(chunk['source_file'], chunk['chunk_id']) for chunk in chunks]
+            # Existing IDs are overwritten in place, new ones take a free row or extend the file
+            rows = []
+            for chunk_id in ids:
+                if chunk_id in self._ids:
+                    rows.append(self._ids[chunk_id])
+                elif self._free:
+                    rows.append(self._free.pop())
+                else:
+                    rows.append(self._count)
+                    self._count += 1
+                self._ids[chunk_id] = rows[-1]
+
+            self._ensure_capacity(self._count, vectors.shape[1])
+            rows_array = np.asarray(rows)
+            self._vectors[rows_array] = vectors
+            self._vectors.flush()
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, source_file, chunk_id, total_chunks, source_path, text, "
+                "char_start, char_end) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row, chunk_id, chunk['source_file'], chunk['chunk_id'], chunk['total_chunks'],
+                  chunk.get('source_path', ''), chunk['text'], chunk.get('char_start', -1), chunk.get('char_end', -1))
+                 for row, chunk_id, chunk in zip(rows, ids, chunks)]
+            )
+            self._db.commit()
+
+            self._alive[rows_array] = True
+            self._sources[rows_array] = [self._source_code(chunk['source_file']) for chunk in chunks]
+
+            if self.quantization:
+                # Calibrate on first data, and again once the collection has doubled since
+                if self._quantizer is None or len(self._ids) > 2 * self._calibrated_count:
+                    self.calibrate()
+                else:
+                    self._codes[rows_array] = self._quantizer.encode(vectors)
+                    self._codes.flush()
+
+            if self.lexical_index is not None:
+                self.lexical_index.add_chunks(chunks, ids)
+
+        self.write_stats.record(len(ids), time.perf_counter() - start)
+        return ids
+
+    def search(self, query_vector: List[float], limit: int = 5, source_filter: Optional[str] = None) -> List[Dict]:
+        return self.search_batch([query_vector], limit, source_filter)[0]
+
+    @traced("vector_store.search")
+    def search_batch(self, query_vectors: List[List[float]], limit: int = 5,
+                     source_filter: Optional[str] = None) -> List[List[Dict]]:
+        """Search many query vectors at once; exact search scores them as one matrix product."""
+        if not len(query_vectors):
+            return []
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1, norms)
+        empty = [[] for _ in range(len(queries))]
+
+        with self._lock:
+            self._refresh()
+            if self._vectors is None or not self._ids:
+                return empty
+
+            valid = self._alive[:self._count].copy()
+            if source_filter:
+                code = self._source_codes.get(source_filter)
+                if code is None:
+                    return empty
+                valid &= self._sources[:self._count] == code
+
+            k = min(limit, int(valid.sum()))
+            if k == 0:
+                return empty
+            if self._quantizer is not None:
+                tops = [self._top_rows_quantized(query, k, valid) for query in queries]
+            else:
+                tops = self._top_rows_exact_batch(queries, k, valid)
+            scores = [np.asarray(self._vectors[top]) @ query for top, query in zip(tops, queries)]
+
+            wanted = sorted({int(row) for top in tops for row in top})
+            by_row = {}
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(wanted), 900):
+                part = wanted[i:i + 900]
+                placeholders = ",".join("?" * len(part))
+                for row in self._db.execute(
+                    f"SELECT row, id, source_file, chunk_id, text, char_start, char_end FROM chunks "
+                    f"WHERE row IN ({placeholders})", part
+                ):
+                    by_row[row[0]] = row
+            ids = self._ids
+
+        all_results = []
+        for top, top_scores in zip(tops, scores):
+            formatted_results = []
+            for row, score in zip(top, top_scores):
+                if int(row) not in by_row:
+                    continue  # Deleted by an ingest worker since the row state was loaded
+                _, chunk_id, source_file, chunk_index, text, char_start, char_end = by_row[int(row)]
+                if ids.get(chunk_id) != int(row):
+                    continue  # Row reused by an ingest worker for another chunk
+                # Same scale as the Chroma store: cosine distance d mapped to 1 / (1 + d)
+                distance = 1.0 - float(score)
+                formatted_results.append({
+                    'id': chunk_id,
+                    'score': 1 / (1 + distance),
+                    'text': text,
+                    'source_file': source_file,
+                    'chunk_id': chunk_index,
+                    'char_start': char_start,
+                    'char_end': char_end,
+                })
+            all_results.append(formatted_results)
+
+        logger.info(f"Found {sum(len(r) for r in all_results)} chunks for {len(queries)} queries")
+        return all_results
+
+    def _top_rows_exact(self, query: np.ndarray, k: int, valid: np.ndarray) -> np.ndarray:
+        return self._top_rows_exact_batch(query[None, :], k, valid)[0]
+
+    def _top_rows_exact_batch(self, queries: np.ndarray, k: int, valid: np.ndarray) -> List[np.ndarray]:
+        tops = []
+        # Score 256 queries per matrix product to bound the (rows x queries) score matrix
+        for i in range(0, len(queries), 256):
+            scores = self._vectors[:self._count] @ queries[i:i + 256].T
+            scores[~valid] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            top_scores = np.take_along_axis(scores, top, axis=0)
+            order = np.argsort(-top_scores, axis=0)
+            tops.extend(np.take_along_axis(top, order, axis=0).T)
+        return tops
+
+    def _top_rows_quantized(self, query: np.ndarray, k: int, valid: np.ndarray) -> np.ndarray:
+        approx = self._quantizer.scores(self._codes[:self._count], query)
+        approx[~valid] = -np.inf
+        num_candidates = min(k * self.rescore_factor, int(valid.sum()))
+        candidates = np.argpartition(-approx, num_candidates - 1)[:num_candidates]
+        # Rescore with full precision; only the candidate rows are read from disk
+        candidates.sort()
+        exact = np.asarray(self._vectors[candidates]) @ query
+        order = np.argsort(-exact)[:k]
+        return candidates[order]
+
+    def delete_source(self, source_file: str):
+        """Remove every chunk that came from one source file."""
+        with self._lock:
+            self._refresh()
+            if self.lexical_index is not None:
+                self.lexical_index.delete_source(source_file)
+            rows = [row for row, in self._db.execute(
+                "SELECT row FROM chunks WHERE source_file = ?", (source_file,)
+            )]
+            if not rows:
+                return
+            self._db.execute("DELETE FROM chunks WHERE source_file = ?", (source_file,))
+            self._db.commit()
+
+            rows_array = np.asarray(rows)
+            self._alive[rows_array] = False
+            self._sources[rows_array] = -1
+            self._ids = {chunk_id: row for chunk_id, row in self._ids.items() if self._alive[row]}
+            self._free.extend(rows)
+        logger.info(f"Deleted chunks from {source_file}")
+
+    def delete_collection(self):
+        try:
+            with self._lock:
+                self._db.close()
+                self._vectors = None
+                self._codes = None
+                shutil.rmtree(self.path)
+                if self.lexical_index is not None:
+                    self.lexical_index.clear()
+                logger.info(f"Deleted collection")
+                self._open()  # Recreate it
+        except Exception as e:
+            logger.error(f"Failed to delete: {str(e)}")
+            raise
+
+    def close(self):
+        """Close the sidecar, the memory maps and the lexical index."""
+        with self._lock:
+            self._db.close()
+            self._vectors = None
+            self._codes = None
+            if self.lexical_index is not None:
+                self.lexical_index.close()
+
+    def get_collection_info(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            info = {
+                'name': self.collection_name,
+                'points_count': len(self._ids),
+            }
+        if self.quantization:
+            info['quantization'] = self.quantization
+            info['recall_at_k'] = self.recall_at_k
+        return info
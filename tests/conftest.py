@@ -0,0 +1,42 @@
+"""Shared offline stand-ins: the benchmark suite's fake Gemini client and a text-file 'PDF' processor."""
+
+from pathlib import Path
+
+import pytest
+
+from benchmarks.fakes import FakeGenaiClient, fake_embedder
+
+
+class TextFileProcessor:
+    """DocumentProcessor stand-in: each '.pdf' holds plain text, which is used as the markdown."""
+
+    def __init__(self):
+        self.converted = []
+
+    def iter_pdfs(self, pdf_paths, workers: int = 1):
+        for pdf_path in pdf_paths:
+            self.converted.append(Path(pdf_path).name)
+            yield {'filename': Path(pdf_path).stem, 'source_path': str(pdf_path),
+                   'content': Path(pdf_path).read_text(encoding='utf-8')}
+
+    def save_markdown(self, document, output_dir):
+        path = Path(output_dir) / f"{document['filename']}.md"
+        path.write_text(document['content'], encoding='utf-8')
+        return path
+
+
+@pytest.fixture
+def fake_client():
+    return FakeGenaiClient(dim=16)
+
+
+@pytest.fixture
+def embedder(fake_client, monkeypatch):
+    """A real Gemini EmbeddingGenerator whose API calls go to ``fake_client``."""
+    monkeypatch.setenv('GEMINI_API_KEY', "test-key")
+    return fake_embedder(fake_client)
+
+
+@pytest.fixture
+def processor():
+    return TextFileProcessor()
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from src import answer_cache
+from src.answer_cache import AsyncCachedGenerator, CachedGenerator, SemanticAnswerCache
+from src.query_cache import QueryEmbeddingCache
+from src.retriever import AsyncRetriever, Retriever
+from src.stores import create_vector_store
+
+
+class CountingEmbedder:
+    model_name = "fake-embedding"
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_text(self, text):
+        self.calls += 1
+        return [1.0, float(len(text) % 7), 0.5]
+
+
+class CountingGenerator:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_answer(self, query, context, max_tokens=500):
+        self.calls += 1
+        return f"answer {self.calls}"
+
+
+class AsyncCountingGenerator(CountingGenerator):
+    async def generate_answer(self, query, context, max_tokens=500):
+        return super().generate_answer(query, context, max_tokens)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = create_vector_store("numpy", "documents", tmp_path)
+    store.add_chunks([
+        {'source_file': "a.pdf", 'chunk_id': i, 'total_chunks': 2, 'text': text, 'embedding': [1.0, i, 0.5]}
+        for i, text in enumerate(["cookies track visitors", "privacy policies disclose data sharing"])
+    ])
+    yield store
+    store.close()
+
+
+def test_semantic_match_needs_same_chunks_and_similar_query():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store([1.0, 0.0], ["a_0", "a_1"], ["a.pdf"], 500, "cached")
+    assert cache.lookup([0.99, 0.05], ["a_1", "a_0"], 500) == "cached"
+    assert cache.lookup([0.0, 1.0], ["a_0", "a_1"], 500) is None
+    assert cache.lookup([1.0, 0.0], ["a_0"], 500) is None
+    assert cache.lookup([1.0, 0.0], ["a_0", "a_1"], 200) is None
+
+    cache.invalidate_sources(["a.pdf"])
+    assert cache.lookup([1.0, 0.0], ["a_0", "a_1"], 500) is None
+
+
+def test_without_embedding_only_the_same_text_matches():
+    cache = SemanticAnswerCache()
+    cache.store(None, ["a_0"], ["a.pdf"], 500, "cached", query="What is  tracked?")
+    assert cache.lookup(None, ["a_0"], 500, query="what is tracked?") == "cached"
+    assert cache.lookup(None, ["a_0"], 500, query="what is shared?") is None
+    assert cache.lookup([1.0, 0.0], ["a_0"], 500, query="what is shared?") is None
+
+
+def test_lexical_retrieval_answers_from_cache_without_embedding(store):
+    embedder = CountingEmbedder()
+    retriever = Retriever(embedder, store, query_cache=QueryEmbeddingCache(), mode="lexical")
+    generator = CountingGenerator()
+    cached = CachedGenerator(generator, retriever, SemanticAnswerCache())
+
+    for _ in range(2):
+        context = retriever.format_context(retriever.retrieve("what do cookies track?", top_k=2))
+        assert cached.generate_answer("what do cookies track?", context) == "answer 1"
+    assert generator.calls == 1
+    assert embedder.calls == 0
+
+
+def test_vector_retrieval_reuses_the_query_embedding(store):
+    embedder = CountingEmbedder()
+    retriever = AsyncRetriever(Retriever(embedder, store, query_cache=QueryEmbeddingCache(), mode="hybrid"))
+    generator = AsyncCountingGenerator()
+    cached = AsyncCachedGenerator(generator, retriever, SemanticAnswerCache())
+
+    async def ask():
+        context = retriever.format_context(await retriever.retrieve("what do cookies track?", top_k=2))
+        return await cached.generate_answer("what do cookies track?", context)
+
+    assert asyncio.run(ask()) == "answer 1"
+    assert asyncio.run(ask()) == "answer 1"
+    assert embedder.calls == 1
+
+
+class StreamingGenerator:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.calls = 0
+
+    def generate_answer_stream(self, query, context, max_tokens=500):
+        self.calls += 1
+        yield from self.pieces
+
+
+def test_streamed_answer_is_stored_and_replayed(store):
+    retriever = Retriever(CountingEmbedder(), store, query_cache=QueryEmbeddingCache())
+    generator = StreamingGenerator(["Cookies ", "track ", "visitors."])
+    cached = CachedGenerator(generator, retriever, SemanticAnswerCache())
+    context = retriever.format_context(retriever.retrieve("what do cookies track?", top_k=2))
+
+    assert "".join(cached.generate_answer_stream("what do cookies track?", context)) == "Cookies track visitors."
+    replay = list(cached.generate_answer_stream("What do cookies track?", context))
+    assert replay == ["Cookies ", "track ", "visitors."]
+    assert generator.calls == 1
+
+
+def test_errors_and_unknown_contexts_are_not_cached(store):
+    retriever = Retriever(CountingEmbedder(), store, query_cache=QueryEmbeddingCache())
+    generator = StreamingGenerator(["Partial answer ", "Error: connection reset"])
+    cache = SemanticAnswerCache()
+    cached = CachedGenerator(generator, retriever, cache)
+    context = retriever.format_context(retriever.retrieve("what do cookies track?", top_k=2))
+
+    for _ in range(2):
+        list(cached.generate_answer_stream("what do cookies track?", context))
+    # A context that did not come from format_context bypasses the cache
+    for _ in range(2):
+        list(cached.generate_answer_stream("what do cookies track?", "hand-written context"))
+    assert generator.calls == 4
+    assert cache.stats()['entries'] == 0
+
+
+def test_oldest_contexts_are_evicted_and_entries_expire(monkeypatch):
+    cache = SemanticAnswerCache(max_entries=2, ttl_seconds=60)
+    for i in range(3):
+        cache.store([1.0, 0.0], [f"a_{i}"], ["a.pdf"], 500, f"answer {i}")
+    assert cache.lookup([1.0, 0.0], ["a_0"], 500) is None
+    assert cache.lookup([1.0, 0.0], ["a_2"], 500) == "answer 2"
+
+    real_time = answer_cache.time.time
+    monkeypatch.setattr(answer_cache.time, 'time', lambda: real_time() + 61)
+    assert cache.lookup([1.0, 0.0], ["a_2"], 500) is None
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from benchmarks import run
+from benchmarks.corpus import make_markdown, make_vectors
+
+
+def test_compare_flags_only_timings_over_the_threshold():
+    results = {'store.search_ms': 1.3, 'store.build_s': 1.1, 'chunker.chunks': 900, 'new_ms': 5.0}
+    baseline = {'store.search_ms': 1.0, 'store.build_s': 1.0, 'chunker.chunks': 100, 'old_ms': 5.0}
+    rows = run.compare(results, baseline, threshold=0.2)
+    assert [(row['metric'], row['regressed']) for row in rows] == [('store.build_s', False), ('store.search_ms', True)]
+    assert rows[1]['ratio'] == pytest.approx(1.3)
+
+
+def test_corpus_is_reproducible():
+    assert make_markdown(5000, seed=3) == make_markdown(5000, seed=3)
+    assert (make_vectors(10, 8, seed=1) == make_vectors(10, 8, seed=1)).all()
+
+
+def test_unknown_benchmark_is_rejected():
+    with pytest.raises(SystemExit):
+        run.parse_args(["--only", "chunker,nonsense"])
+
+
+def test_run_writes_results_and_fails_on_regression(tmp_path, capsys):
+    output, baseline = tmp_path / "latest.json", tmp_path / "baseline.json"
+    args = ["--only", "chunker", "--chunk-chars", "20000", "--repeat", "1",
+            "--output", str(output), "--baseline", str(baseline)]
+    assert run.main(args + ["--save-baseline"]) == 0
+    report = json.loads(output.read_text())
+    assert report['results']['chunker.chunks'] > 0 and 'python' in report['environment']
+    assert json.loads(baseline.read_text())['results'] == report['results']
+
+    # A baseline 100x faster than this machine: every timing regresses
+    faster = {metric: value / 100 if run.is_timing(metric) else value
+              for metric, value in report['results'].items()}
+    baseline.write_text(json.dumps({'results': faster}))
+    assert run.main(args) == 1
+    assert "REGRESSION" in capsys.readouterr().out
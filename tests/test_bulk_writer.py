@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from src.bulk_writer import BulkWriter, adaptive_batch_size, estimate_chunk_bytes
+from src.stores import create_vector_store
+
+
+def make_chunks(source_file, count, dim=8, text="chunk text"):
+    return [{'source_file': source_file, 'chunk_id': i, 'total_chunks': count, 'text': text,
+             'embedding': [float(i + 1)] + [0.5] * (dim - 1)} for i in range(count)]
+
+
+class RecordingStore:
+    """Records the order of writes; optionally fails on one source or blocks until released."""
+
+    def __init__(self, batch_size=3, fail_on=None):
+        self.batch_size = batch_size
+        self.fail_on = fail_on
+        self.ops = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def write_batch_size(self, chunks):
+        return self.batch_size
+
+    def add_chunks(self, chunks):
+        self.release.wait()
+        if any(chunk['source_file'] == self.fail_on for chunk in chunks):
+            raise IOError("disk full")
+        self.ops.append(('add', [f"{c['source_file']}_{c['chunk_id']}" for c in chunks]))
+
+    def delete_source(self, source_file):
+        self.ops.append(('delete', source_file))
+
+
+def test_batch_size_targets_a_payload():
+    chunks = make_chunks("a.pdf", 10, dim=256, text="x" * 1000)
+    per_chunk = estimate_chunk_bytes(chunks[0])
+    assert per_chunk == 4 * 256 + 1000 + 256
+    assert adaptive_batch_size(chunks, 100 * per_chunk) == 100
+    assert adaptive_batch_size(chunks, 100 * per_chunk, max_batch_size=40) == 40
+    assert adaptive_batch_size(chunks, 1) == 1
+
+
+@pytest.mark.parametrize("threaded", [True, False])
+def test_batches_and_deletes_keep_their_order(threaded):
+    store = RecordingStore(batch_size=3)
+    with BulkWriter(store, threaded=threaded) as writer:
+        writer.delete_source("a.pdf")
+        writer.add_chunks(make_chunks("a.pdf", 4))
+        writer.delete_source("b.pdf")
+        writer.add_chunks(make_chunks("b.pdf", 2))
+    assert store.ops == [
+        ('delete', "a.pdf"),
+        ('add', ["a.pdf_0", "a.pdf_1", "a.pdf_2"]),
+        ('add', ["a.pdf_3"]),
+        ('delete', "b.pdf"),
+        ('add', ["b.pdf_0", "b.pdf_1"]),
+    ]
+
+
+def test_write_error_is_sticky():
+    store = RecordingStore(batch_size=2, fail_on="a.pdf")
+    writer = BulkWriter(store)
+    writer.add_chunks(make_chunks("a.pdf", 2))
+    with pytest.raises(IOError):
+        writer.flush()
+    with pytest.raises(IOError):
+        writer.add_chunks(make_chunks("b.pdf", 2))
+    writer.abort()
+    assert store.ops == []
+
+
+def test_abort_drops_the_buffer():
+    store = RecordingStore(batch_size=10)
+    writer = BulkWriter(store)
+    writer.add_chunks(make_chunks("a.pdf", 4))
+    writer.abort()
+    assert store.ops == []
+
+
+def test_writes_overlap_with_the_caller():
+    store = RecordingStore(batch_size=2)
+    store.release.clear()
+    writer = BulkWriter(store, max_pending=2)
+    # The writer thread is blocked on the first batch; the caller is not
+    writer.add_chunks(make_chunks("a.pdf", 4))
+    assert store.ops == []
+    store.release.set()
+    writer.close()
+    assert [op for op, _ in store.ops] == ["add", "add"]
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_stores_size_batches_by_payload(backend, tmp_path):
+    store = create_vector_store(backend, "documents", tmp_path)
+    chunks = make_chunks("a.pdf", 50, dim=64, text="privacy " * 50)
+    size = store.write_batch_size(chunks)
+    assert 1 <= size <= store.write_batch_bytes // estimate_chunk_bytes(chunks[0])
+    with BulkWriter(store) as writer:
+        writer.add_chunks(chunks)
+    assert store.get_collection_info()['points_count'] == 50
+    assert store.write_stats.batch_rows.snapshot()['count'] >= 1
+    store.close()
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from src.chunker import TextChunker
+
+
+def make_text(seed, paragraphs=30):
+    rng = random.Random(seed)
+    words = ["privacy", "data", "cookies", "consent", "retention", "partners", "security", "notice"]
+    return "\n\n".join(
+        " ".join(" ".join(rng.choice(words) for _ in range(rng.randint(4, 25))).capitalize() + "."
+                 for _ in range(rng.randint(1, 6)))
+        for _ in range(paragraphs)
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_spans_cover_the_text_within_size_and_overlap(seed):
+    text = make_text(seed)
+    chunker = TextChunker(chunk_size=300, chunk_overlap=60)
+    spans = chunker.split_spans(text)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text.rstrip())
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        assert end - start <= 300
+        # Consecutive chunks overlap by at most chunk_overlap and leave no text out
+        assert start < next_start <= end or not text[end:next_start].strip()
+        assert end - next_start <= 60
+        assert next_end > end
+
+
+def test_consecutive_chunks_share_literal_text():
+    text = " ".join(f"Sentence {i} describes how personal data is handled." for i in range(50))
+    chunks = TextChunker(chunk_size=200, chunk_overlap=80).split_text(text)
+    for chunk, following in zip(chunks, chunks[1:]):
+        # The overlap starts on a sentence
+        assert following.startswith("Sentence")
+        assert chunk.endswith(following[:following.index(".") + 1])
+
+
+def test_breaks_prefer_paragraphs_then_sentences_then_words():
+    paragraph = "First paragraph sentence one. " * 6
+    text = paragraph.strip() + "\n\n" + "Second paragraph here. " * 10
+    chunks = TextChunker(chunk_size=len(paragraph) + 40, chunk_overlap=0).split_text(text)
+    assert chunks[0] == paragraph.strip()
+
+    chunks = TextChunker(chunk_size=50, chunk_overlap=0).split_text("one two three four five six " * 10)
+    assert all(len(chunk) <= 50 and not chunk.endswith(" ") for chunk in chunks)
+    assert " ".join(chunks).split() == ("one two three four five six " * 10).split()
+
+
+def test_chunk_document_records_offsets():
+    document = {'filename': "a", 'source_path': "a.pdf", 'content': make_text(1)}
+    chunks = TextChunker(chunk_size=300, chunk_overlap=60).chunk_document(document)
+    assert [c['chunk_id'] for c in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert document['content'][chunk['char_start']:chunk['char_end']] == chunk['text']
+        assert chunk['total_chunks'] == len(chunks)
+
+
+def test_token_units_and_invalid_settings():
+    text = make_text(2)
+    assert TextChunker(75, 15, unit="tokens").split_spans(text) == TextChunker(300, 60).split_spans(text)
+    with pytest.raises(ValueError):
+        TextChunker(100, 100)
+    with pytest.raises(ValueError):
+        TextChunker(100, 10, unit="words")
+    assert TextChunker().split_text("  \n ") == []
+
+
+def test_process_pool_gives_the_same_chunks():
+    documents = [{'filename': str(i), 'content': make_text(i)} for i in range(4)]
+    chunker = TextChunker(chunk_size=300, chunk_overlap=60)
+    assert chunker.chunk_documents(documents, workers=2) == chunker.chunk_documents(documents)
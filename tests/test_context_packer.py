@@ -0,0 +1,49 @@
+from src.chunker import TextChunker
+from src.context_packer import ContextPacker, merge_overlapping
+
+TEXT = " ".join(f"Sentence number {i} explains one more detail of the privacy policy." for i in range(40))
+
+
+def result(source_file, chunk_id, text):
+    return {'id': f"{source_file}_{chunk_id}", 'source_file': source_file, 'chunk_id': chunk_id, 'text': text}
+
+
+def test_merge_overlapping_keeps_the_overlap_once():
+    assert merge_overlapping("alpha beta gamma delta", "gamma delta epsilon") == "alpha beta gamma delta epsilon"
+    assert merge_overlapping("alpha beta", "gamma delta") == "alpha beta\ngamma delta"
+
+
+def test_adjacent_chunks_rebuild_the_source_text():
+    chunks = TextChunker(chunk_size=300, chunk_overlap=80).split_text(TEXT)
+    results = [result("a.pdf", i, chunk) for i, chunk in enumerate(chunks)]
+    # Rank order is not document order; the passage still reads in document order
+    results.reverse()
+    passages = ContextPacker(max_tokens=10_000).merge_adjacent(results)
+    assert len(passages) == 1
+    assert passages[0]['text'] == TEXT
+
+
+def test_gaps_and_sources_split_passages_in_rank_order():
+    results = [result("b.pdf", 0, "B zero."), result("a.pdf", 5, "A five."),
+               result("a.pdf", 1, "A one."), result("a.pdf", 2, "A two.")]
+    passages = ContextPacker().merge_adjacent(results)
+    assert [(p['source_file'], [c['chunk_id'] for c in p['chunks']]) for p in passages] == [
+        ("b.pdf", [0]), ("a.pdf", [5]), ("a.pdf", [1, 2])]
+
+
+def test_repeated_sentences_are_dropped():
+    boilerplate = "This policy may change at any time without notice."
+    results = [result("a.pdf", 0, f"Cookies track visits. {boilerplate}"),
+               result("b.pdf", 0, f"{boilerplate} Data is kept for a year.")]
+    passages = ContextPacker().pack(results)
+    assert [p['text'] for p in passages] == [f"Cookies track visits. {boilerplate}", "Data is kept for a year."]
+
+
+def test_budget_is_respected_and_cut_at_a_sentence():
+    results = [result(f"{name}.pdf", 0, TEXT) for name in "abc"]
+    # Words as tokens, so the cost of a passage is exactly the sum of its sentences
+    packer = ContextPacker(max_tokens=200, token_estimator=lambda text: len(text.split()))
+    passages = packer.pack(results)
+    assert len(passages) == 1
+    assert passages[0]['text'].endswith(".")
+    assert 190 < 5 + packer.estimate_tokens(passages[0]['text']) <= 200
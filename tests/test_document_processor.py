@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.document_processor import DocumentProcessor
+
+
+class FakeConverter:
+    """docling's DocumentConverter stand-in: the 'PDF' bytes are the markdown."""
+
+    def __init__(self):
+        self.converted = []
+
+    def convert(self, path):
+        self.converted.append(path)
+        with open(path, encoding='utf-8') as f:
+            content = f.read()
+        if content.startswith("%broken"):
+            raise ValueError("not a PDF")
+        return SimpleNamespace(document=SimpleNamespace(export_to_markdown=lambda: content.upper()))
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    directory = tmp_path / "uploads"
+    directory.mkdir()
+    for name, content in (("a", "first document"), ("b", "second document"), ("c", "%broken")):
+        (directory / f"{name}.pdf").write_text(content, encoding='utf-8')
+    return directory
+
+
+def make_processor(tmp_path) -> DocumentProcessor:
+    processor = DocumentProcessor(cache_dir=tmp_path / "cache")
+    processor._converter = FakeConverter()
+    return processor
+
+
+def test_pool_serves_cache_hits_locally_and_skips_failures(tmp_path, pdfs):
+    make_processor(tmp_path).process_pdf(pdfs / "a.pdf")
+
+    # Worker processes build a real converter, and neither b nor c is a real PDF:
+    # only the cached a comes back (converted here), and the failures do not raise
+    processor = DocumentProcessor(cache_dir=tmp_path / "cache")
+    documents = list(processor.iter_pdfs(sorted(pdfs.glob("*.pdf")), workers=2))
+    assert [d['filename'] for d in documents] == ["a"]
+    assert documents[0]['content'] == "FIRST DOCUMENT"
+    assert processor._converter is None
+
+
+def test_in_process_conversion_yields_in_order_and_skips_failures(tmp_path, pdfs):
+    processor = make_processor(tmp_path)
+    documents = processor.process_directory(pdfs, workers=1)
+    assert sorted(d['filename'] for d in documents) == ["a", "b"]
+
+
+def test_conversion_is_cached_by_content(tmp_path, pdfs):
+    processor = make_processor(tmp_path)
+    first = processor.process_pdf(pdfs / "a.pdf")
+    again = make_processor(tmp_path)
+    assert again.process_pdf(pdfs / "a.pdf") == first
+    assert again._converter.converted == []
+
+    # A renamed copy is the same content; an edit is not
+    (pdfs / "copy.pdf").write_bytes((pdfs / "a.pdf").read_bytes())
+    assert again.process_pdf(pdfs / "copy.pdf")['content'] == "FIRST DOCUMENT"
+    (pdfs / "a.pdf").write_text("first document, edited", encoding='utf-8')
+    assert again.process_pdf(pdfs / "a.pdf")['content'] == "FIRST DOCUMENT, EDITED"
+    assert len(again._converter.converted) == 1
+
+
+def test_converter_options_are_part_of_the_key(tmp_path, pdfs):
+    processor = make_processor(tmp_path)
+    key = processor.cache_key(pdfs / "a.pdf")
+    processor.converter_options = "DocumentConverter(ocr=True)"
+    assert processor.cache_key(pdfs / "a.pdf") != key
+
+
+def test_cache_can_be_disabled(tmp_path, pdfs):
+    processor = DocumentProcessor(cache_dir=tmp_path / "cache", use_cache=False)
+    processor._converter = FakeConverter()
+    processor.process_pdf(pdfs / "a.pdf")
+    processor.process_pdf(pdfs / "a.pdf")
+    assert len(processor._converter.converted) == 2
+    assert not (tmp_path / "cache").exists()
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.embedding_batcher import EmbeddingBatcher
+from src.metrics import MetricsRegistry
+
+
+class RecordingEmbedder:
+    model_name = "fake-embedding"
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def embed_batch(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+        return [None if "bad" in text else [float(len(text))] for text in texts]
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def make(embedder, **options):
+        batcher = EmbeddingBatcher(embedder, metrics=MetricsRegistry(), **options)
+        batchers.append(batcher)
+        return batcher
+    yield make
+    for batcher in batchers:
+        batcher.close()
+
+
+def test_concurrent_calls_are_coalesced(make_batcher):
+    embedder = RecordingEmbedder()
+    batcher = make_batcher(embedder, window_ms=200)
+    texts = [f"query {'x' * i}" for i in range(20)]
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        embeddings = list(pool.map(batcher.embed_text, texts))
+    assert embeddings == [[float(len(text))] for text in texts]
+    assert len(embedder.batches) < 5
+    assert sorted(text for batch in embedder.batches for text in batch) == sorted(texts)
+
+
+def test_batches_are_capped_and_duplicates_share_a_slot(make_batcher):
+    embedder = RecordingEmbedder()
+    batcher = make_batcher(embedder, window_ms=200, max_batch_size=4)
+    futures = [batcher.submit(text) for text in ["a", "b", "c", "d", "e", "a"]]
+    assert [future.result() for future in futures] == [[1.0]] * 6
+    assert all(len(batch) <= 4 for batch in embedder.batches)
+    assert sum(batch.count("a") for batch in embedder.batches) <= 2
+    assert batcher.batch_size.snapshot()['count'] == len(embedder.batches)
+
+
+def test_failures_reach_only_their_callers(make_batcher):
+    embedder = RecordingEmbedder()
+    batcher = make_batcher(embedder, window_ms=100)
+    good, bad = batcher.submit("good"), batcher.submit("bad")
+    assert good.result() == [4.0]
+    with pytest.raises(RuntimeError, match="Embedding failed"):
+        bad.result()
+
+    def unavailable(texts):
+        raise ConnectionError("embedding service down")
+
+    embedder.embed_batch = unavailable
+    with pytest.raises(ConnectionError):
+        batcher.embed_text("anything")
+
+
+def test_async_callers_share_a_batch(make_batcher):
+    embedder = RecordingEmbedder()
+    batcher = make_batcher(embedder, window_ms=100)
+
+    async def ask():
+        return await asyncio.gather(*(batcher.embed_text_async(text) for text in ["a", "bb", "ccc"]))
+
+    assert asyncio.run(ask()) == [[1.0], [2.0], [3.0]]
+    assert embedder.batches == [["a", "bb", "ccc"]]
+
+
+def test_close_sends_what_is_queued():
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, window_ms=60_000, metrics=MetricsRegistry())
+    future = batcher.submit("late")
+    batcher.close()
+    assert future.result(timeout=1) == [4.0]
+    assert batcher.model_name == "fake-embedding"
@@ -0,0 +1,61 @@
+import itertools
+
+import pytest
+
+from src import embedding_cache
+from src.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(embedding_cache.time, 'time', lambda: float(next(ticks)))
+
+
+def test_round_trip_is_keyed_by_model_and_normalized_text(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    cache.put("model-a", "hello   world", [0.5, -1.25])
+    assert cache.get("model-a", " hello world\n") == [0.5, -1.25]
+    assert cache.get("model-b", "hello world") is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_persists_across_instances(tmp_path):
+    EmbeddingCache(tmp_path / "embeddings.sqlite").put("m", "text", [1.0])
+    assert EmbeddingCache(tmp_path / "embeddings.sqlite").get("m", "text") == [1.0]
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite", max_entries=2)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    cache.get("m", "a")  # "b" is now the least recently used
+    cache.put("m", "c", [3.0])
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_failed_and_zero_vectors_are_not_cached(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    cache.put_many("m", ["none", "zero", "ok"], [None, [0.0, 0.0], [0.1, 0.2]])
+    assert cache.stats()['entries'] == 1
+    assert cache.get_many("m", ["none", "zero"]) == [None, None]
+
+
+def test_embedder_sends_only_misses(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from src.embeddings import EmbeddingGenerator
+
+    sent = []
+
+    def embed_content(model, contents):
+        texts = [contents] if isinstance(contents, str) else contents
+        sent.append(texts)
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[float(len(text))]) for text in texts])
+
+    monkeypatch.setenv('GEMINI_API_KEY', "test-key")
+    embedder = EmbeddingGenerator(cache=EmbeddingCache(tmp_path / "embeddings.sqlite"))
+    embedder.client = SimpleNamespace(models=SimpleNamespace(embed_content=embed_content))
+
+    assert embedder.embed_batch(["one", "three"]) == [[3.0], [5.0]]
+    assert embedder.embed_batch(["three", "four", "four"]) == [[5.0], [4.0], [4.0]]
+    assert sent == [["one", "three"], ["four"]]
@@ -0,0 +1,149 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from google.genai import errors
+
+from src import embeddings, embeddings_ollama
+from src.embeddings import EmbeddingGenerator, _is_retryable
+from src.rate_limiter import RateLimiter
+
+# make_embedder patches time.sleep away (it is the module the embedder sees too)
+real_sleep = time.sleep
+
+
+class FakeModels:
+    """Stands in for ``client.models``: fails on texts containing "bad", or with ``failures`` first."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+
+    def embed_content(self, model, contents):
+        texts = [contents] if isinstance(contents, str) else contents
+        self.calls.append(texts)
+        if self.failures:
+            raise self.failures.pop(0)
+        if any("bad" in text for text in texts):
+            raise errors.ClientError(400, {'error': {'code': 400, 'message': "invalid input"}})
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[float(len(text))]) for text in texts])
+
+
+@pytest.fixture
+def make_embedder(monkeypatch):
+    monkeypatch.setenv('GEMINI_API_KEY', "test-key")
+    monkeypatch.setattr(embeddings.time, 'sleep', lambda seconds: None)
+
+    def make(models, **options):
+        embedder = EmbeddingGenerator(max_retries=3, **options)
+        embedder.client = SimpleNamespace(models=models)
+        return embedder
+    return make
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (errors.ServerError(503, {'error': {'code': 503, 'message': "unavailable"}}), True),
+    (errors.ClientError(429, {'error': {'code': 429, 'message': "slow down"}}), True),
+    (errors.ClientError(400, {'error': {'code': 400, 'message': "bad"}}), False),
+    (httpx.ConnectTimeout("timed out"), True),
+    (ConnectionResetError(), True),
+    (KeyError('embeddings'), False),
+    (TypeError("'NoneType' object is not iterable"), False),
+])
+def test_is_retryable(error, retryable):
+    assert _is_retryable(error) is retryable
+
+
+def test_transport_errors_are_retried(make_embedder):
+    models = FakeModels(failures=[httpx.ReadTimeout("timed out")] * 2)
+    assert make_embedder(models).embed_text("hello") == [5.0]
+    assert len(models.calls) == 3
+
+
+def test_malformed_response_fails_fast(make_embedder):
+    models = FakeModels(failures=[KeyError('embeddings')])
+    with pytest.raises(KeyError):
+        make_embedder(models).embed_text("hello")
+    assert len(models.calls) == 1
+
+
+def test_rejected_inputs_are_isolated_by_bisection(make_embedder):
+    models = FakeModels()
+    texts = ["one", "two", "bad three", "four"]
+    assert make_embedder(models).embed_batch(texts) == [[3.0], [3.0], None, [4.0]]
+    # Whole batch, both halves, then the failing half's two singles
+    assert len(models.calls) == 5
+
+
+def test_programming_errors_are_bisected_not_retried(make_embedder):
+    models = FakeModels(failures=[TypeError("unexpected response")])
+    assert make_embedder(models).embed_batch(["one", "two"]) == [[3.0], [3.0]]
+    assert len(models.calls) == 3
+
+
+class SlowModels(FakeModels):
+    """FakeModels whose calls take a while; records the peak number running at once."""
+
+    def __init__(self, delay=0.05):
+        super().__init__()
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed_content(self, model, contents):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            real_sleep(self.delay)
+            return super().embed_content(model, contents)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def test_batches_run_concurrently_and_keep_order(make_embedder):
+    models = SlowModels()
+    texts = ["x" * n for n in range(1, 13)]
+    embedded = make_embedder(models, max_concurrency=4).embed_batch(texts, batch_size=2)
+    assert embedded == [[float(n)] for n in range(1, 13)]
+    assert len(models.calls) == 6
+    assert models.peak == 4
+
+
+def test_serial_by_default(make_embedder):
+    models = SlowModels(delay=0.01)
+    make_embedder(models).embed_batch(["a", "b", "c", "d"], batch_size=1)
+    assert models.peak == 1
+
+
+def test_every_call_goes_through_the_rate_limiter(make_embedder):
+    acquired = []
+    limiter = RateLimiter()
+    limiter.acquire = acquired.append
+    make_embedder(FakeModels(), rate_limiter=limiter).embed_batch(["x" * 40, "x" * 80, "x" * 8], batch_size=2)
+    assert acquired == [30, 2]
+
+
+class FakeOllamaClient:
+    def __init__(self):
+        self.calls = []
+
+    def list(self):
+        return SimpleNamespace(models=[SimpleNamespace(model="nomic-embed-text:v1.5")])
+
+    def embed(self, model, input, keep_alive=None):
+        self.calls.append(list(input))
+        return {'embeddings': [[float(len(text))] for text in input]}
+
+
+def test_ollama_embeds_in_multi_input_batches():
+    client = FakeOllamaClient()
+    session = SimpleNamespace(client=client, keep_alive="5m", record=lambda model, response: None)
+    embedder = embeddings_ollama.EmbeddingGenerator(session=session, max_concurrency=3, warmup=False)
+    texts = ["x" * n for n in range(1, 8)]
+    assert embedder.embed_batch(texts, batch_size=3) == [[float(n)] for n in range(1, 8)]
+    assert sorted(len(call) for call in client.calls) == [1, 3, 3]
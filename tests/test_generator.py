@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.generator import AsyncGenerator, Generator
+
+
+class FakeAioModels:
+    def __init__(self, pieces, fail_after=None):
+        self.pieces = pieces
+        self.fail_after = fail_after
+        self.prompts = []
+
+    async def generate_content(self, model, contents, config=None):
+        self.prompts.append(contents)
+        return SimpleNamespace(text="".join(self.pieces))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.prompts.append(contents)
+
+        async def stream():
+            for i, piece in enumerate(self.pieces):
+                if i == self.fail_after:
+                    raise ConnectionError("stream reset")
+                await asyncio.sleep(0)
+                yield SimpleNamespace(text=piece)
+        return stream()
+
+
+class FakeModels:
+    def __init__(self, pieces, fail_after=None):
+        self.pieces = pieces
+        self.fail_after = fail_after
+
+    def generate_content(self, model, contents, config=None):
+        return SimpleNamespace(text="".join(self.pieces))
+
+    def generate_content_stream(self, model, contents, config=None):
+        for i, piece in enumerate(self.pieces):
+            if i == self.fail_after:
+                raise ConnectionError("stream reset")
+            yield SimpleNamespace(text=piece)
+
+
+@pytest.fixture
+def make_generator(monkeypatch):
+    monkeypatch.setenv('GEMINI_API_KEY', "test-key")
+
+    def make(models):
+        generator = AsyncGenerator("offline")
+        generator.client = SimpleNamespace(aio=SimpleNamespace(models=models))
+        return generator
+    return make
+
+
+async def collect(stream):
+    return [piece async for piece in stream]
+
+
+def test_answers_and_streams(make_generator):
+    models = FakeAioModels(["Cookies ", "track ", "visitors."])
+    generator = make_generator(models)
+    assert asyncio.run(generator.generate_answer("What do cookies do?", "context")) == "Cookies track visitors."
+    pieces = asyncio.run(collect(generator.generate_answer_stream("What do cookies do?", "context")))
+    assert pieces == ["Cookies ", "track ", "visitors."]
+    assert all("What do cookies do?" in prompt and "context" in prompt for prompt in models.prompts)
+
+
+def test_stream_failure_ends_with_an_error_piece(make_generator):
+    generator = make_generator(FakeAioModels(["Cookies ", "track ", "visitors."], fail_after=1))
+    pieces = asyncio.run(collect(generator.generate_answer_stream("q", "context")))
+    assert pieces == ["Cookies ", "Error: stream reset"]
+
+
+def test_concurrent_answers_share_one_loop(make_generator):
+    generator = make_generator(FakeAioModels(["a", "b"]))
+
+    async def many():
+        return await asyncio.gather(*(collect(generator.generate_answer_stream(f"q{i}", "c")) for i in range(20)))
+
+    assert asyncio.run(many()) == [["a", "b"]] * 20
+
+
+def test_sync_generator_handles_responses_the_same_way(monkeypatch):
+    monkeypatch.setenv('GEMINI_API_KEY', "test-key")
+    generator = Generator("offline")
+    generator.client = SimpleNamespace(models=FakeModels(["Cookies ", "track ", "visitors."], fail_after=1))
+    assert generator.generate_answer("q", "context") == "Cookies track visitors."
+    assert list(generator.generate_answer_stream("q", "context")) == ["Cookies ", "Error: stream reset"]
@@ -0,0 +1,85 @@
+import os
+
+from src.chunker import TextChunker
+from src.indexer import Indexer
+from src.manifest import IndexManifest
+from src.stores import create_vector_store
+
+TEXT = "Privacy policies describe how personal data is collected and shared. " * 20
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return path
+
+
+def test_manifest_diff(tmp_path):
+    a, b, c = (write(tmp_path / f"{name}.pdf", name * 10) for name in "abc")
+    manifest = IndexManifest(tmp_path / "manifest.json")
+    for path in (a, b):
+        manifest.record(path, num_chunks=1)
+    manifest.record(write(tmp_path / "gone.pdf", "gone"), num_chunks=1)
+    manifest.save()
+
+    # Touched but identical: not a change. Same size, new content: a change
+    os.utime(a, (1, 1))
+    write(b, "B" * 10)
+    diff = IndexManifest(tmp_path / "manifest.json").diff([a, b, c])
+    assert diff['added'] == [c]
+    assert diff['changed'] == [b]
+    assert diff['unchanged'] == [a]
+    assert diff['removed'] == ["gone.pdf"]
+
+
+def test_sync_indexes_only_added_and_changed_files(tmp_path, embedder, fake_client, processor):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    write(uploads / "a.pdf", TEXT)
+    write(uploads / "b.pdf", TEXT.upper())
+    store = create_vector_store("numpy", "documents", tmp_path / "store")
+    changed_sources = []
+    indexer = Indexer(embedder, store, tmp_path / "manifest.json", TextChunker(300, 50),
+                      on_sources_changed=changed_sources.extend)
+    indexer._processor = processor
+
+    stats = indexer.sync(uploads)
+    assert stats['added'] == ["a.pdf", "b.pdf"] and not stats['failed']
+    total = store.get_collection_info()['points_count']
+    assert total == stats['chunks'] > 0
+
+    calls = fake_client.embedding_service.calls
+    assert indexer.sync(uploads)['unchanged'] == 2
+    assert fake_client.embedding_service.calls == calls
+    assert processor.converted == ["a.pdf", "b.pdf"]
+
+    write(uploads / "b.pdf", TEXT.upper() + " Updated.")
+    (uploads / "a.pdf").unlink()
+    stats = indexer.sync(uploads)
+    assert stats['changed'] == ["b.pdf"] and stats['removed'] == ["a.pdf"]
+    assert processor.converted == ["a.pdf", "b.pdf", "b.pdf"]
+    assert {r['source_file'] for r in store.search([1.0] * 16, limit=100)} == {"b"}
+    assert set(changed_sources) == {"a", "b"}
+    store.close()
+
+
+
+def test_sync_reports_progress_once_each_file_is_searchable(tmp_path, embedder, processor):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    for name in ("a", "b", "c"):
+        write(uploads / f"{name}.pdf", TEXT)
+    store = create_vector_store("numpy", "documents", tmp_path / "store")
+    indexer = Indexer(embedder, store, tmp_path / "manifest.json", TextChunker(300, 50))
+    indexer._processor = processor
+
+    progress = []
+
+    def on_progress(done, total, name):
+        # Queries during the sync see every file reported so far
+        searchable = {r['source_file'] for r in store.search([1.0] * 16, limit=100)}
+        progress.append((done, total, name, sorted(searchable)))
+
+    indexer.sync(uploads, on_progress=on_progress)
+    assert progress == [(0, 3, "", []), (1, 3, "a.pdf", ["a"]), (2, 3, "b.pdf", ["a", "b"]),
+                        (3, 3, "c.pdf", ["a", "b", "c"])]
+    store.close()
@@ -0,0 +1,116 @@
+import pytest
+
+from src.chunker import TextChunker
+from src.config import settings
+from src.indexer import Indexer
+from src.ingest_worker import IngestWorker
+from src.job_queue import JobQueue
+from src.stores import create_vector_store
+
+TEXT = "Privacy policies describe how personal data is collected and shared. " * 20
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'store_lock_path', tmp_path / "store" / ".write.lock")
+    monkeypatch.setattr(settings, 'index_generation_path', tmp_path / "store" / ".generation")
+    (tmp_path / "store").mkdir()
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    return uploads
+
+
+class ClosingStore:
+    """Wraps a store and records whether the worker closed it."""
+
+    opened = []
+
+    def __init__(self, store):
+        self.store = store
+        self.closed = False
+        self.opened.append(self)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def close(self):
+        self.closed = True
+        self.store.close()
+
+
+@pytest.fixture
+def worker(tmp_path, uploads, embedder, processor):
+    ClosingStore.opened = []
+
+    def build_indexer():
+        # A fresh indexer per job, as in the worker process
+        store = ClosingStore(create_vector_store("numpy", "documents", tmp_path / "store"))
+        indexer = Indexer(embedder, store, tmp_path / "manifest.json", TextChunker(300, 50))
+        indexer._processor = processor
+        return indexer
+
+    queue = JobQueue(tmp_path / "jobs.sqlite", max_attempts=2, retry_delay=0)
+    yield IngestWorker(queue, indexer_factory=build_indexer, uploads_dir=uploads)
+    queue.close()
+
+
+def indexed_sources(tmp_path):
+    store = create_vector_store("numpy", "documents", tmp_path / "store")
+    sources = {r['source_file'] for r in store.search([1.0] * 16, limit=1000)}
+    store.close()
+    return sources
+
+
+def test_file_jobs_index_skip_and_remove(tmp_path, uploads, worker, processor):
+    (uploads / "a.pdf").write_text(TEXT, encoding='utf-8')
+    job_id = worker.queue.enqueue_file("a.pdf")
+    worker.run(drain=True)
+    job = worker.queue.get(job_id)
+    assert job['state'] == "done" and job['result']['chunks'] > 0
+    assert (job['progress_done'], job['progress_total']) == (1, 1)
+    assert settings.index_generation_path.exists()
+    assert indexed_sources(tmp_path) == {"a"}
+
+    # Same content again: nothing is converted
+    job_id = worker.queue.enqueue_file("a.pdf")
+    worker.run(drain=True)
+    assert worker.queue.get(job_id)['result']['unchanged'] and processor.converted == ["a.pdf"]
+
+    (uploads / "a.pdf").unlink()
+    job_id = worker.queue.enqueue_file("a.pdf")
+    worker.run(drain=True)
+    assert worker.queue.get(job_id)['result'] == {'file': "a.pdf", 'removed': True}
+    assert indexed_sources(tmp_path) == set()
+    assert len(ClosingStore.opened) == 3 and all(store.closed for store in ClosingStore.opened)
+
+
+def test_failing_job_is_retried_then_failed(uploads, worker, monkeypatch):
+    (uploads / "a.pdf").write_text(TEXT, encoding='utf-8')
+
+    def broken_factory():
+        raise RuntimeError("store unavailable")
+
+    monkeypatch.setattr(worker, 'indexer_factory', broken_factory)
+    job_id = worker.queue.enqueue_sync()
+    worker.run(drain=True)
+    job = worker.queue.get(job_id)
+    assert job['state'] == "failed" and job['attempts'] == 2
+    assert job['error'] == "store unavailable"
+
+
+def test_failed_job_still_makes_readers_reopen(tmp_path, uploads, worker, monkeypatch):
+    (uploads / "a.pdf").write_text(TEXT, encoding='utf-8')
+    worker.queue.enqueue_file("a.pdf")
+    worker.run(drain=True)
+    settings.index_generation_path.unlink()
+
+    def fail_after_writing(self, directory, full=False, on_progress=None):
+        self.remove_file("a.pdf")
+        raise RuntimeError("conversion crashed")
+
+    monkeypatch.setattr(Indexer, 'sync', fail_after_writing)
+    job_id = worker.queue.enqueue_sync()
+    worker.run_once()
+    assert worker.queue.get(job_id)['error'] == "conversion crashed"
+    assert settings.index_generation_path.exists()
+    assert ClosingStore.opened[-1].closed
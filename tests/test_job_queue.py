@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from src.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite", max_attempts=2, retry_delay=0.05, lease_seconds=0.2)
+    yield queue
+    queue.close()
+
+
+def test_identical_queued_jobs_are_deduplicated(queue):
+    first = queue.enqueue_file("uploads/a.pdf")
+    assert queue.enqueue_file("a.pdf") == first
+    assert queue.enqueue_sync() != first
+    assert queue.counts()['queued'] == 2
+
+
+def test_expired_lease_is_claimed_again(queue):
+    job_id = queue.enqueue_sync()
+    assert queue.claim("worker-1")['id'] == job_id
+    assert queue.claim("worker-2") is None
+
+    time.sleep(0.25)
+    job = queue.claim("worker-2")
+    assert job['id'] == job_id and job['attempts'] == 2
+    queue.complete(job_id, {'indexed': 1})
+    assert queue.get(job_id)['state'] == 'done'
+    assert queue.get(job_id)['result'] == {'indexed': 1}
+
+
+def test_failed_job_is_retried_after_backoff_then_fails(queue):
+    job_id = queue.enqueue_file("a.pdf")
+    queue.claim("worker")
+    assert queue.fail(job_id, "boom") is True
+    assert queue.claim("worker") is None  # Still backing off
+
+    time.sleep(0.1)
+    assert queue.claim("worker")['attempts'] == 2
+    assert queue.fail(job_id, "boom again") is False
+    job = queue.get(job_id)
+    assert job['state'] == 'failed' and job['error'] == "boom again"
+    assert queue.last_finished_at() > 0
@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+from src.lexical_index import LexicalIndex, tokenize
+
+
+def make_chunk(source_file, chunk_id, text):
+    return {'source_file': source_file, 'chunk_id': chunk_id, 'text': text}
+
+
+def add(index, source_file, texts):
+    chunks = [make_chunk(source_file, i, text) for i, text in enumerate(texts)]
+    index.add_chunks(chunks, [f"{source_file}_{i}" for i in range(len(texts))])
+
+
+def test_sees_rows_committed_by_another_connection(tmp_path):
+    # The app or server reads while an ingest worker process writes the same file
+    reader = LexicalIndex(tmp_path / "lexical.sqlite")
+    writer = LexicalIndex(tmp_path / "lexical.sqlite")
+    add(reader, "a.pdf", ["privacy policy text"])
+    assert reader.count() == 1
+
+    add(writer, "b.pdf", ["cookie consent banner", "privacy of cookie data"])
+    results = reader.search("cookie privacy", limit=5)
+    assert {r['id'] for r in results} == {"a.pdf_0", "b.pdf_0", "b.pdf_1"}
+    assert reader.count() == 3
+
+    writer.delete_source("b.pdf")
+    assert [r['id'] for r in reader.search("cookie privacy")] == ["a.pdf_0"]
+    assert reader.count() == 1
+    reader.close()
+    writer.close()
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("What is the GDPR's scope?") == ["gdpr", "s", "scope"]
+
+
+def test_bm25_prefers_rare_terms_and_short_documents(tmp_path):
+    index = LexicalIndex(tmp_path / "lexical.sqlite")
+    add(index, "a.pdf", [
+        "privacy notice about cookies",
+        "privacy notice",
+        "privacy notice " + "filler words " * 30 + "cookies",
+        "privacy terms",
+    ])
+    # "cookies" is rarer than "privacy", so both cookie chunks lead, the short one first
+    assert [r['id'] for r in index.search("privacy cookies", limit=2)] == ["a.pdf_0", "a.pdf_2"]
+    assert index.search("nothing matches", limit=5) == []
+    assert index.search("the and of", limit=5) == []
+    index.close()
+
+
+def test_score_is_okapi_bm25(tmp_path):
+    index = LexicalIndex(tmp_path / "lexical.sqlite", k1=1.2, b=0.75)
+    add(index, "a.pdf", ["cookie cookie banner", "consent form", "consent banner text here"])
+    # "cookie": in 1 of 3 docs, tf=2, length 3, average length (3 + 2 + 4) / 3 = 3
+    idf = math.log(1 + (3 - 1 + 0.5) / (1 + 0.5))
+    expected = idf * 2 * 2.2 / (2 + 1.2 * (1 - 0.75 + 0.75 * 3 / 3))
+    assert index.search("cookie")[0]['score'] == pytest.approx(expected)
+    index.close()
+
+
+def test_source_filter_and_replacement(tmp_path):
+    index = LexicalIndex(tmp_path / "lexical.sqlite")
+    add(index, "a.pdf", ["cookie policy"])
+    add(index, "b.pdf", ["cookie banner"])
+    assert [r['id'] for r in index.search("cookie", source_filter="b.pdf")] == ["b.pdf_0"]
+
+    # Same ID again: the old postings go, the chunk is not duplicated
+    add(index, "a.pdf", ["retention schedule"])
+    assert index.count() == 2
+    assert [r['id'] for r in index.search("cookie")] == ["b.pdf_0"]
+    assert [r['id'] for r in index.search("retention")] == ["a.pdf_0"]
+    index.clear()
+    assert index.count() == 0
+    index.close()
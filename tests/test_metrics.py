@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from src.metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = Histogram("latency", buckets=(1, 10, 100))
+    for value in [0.5, 2, 3, 50, 500]:
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 5 and snapshot['sum'] == pytest.approx(555.5)
+    assert snapshot['buckets'] == [(1, 1), (10, 3), (100, 4), (float('inf'), 5)]
+    assert histogram.percentiles() == {'p50': 3, 'p95': 500, 'p99': 500}
+    assert histogram.quantile(0.5) == 10
+
+
+def test_percentiles_follow_the_recent_window():
+    histogram = Histogram("latency", buckets=(1,), window=10)
+    for value in [1000] * 50 + [1] * 10:
+        histogram.observe(value)
+    assert histogram.percentiles()['p99'] == 1
+    assert histogram.snapshot()['count'] == 60
+
+
+def test_registry_reuses_histograms_by_name():
+    registry = MetricsRegistry()
+    assert registry.histogram("a") is registry.histogram("a")
+    assert registry.names() == ["a"]
+
+
+def test_prometheus_exposition():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("span.retriever.retrieve_ms", buckets=(5, 50), description="Retrieval time")
+    histogram.observe(3)
+    histogram.observe(30)
+    text = registry.to_prometheus()
+    assert "# TYPE rag_span_retriever_retrieve_ms histogram" in text
+    assert 'rag_span_retriever_retrieve_ms_bucket{le="5"} 1' in text
+    assert 'rag_span_retriever_retrieve_ms_bucket{le="+Inf"} 2' in text
+    assert "rag_span_retriever_retrieve_ms_count 2" in text
+    assert 'rag_span_retriever_retrieve_ms_recent{quantile="0.5"} 3' in text
+
+
+def test_jsonl_export_appends_snapshots(tmp_path):
+    registry = MetricsRegistry()
+    registry.histogram("a", buckets=(1,)).observe(2)
+    path = tmp_path / "metrics" / "metrics.jsonl"
+    registry.write_jsonl(path)
+    registry.write_jsonl(path)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    assert lines[0]['metrics']['a']['buckets'] == [[1, 0], ["+Inf", 1]]
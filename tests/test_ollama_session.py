@@ -0,0 +1,107 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.config import settings
+from src.generator_ollama import Generator
+from src.metrics import MetricsRegistry
+from src.ollama_session import OllamaSession
+
+MS = 1_000_000
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    """Stand-in for the Ollama HTTP API: records request bodies, answers with fixed timings."""
+
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b"{}")
+        self.requests.append((self.path, body))
+        # Only the first request of a model pays the load time, like a resident model
+        loaded = sum(1 for path, _ in self.requests if path == self.path) > 1
+        response = {
+            'model': body.get('model'),
+            'created_at': "2024-01-01T00:00:00Z",
+            'done': True,
+            'load_duration': (0 if loaded else 1500) * MS,
+            'total_duration': (1700 if not loaded else 300) * MS,
+            'prompt_eval_count': 100,
+            'prompt_eval_duration': 100 * MS,
+            'eval_duration': 150 * MS,
+        }
+        if self.path == '/api/embed':
+            response['embeddings'] = [[0.1, 0.2] for _ in body['input']]
+        else:
+            response['response'] = "" if not body.get('prompt') else "An answer."
+        payload = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ollama_host():
+    FakeOllama.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllama)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_warmup_once_with_the_num_ctx_queries_use(ollama_host):
+    session = OllamaSession(ollama_host, keep_alive="45m", min_ctx=8192, metrics=MetricsRegistry())
+    generator = Generator("llama3.2:latest", ollama_host, session=session)
+    session.warmup("llama3.2:latest")
+    generator.generate_answer("What is RAG?", "x" * 4000, max_tokens=1024)
+
+    generate_requests = [body for path, body in FakeOllama.requests if path == '/api/generate']
+    assert len(generate_requests) == 2  # One warmup, one query
+    warmup, query = generate_requests
+    assert warmup['prompt'] == "" and query['prompt']
+    assert warmup['keep_alive'] == query['keep_alive'] == "45m"
+    assert warmup['options']['num_ctx'] == query['options']['num_ctx'] == 8192
+
+
+def test_num_ctx_grows_for_long_prompts_and_stays(ollama_host):
+    session = OllamaSession(ollama_host, min_ctx=2048, max_ctx=8192, metrics=MetricsRegistry())
+    assert session.num_ctx_for("x" * 100, 256, "m") == 2048
+    assert session.num_ctx_for("x" * 12000, 256, "m") == 4096
+    # Shrinking back would reload the model
+    assert session.num_ctx_for("x" * 100, 256, "m") == 4096
+    assert session.num_ctx_for("x" * 100000, 256, "m") == 8192
+
+
+def test_record_splits_load_and_inference_time(ollama_host):
+    registry = MetricsRegistry()
+    session = OllamaSession(ollama_host, metrics=registry)
+    session.warmup("nomic-embed-text:v1.5", embedding=True)
+    response = session.client.embed(model="nomic-embed-text:v1.5", input=["text"], keep_alive=session.keep_alive)
+    timings = session.record("nomic-embed-text:v1.5", response)
+
+    assert timings['load_ms'] == 0
+    assert timings['inference_ms'] == 300
+    assert timings['prompt_eval_ms'] == 100 and timings['eval_ms'] == 150
+    assert timings['prompt_tokens'] == 100
+    load = registry.histogram("ollama_load_ms").snapshot()
+    assert load['count'] == 2 and load['sum'] == 1500
+    assert registry.histogram("ollama_inference_ms").snapshot()['sum'] == 200 + 300
+    assert session.last_timings["nomic-embed-text:v1.5"] == timings
+    assert FakeOllama.requests[1][1]['keep_alive'] == "30m"
+
+
+def test_default_session_uses_settings(ollama_host, monkeypatch):
+    monkeypatch.setattr(settings, 'ollama_keep_alive', "-1")
+    monkeypatch.setattr(settings, 'ollama_min_ctx', 4096)
+    generator = Generator("llama3.2:latest", ollama_host, warmup=False)
+    assert generator.session.keep_alive == "-1"
+    assert generator.session.min_ctx == 4096
@@ -0,0 +1,37 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import src
+
+ROOT = Path(__file__).parent.parent
+
+HEAVY_MODULES = ("docling", "chromadb", "google.genai", "ollama", "numpy")
+
+
+def loaded_after(statement):
+    # A fresh interpreter: this one has already imported everything the other tests use
+    script = f"import sys\n{statement}\nprint(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return completed.stdout.split()
+
+
+@pytest.mark.parametrize("statement", [
+    "import src",
+    "from src import settings",
+    "from src import Retriever, QueryEmbeddingCache, create_vector_store",
+    "from src import Indexer, DocumentProcessor, TextChunker",
+])
+def test_import_loads_no_heavy_dependencies(statement):
+    assert loaded_after(statement) == []
+
+
+def test_public_names_resolve_lazily():
+    from src.retriever import Retriever
+
+    assert src.Retriever is Retriever
+    assert "Retriever" in dir(src) and set(src.__all__) <= set(dir(src))
+    with pytest.raises(AttributeError):
+        src.NotAThing
@@ -0,0 +1,71 @@
+import pytest
+
+from src.chunker import TextChunker
+from src.pipeline import IngestPipeline
+from src.stores import create_vector_store
+
+TEXT = "Privacy policies describe how personal data is collected and shared. " * 20
+
+
+def write_pdfs(directory, texts):
+    directory.mkdir(exist_ok=True)
+    paths = []
+    for name, text in texts.items():
+        path = directory / f"{name}.pdf"
+        path.write_text(text, encoding='utf-8')
+        paths.append(path)
+    return paths
+
+
+def sources(store):
+    results = store.search([1.0] * 16, limit=1000)
+    return sorted(result['source_file'] for result in results)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = create_vector_store("numpy", "documents", tmp_path / "store")
+    yield store
+    store.close()
+
+
+def test_documents_are_stored_before_they_are_reported(tmp_path, embedder, processor, store):
+    paths = write_pdfs(tmp_path / "uploads", {'a': TEXT, 'b': TEXT.upper(), 'c': TEXT.lower()})
+    reported = []
+
+    def on_document(pdf_path, num_chunks, num_failed):
+        reported.append((pdf_path.name, num_chunks, num_failed, sources(store).count(pdf_path.stem)))
+
+    pipeline = IngestPipeline(processor, TextChunker(300, 50), embedder, store,
+                              queue_size=1, embed_batch_size=2)
+    stats = pipeline.run(paths, on_document=on_document)
+
+    assert stats['documents'] == 3 and stats['failed_chunks'] == 0
+    assert [name for name, *_ in reported] == ["a.pdf", "b.pdf", "c.pdf"]
+    for _, num_chunks, num_failed, stored in reported:
+        assert num_chunks == stored > 2 and num_failed == 0
+    assert store.get_collection_info()['points_count'] == stats['chunks']
+
+
+def test_reingesting_replaces_a_documents_chunks(tmp_path, embedder, processor, store):
+    uploads = tmp_path / "uploads"
+    pipeline = IngestPipeline(processor, TextChunker(300, 50), embedder, store, write_thread=False)
+    pipeline.run(write_pdfs(uploads, {'a': TEXT, 'b': TEXT}))
+    before = sources(store).count("a")
+
+    # Shorter text, fewer chunks; b is not touched
+    pipeline.run(write_pdfs(uploads, {'a': TEXT[:400]}))
+    assert 0 < sources(store).count("a") < before
+    assert sources(store).count("b") == before
+
+
+def test_a_failing_stage_stops_the_pipeline(tmp_path, embedder, processor, store, monkeypatch):
+    def embed_chunks(chunks):
+        raise RuntimeError("embedding service down")
+
+    monkeypatch.setattr(embedder, 'embed_chunks', embed_chunks)
+    paths = write_pdfs(tmp_path / "uploads", {name: TEXT for name in "abcdef"})
+    pipeline = IngestPipeline(processor, TextChunker(300, 50), embedder, store, queue_size=1)
+    with pytest.raises(RuntimeError, match="embedding service down"):
+        pipeline.run(paths)
+    assert store.get_collection_info()['points_count'] == 0
@@ -0,0 +1,79 @@
+import itertools
+
+import pytest
+
+from src import query_cache
+from src.query_cache import QueryEmbeddingCache
+from src.retriever import Retriever
+from src.stores import create_vector_store
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(query_cache.time, 'time', lambda: float(next(ticks)))
+
+
+def test_keyed_by_model_and_normalized_query():
+    cache = QueryEmbeddingCache()
+    cache.put("model-a", "What is  RAG?", [0.5])
+    assert cache.get("model-a", " What is RAG?\n") == [0.5]
+    assert cache.get("model-b", "What is RAG?") is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_entries=2)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    cache.get("m", "a")  # "b" is now the least recently used
+    cache.put("m", "c", [3.0])
+    assert [cache.get("m", query) for query in "abc"] == [[1.0], None, [3.0]]
+
+
+def test_entries_expire(clock):
+    cache = QueryEmbeddingCache(ttl_seconds=1.5)
+    cache.put("m", "a", [1.0])  # t=1000
+    assert cache.get("m", "a") == [1.0]  # t=1001
+    assert cache.get("m", "a") is None  # t=1002: reads do not extend the lifetime
+    assert cache.stats()['entries'] == 0
+
+
+def test_persists_every_n_entries_and_drops_expired_on_load(tmp_path, clock):
+    path = tmp_path / "queries.json"
+    cache = QueryEmbeddingCache(persist_path=path, persist_every=2, ttl_seconds=100)
+    cache.put("m", "a", [1.0])
+    assert not path.exists()
+    cache.put("m", "b", [2.0])
+    assert path.exists()
+
+    assert QueryEmbeddingCache(persist_path=path).get("m", "b") == [2.0]
+    assert QueryEmbeddingCache(persist_path=path, ttl_seconds=0).stats()['entries'] == 0
+
+
+def test_unreadable_file_is_ignored(tmp_path):
+    path = tmp_path / "queries.json"
+    path.write_text("{not json", encoding='utf-8')
+    assert QueryEmbeddingCache(persist_path=path).stats()['entries'] == 0
+
+
+class CountingEmbedder:
+    model_name = "fake-embedding"
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_text(self, text):
+        self.calls += 1
+        return [1.0, 0.5]
+
+
+def test_retriever_embeds_a_repeated_query_once(tmp_path):
+    store = create_vector_store("numpy", "documents", tmp_path)
+    embedder = CountingEmbedder()
+    retriever = Retriever(embedder, store, query_cache=QueryEmbeddingCache())
+    retriever.retrieve("What is RAG?")
+    retriever.retrieve("what is RAG?")
+    retriever.retrieve("  What is RAG? ")
+    assert embedder.calls == 2
+    store.close()
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src import rate_limiter
+from src.rate_limiter import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake ``time`` for the module: sleeping advances the clock instead of waiting."""
+    clock = SimpleNamespace(now=0.0, slept=[])
+
+    def sleep(seconds):
+        clock.slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep))
+    return clock
+
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(capacity=3, refill_per_second=1)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(1.0)]
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(capacity=2, refill_per_second=1)
+    bucket.acquire(2)
+    clock.now += 100
+    bucket.acquire(2)
+    assert clock.slept == []
+    bucket.acquire(1)
+    assert clock.slept == [pytest.approx(1.0)]
+
+
+def test_oversized_request_waits_for_a_full_bucket_only(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=5)
+    bucket.acquire(4)
+    bucket.acquire(1000)
+    assert sum(clock.slept) == pytest.approx(0.8)
+
+
+def test_limiter_charges_requests_and_tokens(clock):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    limiter.acquire(tokens=600)
+    assert clock.slept == []
+    # The token bucket is empty: 100 tokens refill at 10 per second
+    limiter.acquire(tokens=100)
+    assert sum(clock.slept) == pytest.approx(10.0)
+
+
+def test_zero_disables_a_limit(clock):
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=None)
+    assert limiter.requests is None and limiter.tokens is None
+    for _ in range(1000):
+        limiter.acquire(tokens=10_000)
+    assert clock.slept == []
+
+
+def test_estimate_tokens():
+    assert RateLimiter.estimate_tokens("") == 1
+    assert RateLimiter.estimate_tokens("x" * 400) == 100
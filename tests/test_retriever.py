@@ -0,0 +1,172 @@
+import asyncio
+import time
+
+import pytest
+
+from src.query_cache import QueryEmbeddingCache
+from src.retriever import AsyncRetriever, Retriever, reciprocal_rank_fusion
+from src.stores import create_vector_store
+
+VOCABULARY = ["cookie", "privacy", "data", "retention", "children", "security"]
+
+TEXTS = [
+    "cookie banners ask for consent before tracking",
+    "privacy policies disclose data sharing with partners",
+    "data retention schedules say how long records are kept",
+    "children need parental consent under COPPA",
+    "security incidents must be reported within 72 hours",
+]
+
+
+class KeywordEmbedder:
+    """Vectors count vocabulary words, so vector search ranks by topic without an API."""
+
+    model_name = "keyword-embedding"
+
+    def __init__(self):
+        self.calls = 0
+
+    def vector(self, text):
+        words = text.lower().split()
+        return [float(sum(word.startswith(term) for word in words)) + 0.01 for term in VOCABULARY]
+
+    def embed_text(self, text):
+        self.calls += 1
+        return self.vector(text)
+
+    def embed_batch(self, texts, batch_size=100):
+        self.calls += 1
+        return [self.vector(text) for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = create_vector_store("numpy", "documents", tmp_path)
+    embedder = KeywordEmbedder()
+    store.add_chunks([{'source_file': "a.pdf", 'chunk_id': i, 'total_chunks': len(TEXTS), 'text': text,
+                       'embedding': embedder.vector(text)} for i, text in enumerate(TEXTS)])
+    yield store
+    store.close()
+
+
+def test_reciprocal_rank_fusion():
+    vector = [{'id': "a"}, {'id': "b"}, {'id': "c"}]
+    lexical = [{'id': "c"}, {'id': "a"}, {'id': "d"}]
+    fused = reciprocal_rank_fusion([vector, lexical], limit=3, k=60)
+    assert [r['id'] for r in fused] == ["a", "c", "b"]
+    assert fused[0]['score'] == pytest.approx(1 / 61 + 1 / 62)
+    assert all(r['fused'] for r in fused)
+
+
+@pytest.mark.parametrize("mode", ["vector", "lexical", "hybrid"])
+def test_every_mode_finds_the_topic(store, mode):
+    retriever = Retriever(KeywordEmbedder(), store, mode=mode)
+    assert retriever.retrieve("how long is data retention?", top_k=2)[0]['id'] == "a.pdf_2"
+
+
+def test_lexical_mode_never_embeds(store):
+    embedder = KeywordEmbedder()
+    retriever = Retriever(embedder, store, query_cache=QueryEmbeddingCache())
+    retriever.retrieve("cookie consent", mode="lexical")
+    retriever.retrieve_batch(["cookie consent", "children"], mode="lexical")
+    assert embedder.calls == 0
+
+
+def test_without_lexical_index_falls_back_to_vector(tmp_path):
+    store = create_vector_store("numpy", "documents", tmp_path, lexical=False)
+    assert Retriever(KeywordEmbedder(), store, mode="hybrid").mode == "vector"
+    with pytest.raises(ValueError):
+        Retriever(KeywordEmbedder(), store, mode="semantic")
+    store.close()
+
+
+QUERIES = ["cookie consent", "how long is data retention?", "parental consent for children", "security incidents"]
+
+
+@pytest.mark.parametrize("mode", ["vector", "lexical", "hybrid"])
+def test_retrieve_batch_matches_single_queries(store, mode):
+    retriever = Retriever(KeywordEmbedder(), store, mode=mode)
+    expected = [[r['id'] for r in retriever.retrieve(query, top_k=3)] for query in QUERIES]
+    assert [[r['id'] for r in results] for results in retriever.retrieve_batch(QUERIES, top_k=3)] == expected
+
+
+def test_retrieve_batch_embeds_only_uncached_queries_in_one_call(store):
+    embedder = KeywordEmbedder()
+    retriever = Retriever(embedder, store, query_cache=QueryEmbeddingCache())
+    retriever.retrieve(QUERIES[0])
+    retriever.retrieve_batch(QUERIES)
+    assert embedder.calls == 2
+    retriever.retrieve_batch(QUERIES)
+    assert embedder.calls == 2
+
+
+def test_unembeddable_queries_keep_their_bm25_results(store):
+    embedder = KeywordEmbedder()
+    embedder.embed_batch = lambda texts, batch_size=100: [None if "children" in text else embedder.vector(text)
+                                                          for text in texts]
+    results = Retriever(embedder, store, mode="hybrid").retrieve_batch(QUERIES, top_k=2)
+    assert results[2][0]['id'] == "a.pdf_3"
+
+    def unavailable(texts, batch_size=100):
+        raise ConnectionError("embedding service down")
+
+    embedder.embed_batch = unavailable
+    assert Retriever(embedder, store, mode="hybrid").retrieve_batch(QUERIES, top_k=1)[0][0]['id'] == "a.pdf_0"
+    with pytest.raises(ConnectionError):
+        Retriever(embedder, store, mode="vector").retrieve_batch(QUERIES)
+
+
+class AsyncKeywordEmbedder(KeywordEmbedder):
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.async_calls = 0
+
+    async def embed_text_async(self, text):
+        self.async_calls += 1
+        await asyncio.sleep(self.delay)
+        return self.vector(text)
+
+
+@pytest.mark.parametrize("mode", ["vector", "lexical", "hybrid"])
+def test_async_retriever_matches_retriever(store, mode):
+    embedder = AsyncKeywordEmbedder()
+    retriever = Retriever(embedder, store, mode=mode)
+    async_retriever = AsyncRetriever(retriever)
+
+    async def retrieve_all():
+        return await asyncio.gather(*(async_retriever.retrieve(query, top_k=3) for query in QUERIES))
+
+    expected = [[r['id'] for r in retriever.retrieve(query, top_k=3)] for query in QUERIES]
+    assert [[r['id'] for r in results] for results in asyncio.run(retrieve_all())] == expected
+    if mode != "lexical":
+        assert embedder.async_calls == len(QUERIES)
+
+
+def test_async_hybrid_returns_bm25_results_when_embedding_is_slow(store):
+    embedder = AsyncKeywordEmbedder(delay=5)
+    async_retriever = AsyncRetriever(Retriever(embedder, store, mode="hybrid", vector_timeout=0.05))
+    start = time.perf_counter()
+    results = asyncio.run(async_retriever.retrieve("how long is data retention?", top_k=2))
+    assert time.perf_counter() - start < 2
+    lexical = store.lexical_index.search("how long is data retention?", limit=2)
+    assert [r['id'] for r in results] == [r['id'] for r in lexical]
+
+
+def test_close_waits_for_a_timed_out_hybrid_search(store):
+    embedder = KeywordEmbedder()
+    searched = []
+
+    def slow_embed(text):
+        time.sleep(0.3)
+        return embedder.vector(text)
+
+    embedder.embed_text = slow_embed
+    original_search = store.search
+    store.search = lambda **kwargs: searched.append(original_search(**kwargs))
+    retriever = Retriever(embedder, store, mode="hybrid", vector_timeout=0.05)
+    assert retriever.retrieve("cookie consent", top_k=1)[0]['id'] == "a.pdf_0"
+    assert searched == []
+    # The store may only be closed after this: the abandoned search still uses it
+    retriever.close()
+    assert len(searched) == 1
@@ -0,0 +1,172 @@
+import asyncio
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from src.answer_cache import SemanticAnswerCache
+from src.job_queue import JobQueue
+from src.server import RAGServer
+
+
+class FakeRetriever:
+    def __init__(self, store):
+        self.store = store
+        self.closed = False
+
+    async def retrieve(self, query, top_k=5, mode=None):
+        return [{'id': "a.pdf_0", 'source_file': "a.pdf", 'chunk_id': 0, 'score': 1.0, 'text': "context"}][:top_k]
+
+    def format_context(self, results):
+        return "\n".join(r['text'] for r in results)
+
+    def close(self):
+        # The store must outlive searches still running for this retriever
+        assert not self.store.closed
+        self.closed = True
+
+
+class FailingGenerator:
+    async def generate_answer(self, query, context, max_tokens=500):
+        return "An answer."
+
+    async def generate_answer_stream(self, query, context, max_tokens=500):
+        yield "An "
+        raise RuntimeError("provider went away")
+
+
+class FakeStore:
+    lexical_index = None
+    closed = False
+
+    def get_collection_info(self):
+        return {'points_count': 1}
+
+    def close(self):
+        self.closed = True
+
+
+class StubServer(RAGServer):
+    def __init__(self, job_queue, **options):
+        super().__init__(**options)
+        self.job_queue_ = job_queue
+
+    def load_components(self):
+        self._generation = self._read_generation()
+        self.vector_store = FakeStore()
+        self.answer_cache = SemanticAnswerCache()
+        self.retriever = self._open_retriever(self.vector_store)
+        self.generator = FailingGenerator()
+        self.job_queue = self.job_queue_
+
+    def _open_retriever(self, vector_store):
+        return FakeRetriever(vector_store)
+
+
+@pytest.fixture
+def rag_server(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite")
+    rag_server = StubServer(queue)
+    rag_server.generation_path = tmp_path / "index_generation"
+    yield rag_server
+    queue.close()
+
+
+@pytest.fixture
+def server(rag_server):
+    sock = socket.create_server(("127.0.0.1", 0))
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def start():
+        return asyncio.ensure_future(rag_server.serve(sock))
+
+    serving = asyncio.run_coroutine_threadsafe(start(), loop).result()
+    yield sock.getsockname()[1]
+    loop.call_soon_threadsafe(serving.cancel)
+    asyncio.run_coroutine_threadsafe(asyncio.wait([serving]), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    sock.close()
+
+
+def request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    return response.status, response.reason, response.read()
+
+
+def raw_request(port, data: bytes) -> bytes:
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(data)
+        chunks = []
+        while chunk := sock.recv(65536):
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def test_ingest_is_accepted(server):
+    status, reason, body = request(server, "POST", "/ingest", json.dumps({'full': True}),
+                                   {'Content-Type': 'application/json'})
+    assert (status, reason) == (202, "Accepted")
+    assert json.loads(body)['state'] == 'queued'
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("POST", "/query", {'query': "q", 'top_k': "many"}),
+    ("POST", "/query", {'query': "q", 'max_tokens': None}),
+    ("GET", "/jobs?id=abc", None),
+    ("GET", "/jobs?limit=x", None),
+    ("GET", "/traces?limit=ten", None),
+])
+def test_invalid_numbers_are_bad_requests(server, method, path, body):
+    status, _, payload = request(server, method, path, json.dumps(body) if body else None)
+    assert status == 400
+    assert "must be an integer" in json.loads(payload)['error']
+
+
+def test_invalid_content_length_is_a_bad_request(server):
+    response = raw_request(server, b"POST /query HTTP/1.1\r\nContent-Length: lots\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+
+
+def test_failure_mid_stream_is_an_error_event(server):
+    response = raw_request(server, b"POST /query HTTP/1.1\r\nContent-Length: 14\r\n\r\n" + b'{"query": "q"}')
+    assert response.count(b"HTTP/1.1") == 1
+    assert b"event: context\n" in response
+    assert b'data: {"text": "An "}' in response
+    assert b'event: error\ndata: {"error": "provider went away", "status": 500}' in response
+    assert b"event: done" not in response
+
+
+def test_index_change_swaps_in_a_new_store_and_retires_the_old_one(rag_server, server, monkeypatch):
+    old_store, old_retriever = rag_server.vector_store, rag_server.retriever
+    opened_on = []
+
+    def open_store():
+        opened_on.append(threading.current_thread().name)
+        return FakeStore()
+
+    monkeypatch.setattr("src.server.create_vector_store", open_store)
+    rag_server.generation_path.touch()
+    status, _, _ = request(server, "POST", "/retrieve", json.dumps({'query': "q"}))
+    assert status == 200
+    # Opened in a worker thread, not on the event loop
+    assert len(opened_on) == 1 and opened_on[0].startswith("asyncio")
+    assert rag_server.vector_store is not old_store
+    assert rag_server.generator.retriever is rag_server.retriever
+    for _ in range(100):
+        if old_store.closed:
+            break
+        time.sleep(0.02)
+    assert old_retriever.closed and old_store.closed
+    assert not rag_server.vector_store.closed
+
+    request(server, "POST", "/retrieve", json.dumps({'query': "q"}))
+    assert len(opened_on) == 1
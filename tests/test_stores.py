@@ -0,0 +1,122 @@
+import random
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from src.stores import create_vector_store
+
+ROOT = Path(__file__).parent.parent
+
+
+def make_chunks(source_file, count, seed):
+    rng = random.Random(seed)
+    return [{'source_file': source_file, 'chunk_id': i, 'total_chunks': count,
+             'text': f"{source_file} chunk {i} about privacy", 'embedding': [rng.random() for _ in range(8)]}
+            for i in range(count)]
+
+
+def write_in_other_process(backend, directory, source_file):
+    # What an ingest worker does: open its own store, write, exit
+    script = textwrap.dedent(f"""
+        from src.stores import create_vector_store
+        from tests.test_stores import make_chunks
+        store = create_vector_store({backend!r}, "documents", {str(directory)!r})
+        store.add_chunks(make_chunks({source_file!r}, 5, 2))
+    """)
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_reopened_store_sees_other_process_writes(backend, tmp_path):
+    store = create_vector_store(backend, "documents", tmp_path)
+    store.add_chunks(make_chunks("a.pdf", 5, 1))
+    assert len(store.search([0.5] * 8, limit=20)) == 5
+
+    write_in_other_process(backend, tmp_path, "b.pdf")
+    reopened = create_vector_store(backend, "documents", tmp_path)
+    store.close()
+    assert reopened.get_collection_info()['points_count'] == 10
+    assert len(reopened.search([0.5] * 8, limit=20)) == 10
+    assert {r['source_file'] for r in reopened.lexical_index.search("privacy", limit=20)} == {"a.pdf", "b.pdf"}
+    reopened.close()
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_search_returns_chunk_offsets(backend, tmp_path):
+    from src.chunker import TextChunker
+    content = " ".join(f"Sentence number {i} talks about data retention." for i in range(60))
+    chunks = TextChunker(chunk_size=300, chunk_overlap=60).chunk_document({'content': content, 'filename': "a.pdf"})
+    rng = random.Random(0)
+    for chunk in chunks:
+        chunk['embedding'] = [rng.random() for _ in range(8)]
+
+    store = create_vector_store(backend, "documents", tmp_path)
+    store.add_chunks(chunks)
+    results = store.search(chunks[3]['embedding'], limit=len(chunks))
+    assert len(results) == len(chunks)
+    for result in results:
+        assert result['char_start'] >= 0
+        assert content[result['char_start']:result['char_end']] == result['text']
+    store.close()
+
+
+def test_numpy_sidecar_without_offsets_is_migrated(tmp_path):
+    import sqlite3
+    path = tmp_path / "documents.npstore"
+    path.mkdir()
+    db = sqlite3.connect(path / "meta.sqlite")
+    db.execute("CREATE TABLE chunks (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, source_file TEXT NOT NULL, "
+               "chunk_id INTEGER, total_chunks INTEGER, source_path TEXT, text TEXT)")
+    db.commit()
+    db.close()
+
+    store = create_vector_store("numpy", "documents", tmp_path, lexical=False)
+    store.add_chunks(make_chunks("a.pdf", 2, 1))
+    assert {r['char_start'] for r in store.search([0.5] * 8)} == {-1}
+    store.close()
+
+
+def test_numpy_reader_follows_deletes_and_row_reuse_by_another_writer(tmp_path):
+    reader = create_vector_store("numpy", "documents", tmp_path)
+    writer = create_vector_store("numpy", "documents", tmp_path)
+    writer.add_chunks(make_chunks("a.pdf", 5, 1))
+    assert len(reader.search([0.5] * 8, limit=20)) == 5
+
+    writer.delete_source("a.pdf")
+    assert reader.search([0.5] * 8, limit=20) == []
+    writer.add_chunks(make_chunks("b.pdf", 3, 2))
+    results = reader.search([0.5] * 8, limit=20)
+    assert sorted(r['id'] for r in results) == ["b.pdf_0", "b.pdf_1", "b.pdf_2"]
+    assert all(r['text'].startswith("b.pdf") for r in results)
+    assert reader.get_collection_info()['points_count'] == 3
+    reader.close()
+    writer.close()
+
+
+def test_numpy_search_skips_rows_changed_after_the_row_state_was_read(tmp_path, monkeypatch):
+    reader = create_vector_store("numpy", "documents", tmp_path)
+    writer = create_vector_store("numpy", "documents", tmp_path)
+    writer.add_chunks(make_chunks("a.pdf", 5, 1))
+    reader.search([0.5] * 8)
+    # A writer commits between the reader's refresh and its sidecar lookup
+    monkeypatch.setattr(reader, '_refresh', lambda: None)
+    writer.delete_source("a.pdf")
+    assert reader.search([0.5] * 8, limit=20) == []
+    writer.add_chunks(make_chunks("b.pdf", 2, 2))
+    assert reader.search([0.5] * 8, limit=20) == []
+    reader.close()
+    writer.close()
+
+
+def test_dropped_chroma_store_stops_its_system(tmp_path):
+    # The app drops stale stores without closing them, since other sessions may still hold them
+    import gc
+    store = create_vector_store("chroma", "documents", tmp_path)
+    stop_system = store._stop_system
+    assert stop_system.alive
+    del store
+    gc.collect()
+    assert not stop_system.alive
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from src.metrics import MetricsRegistry
+from src.tracing import NOOP_SPAN, Tracer
+
+
+def make_tracer(**options):
+    return Tracer(metrics=MetricsRegistry(), **options)
+
+
+def test_nested_spans_form_one_trace_and_feed_histograms(tmp_path):
+    tracer = make_tracer(export_path=tmp_path / "traces.jsonl")
+    with tracer.span("request", path="/query"):
+        with tracer.span("retriever.retrieve"):
+            with tracer.span("embedding.embed_text"):
+                pass
+        with tracer.span("generator.generate"):
+            pass
+
+    trace, = tracer.recent_traces()
+    assert trace['name'] == "request" and trace['attributes'] == {'path': "/query"}
+    assert [child['name'] for child in trace['children']] == ["retriever.retrieve", "generator.generate"]
+    assert trace['children'][0]['children'][0]['name'] == "embedding.embed_text"
+    assert set(tracer.stage_percentiles()) == {"request", "retriever.retrieve", "embedding.embed_text",
+                                               "generator.generate"}
+    exported = json.loads((tmp_path / "traces.jsonl").read_text())
+    assert exported['children'][1]['name'] == "generator.generate"
+
+
+def test_childless_roots_only_feed_histograms():
+    tracer = make_tracer()
+    with tracer.span("embedding.embed_batch"):
+        pass
+    assert tracer.recent_traces() == []
+    assert tracer.stage_percentiles()["embedding.embed_batch"]['count'] == 1
+
+
+def test_errors_are_recorded_on_the_span():
+    tracer = make_tracer()
+    try:
+        with tracer.span("request"):
+            with tracer.span("vector_store.search"):
+                raise TimeoutError()
+    except TimeoutError:
+        pass
+    assert tracer.recent_traces()[0]['children'][0]['attributes'] == {'error': "TimeoutError"}
+
+
+def test_concurrent_tasks_get_separate_trees():
+    tracer = make_tracer()
+
+    async def request(i):
+        with tracer.span("request", id=i):
+            await asyncio.sleep(0)
+            with tracer.span("stage"):
+                await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(*(request(i) for i in range(5)))
+
+    asyncio.run(main())
+    traces = tracer.recent_traces(limit=10)
+    assert len(traces) == 5 and all(len(trace['children']) == 1 for trace in traces)
+
+
+def test_stream_span_records_first_token_and_rate():
+    tracer = make_tracer()
+    with tracer.span("request"):
+        stream = tracer.stream("generator.stream")
+        for piece in ["Cookies ", "track ", "visitors."]:
+            stream.piece(piece)
+        stream.finish()
+        stream.finish()
+    attributes = tracer.recent_traces()[0]['children'][0]['attributes']
+    assert attributes['tokens'] == len("Cookies track visitors.") // 4
+    assert attributes['first_token_ms'] >= 0
+    assert tracer.metrics.histogram("span.generator.stream.first_token_ms").snapshot()['count'] == 1
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = make_tracer(enabled=False)
+    assert tracer.span("request") is NOOP_SPAN and tracer.stream("generator.stream") is NOOP_SPAN
+    with tracer.span("request"):
+        pass
+    assert tracer.metrics.names() == []
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from src.vector_store_numpy import VectorStore
+
+
+def make_chunks(source_file, vectors):
+    return [{'source_file': source_file, 'chunk_id': i, 'total_chunks': len(vectors),
+             'text': f"{source_file} chunk {i}", 'embedding': vector.tolist()}
+            for i, vector in enumerate(vectors)]
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((300, 32)).astype(np.float32)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = VectorStore("documents", tmp_path)
+    yield store
+    store.close()
+
+
+def brute_force(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k])
+
+
+def test_exact_search_matches_brute_force(store, vectors):
+    store.add_chunks(make_chunks("a.pdf", vectors))
+    for query in np.random.default_rng(1).standard_normal((5, 32)):
+        results = store.search(query.tolist(), limit=10)
+        assert [r['chunk_id'] for r in results] == brute_force(vectors, query, 10)
+        assert [r['score'] for r in results] == sorted((r['score'] for r in results), reverse=True)
+
+
+def test_search_batch_matches_single_searches(store, vectors):
+    store.add_chunks(make_chunks("a.pdf", vectors))
+    queries = np.random.default_rng(1).standard_normal((4, 32)).tolist()
+    assert store.search_batch(queries, limit=5) == [store.search(query, limit=5) for query in queries]
+
+
+def test_source_filter_and_delete(store, vectors):
+    store.add_chunks(make_chunks("a.pdf", vectors[:100]))
+    store.add_chunks(make_chunks("b.pdf", vectors[100:200]))
+    query = vectors[150].tolist()
+    assert {r['source_file'] for r in store.search(query, limit=20, source_filter="a.pdf")} == {"a.pdf"}
+    assert store.search(query, limit=20, source_filter="missing.pdf") == []
+
+    store.delete_source("b.pdf")
+    assert store.get_collection_info()['points_count'] == 100
+    assert {r['source_file'] for r in store.search(query, limit=200)} == {"a.pdf"}
+
+
+def test_freed_rows_are_reused_and_ids_overwritten_in_place(store, vectors):
+    store.add_chunks(make_chunks("a.pdf", vectors[:50]))
+    store.add_chunks(make_chunks("b.pdf", vectors[50:100]))
+    store.delete_source("a.pdf")
+    store.add_chunks(make_chunks("c.pdf", vectors[100:130]))
+    store.add_chunks(make_chunks("c.pdf", vectors[130:160]))
+    assert store._count == 100
+    assert store.get_collection_info()['points_count'] == 80
+    assert store.search(vectors[140].tolist(), limit=1)[0]['id'] == "c.pdf_10"
+
+
+def test_persists_across_instances(tmp_path, vectors):
+    store = VectorStore("documents", tmp_path)
+    store.add_chunks(make_chunks("a.pdf", vectors))
+    query = vectors[7].tolist()
+    before = store.search(query, limit=5)
+    store.close()
+
+    reopened = VectorStore("documents", tmp_path)
+    assert reopened.search(query, limit=5) == before
+    reopened.close()
+
+
+def test_dimension_mismatch_is_rejected(store, vectors):
+    store.add_chunks(make_chunks("a.pdf", vectors[:10]))
+    with pytest.raises(ValueError, match="dimension"):
+        store.add_chunks(make_chunks("b.pdf", vectors[:10, :16]))
+
+
+def test_empty_store_returns_nothing(store):
+    assert store.search([1.0, 0.0], limit=5) == []
+
+
+@pytest.fixture
+def clustered():
+    # Real embeddings cluster by topic; unstructured Gaussian noise is the worst case for 1-bit codes
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 64))
+    return (centers[rng.integers(0, 20, 2000)] + 0.5 * rng.standard_normal((2000, 64))).astype(np.float32)
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_search_keeps_recall(tmp_path, clustered, quantization):
+    store = VectorStore("documents", tmp_path, quantization=quantization)
+    store.add_chunks(make_chunks("a.pdf", clustered))
+    assert store.get_collection_info()['recall_at_k'] >= 0.95
+    for query in clustered[:10]:
+        results = store.search(query.tolist(), limit=5)
+        assert [r['chunk_id'] for r in results] == brute_force(clustered, query, 5)
+    store.close()
+
+
+def test_calibration_is_persisted_and_redone_when_the_collection_doubles(tmp_path, clustered):
+    store = VectorStore("documents", tmp_path, quantization="int8")
+    store.add_chunks(make_chunks("a.pdf", clustered[:500]))
+    assert store._calibrated_count == 500
+    store.add_chunks(make_chunks("b.pdf", clustered[500:900]))
+    assert store._calibrated_count == 500
+    store.close()
+
+    reopened = VectorStore("documents", tmp_path, quantization="int8")
+    assert reopened._calibrated_count == 500 and reopened.recall_at_k is not None
+    reopened.add_chunks(make_chunks("c.pdf", clustered[900:1100]))
+    assert reopened._calibrated_count == 1100
+    reopened.close()
+
+
+def test_unknown_quantization_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="quantization"):
+        VectorStore("documents", tmp_path, quantization="int4")